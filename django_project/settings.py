@@ -43,11 +43,16 @@ INSTALLED_APPS = [
 ]
 
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    # ModelBackend with user and group permission sets cached across requests
+    'portfolio_app.backends.CachingModelBackend',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Before the metrics so static files don't count as app requests
+    'portfolio_app.staticfiles.StaticFilesMiddleware',
+    'portfolio_app.metrics.MetricsMiddleware',
+    'portfolio_app.db.ReadWriteRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,9 +88,93 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests and check them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # writers queue on busy_timeout instead of failing to upgrade
+            # a read lock with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Optional read connection, e.g. "file:/srv/portfolio/db.sqlite3?mode=ro" for a
+# read-only connection to the same file, or the path of a replicated copy.
+# GET requests read from it unless the client wrote in the last
+# DATABASE_STICKY_SECONDS.
+if os.environ.get('DATABASE_READ_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_READ_NAME'],
+        'OPTIONS': {},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['portfolio_app.db.ReadWriteRouter']
+DATABASE_STICKY_SECONDS = 10
+
+# Applied to every new SQLite connection, in order
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,  # KiB
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'portfolio-app',
+    }
+}
+
+
+# Paginate the project and student lists with opaque cursors instead of page
+# numbers. Cursor pages never run COUNT(*) or OFFSET, so deep pages stay cheap.
+CURSOR_PAGINATION = False
+
+# Default and largest page sizes of the JSON API lists (?limit=)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Seconds before the autocomplete prefix index is rebuilt from the database,
+# picking up writes its signal receivers did not see
+AUTOCOMPLETE_MAX_AGE = 300
+
+
+# Request metrics and query budgets
+# Requests to a view that run more SQL queries than its budget log a warning,
+# or raise during test runs (see TEST_SETTINGS) so N+1 regressions fail the suite.
+
+QUERY_BUDGETS = {
+    'index': 10,
+    'project_list': 10,
+    'project_detail': 10,
+    'student_list': 10,
+    'student_detail': 10,
+    'portfolio_detail': 10,
+    'api_portfolio_list': 5,
+    'api_portfolio_detail': 5,
+    'api_project_list': 5,
+    'api_project_detail': 5,
+    'api_student_list': 5,
+    'api_student_detail': 5,
+    # Only a rebuild of the prefix index queries the database
+    'api_autocomplete': 3,
+}
+QUERY_BUDGET_RAISE = False
+
+# Bearer token that lets a Prometheus scraper read /metrics without a staff login
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -127,10 +216,50 @@ STATICFILES_DIRS = [
 os.path.join(BASE_DIR, 'static')
 ]
 
+# collectstatic output, served by portfolio_app.staticfiles.StaticFilesMiddleware
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # Hashed file names plus .gz/.br copies
+        'BACKEND': 'portfolio_app.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Cache lifetime of static files whose names are not hashed
+STATIC_MAX_AGE = 60
+
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# manage.py export_static_site writes the public pages here
+STATIC_SITE_ROOT = os.path.join(BASE_DIR, 'static_site')
+
+# Uploads larger than this are streamed to a temporary file instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Project attachments
+ATTACHMENT_MAX_SIZE = 20 * 1024 * 1024
+# Widths of the WebP thumbnails made for image attachments (needs Pillow)
+THUMBNAIL_WIDTHS = (160, 320, 640)
+# Threads generating thumbnails in the background; 0 generates them inline
+# when the upload commits
+THUMBNAIL_WORKERS = 2
+
+# Background jobs (portfolio_app.jobs), run by `manage.py run_worker`
+JOB_WORKERS = 4
+# Seconds a worker may hold a job before it is handed to another worker
+JOB_VISIBILITY_TIMEOUT = 300
+
+# Soft delete: deleted portfolios and students can be restored for
+# SOFT_DELETE_UNDO_WINDOW seconds and are purged after SOFT_DELETE_RETENTION_DAYS
+SOFT_DELETE_UNDO_WINDOW = 60 * 60
+SOFT_DELETE_RETENTION_DAYS = 30
+
 # Login/Logout redirects
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
@@ -141,4 +270,19 @@ LOGIN_URL = '/accounts/login/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-APPEND_SLASH = False
\ No newline at end of file
+APPEND_SLASH = False
+
+
+# Tests
+# portfolio_app.runner.TestRunner applies TEST_SETTINGS for the whole run
+# (manage.py test, django-admin test, python -m django test). Other runners
+# can apply them with override_settings(**settings.TEST_SETTINGS).
+
+TEST_RUNNER = 'portfolio_app.runner.TestRunner'
+
+TEST_SETTINGS = {
+    # Plain static names, so tests don't need collectstatic to have run
+    'STORAGES': {**STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+    'QUERY_BUDGET_RAISE': True,
+    'THUMBNAIL_WORKERS': 0,
+}
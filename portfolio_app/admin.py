@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 
-from .models import Student, Portfolio, Project
+from .models import Student, Portfolio, Project, Attachment, Blob, Job
 
 
 class MyAdminSite(admin.AdminSite):
@@ -10,4 +10,7 @@ class MyAdminSite(admin.AdminSite):
 admin.site.register(Student)
 admin.site.register( Project)
 admin.site.register( Portfolio)
+admin.site.register(Attachment)
+admin.site.register(Blob)
+admin.site.register(Job)
 
@@ -0,0 +1,203 @@
+"""
+Read-only JSON API over portfolios, projects and students.
+
+Rows are read with ``values()`` and serialized as plain dicts, so no model
+instances, forms or templates are involved. Each resource declares its
+public fields and the to-one relations it can embed; embedded objects are
+fetched through joins in the same query as the rows they belong to.
+
+Query parameters:
+
+- ``fields=id,title,portfolio.title`` selects fields (sparse fieldsets);
+  dotted names select the fields of an embedded object.
+- ``embed=portfolio`` nests a related object instead of just its id.
+- ``limit`` and ``cursor`` page through lists with keyset pagination, so
+  deep pages cost the same as the first.
+
+Responses carry an ETag from the same validators as the HTML pages (see
+conditional.py), so unchanged data is answered with a 304.
+"""
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from .conditional import _latest, version_state
+from .models import Student, Portfolio, Project
+from .pagination import CursorPaginator, InvalidCursor
+
+
+class ApiError(Exception):
+    """A bad request; the message is returned to the client"""
+
+
+@dataclass(frozen=True)
+class Embed:
+    resource: str
+    path: str  # ORM path of the relation from the embedding model
+
+
+@dataclass(frozen=True)
+class Resource:
+    model: type
+    # Public field name -> ORM path
+    fields: dict
+    ordering: tuple
+    embeds: dict = field(default_factory=dict)
+
+
+RESOURCES = {
+    'portfolios': Resource(
+        model=Portfolio,
+        fields={
+            'id': 'id', 'title': 'title', 'about': 'about', 'contact_email': 'contact_email',
+            'is_active': 'is_active', 'project_count': 'project_count', 'student_id': 'student__id',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        ordering=('-id',),
+        embeds={'student': Embed('students', 'student')},
+    ),
+    'projects': Resource(
+        model=Project,
+        fields={
+            'id': 'id', 'title': 'title', 'description': 'description', 'portfolio_id': 'portfolio_id',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        ordering=('-id',),
+        embeds={'portfolio': Embed('portfolios', 'portfolio')},
+    ),
+    'students': Resource(
+        model=Student,
+        fields={
+            'id': 'id', 'name': 'name', 'email': 'email', 'major': 'major', 'portfolio_id': 'Portfolio_id',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        ordering=('name', 'id'),
+        embeds={'portfolio': Embed('portfolios', 'Portfolio')},
+    ),
+}
+
+
+def _split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_fields(resource, params):
+    """
+    Return (fields, embeds) for a request: the top-level field names, and
+    the field names to include for each embedded relation.
+    """
+    embeds = {}
+    for name in _split_list(params.get('embed', '')):
+        if name not in resource.embeds:
+            raise ApiError(f'Cannot embed "{name}"; choose from: {", ".join(resource.embeds) or "nothing"}')
+        embeds[name] = list(RESOURCES[resource.embeds[name].resource].fields)
+
+    requested = _split_list(params.get('fields', ''))
+    if not requested:
+        return list(resource.fields), embeds
+
+    fields = []
+    embedded_fields = {}
+    for name in requested:
+        relation, _, sub_field = name.partition('.')
+        if sub_field:
+            if relation not in embeds:
+                raise ApiError(f'"{name}" needs embed={relation}')
+            if sub_field not in RESOURCES[resource.embeds[relation].resource].fields:
+                raise ApiError(f'Unknown field "{name}"')
+            embedded_fields.setdefault(relation, []).append(sub_field)
+        elif name in resource.fields:
+            fields.append(name)
+        elif name not in embeds:
+            raise ApiError(f'Unknown field "{name}"')
+    # Embedded objects keep all their fields unless some are named
+    return fields, {name: embedded_fields.get(name, embeds[name]) for name in embeds}
+
+
+def build_queryset(resource, fields, embeds):
+    """A values() queryset returning every column the fields and embeds need, plus the ordering keys"""
+    columns = {resource.fields[name] for name in fields}
+    columns.update(name.lstrip('-') for name in resource.ordering)
+    for name, embedded_fields in embeds.items():
+        embed = resource.embeds[name]
+        target = RESOURCES[embed.resource]
+        columns.update(f'{embed.path}__{target.fields[sub_field]}' for sub_field in embedded_fields)
+        # Tells a missing relation apart from one whose requested fields are all null
+        columns.add(f'{embed.path}__id')
+    return resource.model.objects.order_by(*resource.ordering).values(*sorted(columns))
+
+
+def serialize(resource, row, fields, embeds):
+    """Turn one values() row into the public representation"""
+    item = {name: row[resource.fields[name]] for name in fields}
+    for name, embedded_fields in embeds.items():
+        embed = resource.embeds[name]
+        target = RESOURCES[embed.resource]
+        if row[f'{embed.path}__id'] is None:
+            item[name] = None
+        else:
+            item[name] = {
+                sub_field: row[f'{embed.path}__{target.fields[sub_field]}'] for sub_field in embedded_fields
+            }
+    return item
+
+
+def page_size(params):
+    try:
+        limit = int(params.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit must be a number')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def list_document(resource_name, params, page_url):
+    """One page of a resource as ``{'results': [...], 'next': url, 'previous': url}``"""
+    resource = RESOURCES[resource_name]
+    fields, embeds = parse_fields(resource, params)
+    paginator = CursorPaginator(build_queryset(resource, fields, embeds), page_size(params))
+    try:
+        page = paginator.page(params.get('cursor'))
+    except InvalidCursor:
+        raise ApiError('Invalid cursor')
+    return {
+        'results': [serialize(resource, row, fields, embeds) for row in page],
+        'next': page_url(page.next_cursor) if page.next_cursor else None,
+        'previous': page_url(page.previous_cursor) if page.previous_cursor else None,
+    }
+
+
+def detail_document(resource_name, pk, params):
+    """One object of a resource, or None when it does not exist"""
+    resource = RESOURCES[resource_name]
+    fields, embeds = parse_fields(resource, params)
+    row = build_queryset(resource, fields, embeds).filter(pk=pk).first()
+    if row is None:
+        return None
+    return serialize(resource, row, fields, embeds)
+
+
+def list_state(request, resource):
+    """Validator for the list endpoints: the change counters of the resource and what it embeds"""
+    spec = RESOURCES[resource]
+    models = [spec.model, *(RESOURCES[embed.resource].model for embed in spec.embeds.values())]
+    return version_state(*models)
+
+
+def detail_state(request, resource, pk):
+    """
+    Validator for the detail endpoints: updated_at, ids and counters of the
+    object and of what it can embed
+    """
+    spec = RESOURCES[resource]
+    times = ['updated_at']
+    # Counters (see counters.py) change with F() updates that leave updated_at alone,
+    # and embedded relations can be swapped without changing the object's updated_at
+    values = list(spec.model.counter_fields)
+    for embed in spec.embeds.values():
+        times.append(f'{embed.path}__updated_at')
+        values.append(f'{embed.path}__id')
+        values.extend(f'{embed.path}__{name}' for name in RESOURCES[embed.resource].model.counter_fields)
+    row = spec.model.objects.filter(pk=pk).values(*times, *values).first()
+    if row is None:
+        return None
+    return _latest(*(row[name] for name in times)), [row[name] for name in values]
@@ -0,0 +1,245 @@
+"""
+Content-addressed project attachments and background thumbnailing.
+
+Uploads are hashed chunk by chunk and stored once per SHA-256 digest under
+``blobs/``, so re-uploading the same file reuses the stored copy. Large
+uploads arrive as temporary files (see FILE_UPLOAD_MAX_MEMORY_SIZE) and are
+moved into place rather than read into memory.
+
+The type of an upload is sniffed from its first bytes, never taken from its
+name, and only the types in ATTACHMENT_TYPES are accepted. Blobs are stored
+without an extension and downloaded through the attachment_download view,
+which sends them as attachments with ``X-Content-Type-Options: nosniff``, so
+an upload can't be rendered as a page on the site's origin.
+
+Images get WebP thumbnails at each of settings.THUMBNAIL_WIDTHS. They are
+generated after the upload's transaction commits, in a pool of
+settings.THUMBNAIL_WORKERS threads, so the request never waits on image
+decoding. Thumbnailing needs Pillow; without it images are listed as plain
+files. Run ``manage.py generate_thumbnails`` to catch up on blobs whose
+thumbnails were never made (e.g. the process restarted mid-queue).
+"""
+import codecs
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, close_old_connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Attachment, Blob, Project
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# Leading bytes -> content type of the accepted binary formats
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+    (b'PK\x03\x04', 'application/zip'),
+)
+
+ATTACHMENT_TYPES = {content_type for _, content_type in SIGNATURES} | {'image/webp', 'text/plain'}
+
+SNIFF_SIZE = 512
+
+
+def sniff_content_type(uploaded):
+    """
+    The content type of an upload judged by its first bytes, or None when it
+    is not one of ATTACHMENT_TYPES. Text is anything that is valid UTF-8
+    without NUL bytes and doesn't start with markup (HTML, SVG, XML).
+    """
+    uploaded.seek(0)
+    head = uploaded.read(SNIFF_SIZE)
+    uploaded.seek(0)
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if b'\0' not in head and not head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<'):
+        try:
+            # Not final: the sample may end inside a multi-byte character
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        except UnicodeDecodeError:
+            return None
+        return 'text/plain'
+    return None
+
+
+def blob_name(digest):
+    """Storage name of a blob: fanned out by digest prefix, with no extension for a server to go by"""
+    return f'blobs/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def thumbnail_name(digest, width):
+    return f'thumbs/{digest[:2]}/{digest[2:4]}/{digest}-{width}.webp'
+
+
+def store_blob(uploaded):
+    """
+    Store an uploaded file under its content hash, reusing an identical
+    existing blob, and return the Blob. The upload must be one of
+    ATTACHMENT_TYPES (see sniff_content_type).
+    """
+    content_type = sniff_content_type(uploaded)
+    if content_type is None:
+        raise ValueError(f'{uploaded.name} is not an accepted attachment type')
+
+    digest = hashlib.sha256()
+    for chunk in uploaded.chunks():
+        digest.update(chunk)
+    digest = digest.hexdigest()
+
+    blob = Blob.objects.filter(sha256=digest).first()
+    if blob is not None:
+        return blob
+
+    name = blob_name(digest)
+    if not default_storage.exists(name):
+        uploaded.seek(0)
+        saved = default_storage.save(name, uploaded)
+        if saved != name:
+            # A concurrent upload of the same content got there first
+            default_storage.delete(saved)
+
+    blob, created = Blob.objects.get_or_create(
+        sha256=digest,
+        defaults={'file': name, 'size': uploaded.size, 'content_type': content_type},
+    )
+    if created:
+        schedule_thumbnails(blob.pk)
+    return blob
+
+
+def add_attachments(project, files):
+    """Attach uploaded files to a project; files it already has are skipped"""
+    added = []
+    with transaction.atomic():
+        for uploaded in files:
+            blob = store_blob(uploaded)
+            try:
+                with transaction.atomic():
+                    added.append(Attachment.objects.create(project=project, blob=blob, name=uploaded.name))
+            except IntegrityError:
+                continue
+        if added:
+            # Invalidate the project page's conditional GET validators
+            Project.objects.filter(pk=project.pk).update(updated_at=timezone.now())
+    return added
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _run_in_worker(sha256):
+    try:
+        generate_thumbnails(sha256)
+    except Exception:
+        logger.exception('Thumbnailing blob %s failed', sha256)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnails(sha256):
+    """Generate a blob's thumbnails in the worker pool once the transaction commits"""
+    if getattr(settings, 'THUMBNAIL_WORKERS', 0) > 0:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, sha256))
+    else:
+        transaction.on_commit(lambda: generate_thumbnails(sha256))
+
+
+def render_thumbnails(image, digest):
+    """Save WebP thumbnails of image at every configured width narrower than it"""
+    thumbnails = {}
+    widths = sorted((width for width in settings.THUMBNAIL_WIDTHS if width < image.width), reverse=True)
+    # Shrink from the largest size down, so each resize works on a smaller source
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, 'WEBP', quality=THUMBNAIL_QUALITY)
+        name = thumbnail_name(digest, width)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        thumbnails[str(width)] = default_storage.save(name, ContentFile(output.getvalue()))
+    return thumbnails
+
+
+def generate_thumbnails(sha256):
+    """Make the thumbnails of one blob and mark it processed"""
+    blob = Blob.objects.filter(sha256=sha256).first()
+    if blob is None:
+        return
+    fields = {'processed_at': timezone.now()}
+
+    if Image is not None and blob.is_image:
+        try:
+            with blob.file.open('rb') as f:
+                image = Image.open(f)
+                fields['width'], fields['height'] = image.size
+                # Let JPEG decode at a reduced scale when that is all we need
+                largest = max(settings.THUMBNAIL_WIDTHS)
+                image.draft('RGB', (largest, largest))
+                image = ImageOps.exif_transpose(image)
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+                fields['thumbnails'] = render_thumbnails(image, sha256)
+        except (OSError, ValueError, Image.DecompressionBombError) as error:
+            logger.warning('Cannot make thumbnails of blob %s: %s', sha256, error)
+
+    Blob.objects.filter(sha256=sha256).update(**fields)
+    # Project pages showing this blob change once its thumbnails exist
+    Project.objects.filter(attachments__blob_id=sha256).update(updated_at=timezone.now())
+
+
+def attachment_context(attachment):
+    """Template data for one attachment: thumbnail src/srcset for images, a link otherwise"""
+    blob = attachment.blob
+    context = {
+        'name': attachment.name,
+        'url': reverse('attachment_download', args=[attachment.pk]),
+        'size': blob.size,
+        'is_image': blob.is_image,
+        'pending': blob.is_image and blob.processed_at is None,
+        'thumbnail': None,
+        'srcset': '',
+    }
+    if blob.thumbnails:
+        widths = sorted(blob.thumbnails, key=int)
+        context['thumbnail'] = default_storage.url(blob.thumbnails[widths[0]])
+        context['srcset'] = ', '.join(
+            f'{default_storage.url(blob.thumbnails[width])} {width}w' for width in widths
+        )
+    elif blob.is_image and blob.width and blob.width <= min(settings.THUMBNAIL_WIDTHS):
+        # Already smaller than any thumbnail
+        context['thumbnail'] = context['url']
+    return context
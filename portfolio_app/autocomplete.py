@@ -0,0 +1,233 @@
+"""
+In-memory prefix index for search-as-you-type suggestions.
+
+Project titles, active portfolio titles and student names are split into
+normalized words (case-folded, accents removed), and every word is kept as a
+``(word, kind, id)`` tuple in one sorted list. A prefix lookup is two
+bisections into that list, so suggestions never touch the database.
+
+The index is built on first use from one ``values_list`` scan per model and
+kept current by the post_save/post_delete receivers in signals.py, which
+update single entries once the write commits. Writes those receivers never
+see (bulk imports, seeding, purges, and writes made by other processes) are
+picked up when the index is rebuilt, once it is older than
+AUTOCOMPLETE_MAX_AGE seconds. That rebuild runs in a background thread:
+lookups keep using the old index until the new one is swapped in, and
+signal updates made during the rebuild are replayed onto it first.
+"""
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .models import Student, Portfolio, Project
+
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_LIMIT = 10
+
+# Sorts after any real word that starts with the same prefix
+_PREFIX_END = '\U0010ffff'
+
+
+def normalize(text):
+    """Split text into lowercase words without accents"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r'\w+', text.casefold())
+
+
+class PrefixIndex:
+    """A sorted list of (word, kind, id) tuples with the label of each (kind, id)"""
+
+    def __init__(self, rows=()):
+        self._labels = {(kind, pk): label for kind, pk, label in rows}
+        self._entries = sorted(
+            (word, kind, pk) for (kind, pk), label in self._labels.items() for word in set(normalize(label))
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def add(self, kind, pk, label):
+        """Add or replace the entry for one object"""
+        with self._lock:
+            self._remove(kind, pk)
+            self._labels[kind, pk] = label
+            for word in set(normalize(label)):
+                insort(self._entries, (word, kind, pk))
+
+    def remove(self, kind, pk):
+        with self._lock:
+            self._remove(kind, pk)
+
+    def _remove(self, kind, pk):
+        label = self._labels.pop((kind, pk), None)
+        if label is None:
+            return
+        for word in set(normalize(label)):
+            i = bisect_left(self._entries, (word, kind, pk))
+            if i < len(self._entries) and self._entries[i] == (word, kind, pk):
+                del self._entries[i]
+
+    def _range(self, prefix):
+        """Slice bounds of the entries whose word starts with prefix"""
+        return (
+            bisect_left(self._entries, (prefix,)),
+            bisect_left(self._entries, (prefix + _PREFIX_END,)),
+        )
+
+    def lookup(self, query, kinds=None, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Return up to limit (kind, id, label) entries with a word starting with
+        each word of query, in order of the matched word.
+        """
+        terms = normalize(query)
+        if not terms:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            # Walk the entries of the rarest prefix, keeping objects that match the other words too
+            ranges = sorted((self._range(term) for term in set(terms)), key=lambda bounds: bounds[1] - bounds[0])
+            i, end = ranges[0]
+            matches = None
+            for start, stop in ranges[1:]:
+                keys = {entry[1:] for entry in self._entries[start:stop]}
+                matches = keys if matches is None else matches & keys
+            while i < end and len(results) < limit:
+                _, kind, pk = self._entries[i]
+                i += 1
+                if (kinds and kind not in kinds) or (kind, pk) in seen:
+                    continue
+                seen.add((kind, pk))
+                if matches is None or (kind, pk) in matches:
+                    results.append((kind, pk, self._labels[kind, pk]))
+        return results
+
+
+# Kind -> (default manager queryset, label field)
+SOURCES = {
+    'project': (lambda: Project.objects.all(), 'title'),
+    'portfolio': (lambda: Portfolio.objects.filter(is_active=True), 'title'),
+    'student': (lambda: Student.objects.all(), 'name'),
+}
+
+_index = None
+_built_at = 0.0
+_build_lock = threading.Lock()
+# Guards _pending and swapping in a rebuilt index
+_swap_lock = threading.Lock()
+# Changes made while a background rebuild runs, or None when none is running
+_pending = None
+
+
+def build_index():
+    """Read every suggestion from the database into a new index"""
+    rows = []
+    for kind, (queryset, field) in SOURCES.items():
+        rows.extend((kind, pk, label) for pk, label in queryset().values_list('id', field).iterator())
+    return PrefixIndex(rows)
+
+
+def get_index():
+    """
+    Return the index, building it on first use. Once it is older than
+    AUTOCOMPLETE_MAX_AGE, a rebuild starts in the background and the old
+    index keeps answering until it is done.
+    """
+    global _index, _built_at
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _index = build_index()
+                _built_at = time.monotonic()
+    elif time.monotonic() - _built_at > settings.AUTOCOMPLETE_MAX_AGE:
+        _start_refresh()
+    return _index
+
+
+def _start_refresh():
+    global _pending
+    with _swap_lock:
+        if _pending is not None:
+            return  # Already running
+        _pending = []
+    threading.Thread(target=_refresh_in_background, name='autocomplete-refresh', daemon=True).start()
+
+
+def _refresh_in_background():
+    global _pending, _built_at
+    try:
+        refresh_index()
+    except Exception:
+        logger.exception('Rebuilding the autocomplete index failed')
+        with _swap_lock:
+            # Keep the old index and try again after another AUTOCOMPLETE_MAX_AGE
+            _pending = None
+            _built_at = time.monotonic()
+    finally:
+        connections.close_all()
+
+
+def refresh_index():
+    """Build a new index and swap it in, with the changes made while it was being read"""
+    global _index, _built_at, _pending
+    index = build_index()
+    with _swap_lock:
+        for change in _pending or ():
+            change(index)
+        _index, _built_at, _pending = index, time.monotonic(), None
+
+
+def reset_index():
+    """Drop the index; the next lookup rebuilds it"""
+    global _index, _pending
+    with _swap_lock:
+        _index = _pending = None
+
+
+def suggest(query, kinds=None, limit=AUTOCOMPLETE_LIMIT):
+    return get_index().lookup(query, kinds, limit)
+
+
+def _apply(change):
+    # An index that has not been built yet will read the row when it is
+    with _swap_lock:
+        if _index is not None:
+            change(_index)
+        if _pending is not None:
+            _pending.append(change)
+
+
+def schedule_update(kind, pk, label, visible=True):
+    """Add, replace or (when not visible) remove one entry once the current transaction commits"""
+    if visible:
+        transaction.on_commit(lambda: _apply(lambda index: index.add(kind, pk, label)))
+    else:
+        schedule_removal(kind, pk)
+
+
+def schedule_removal(kind, pk):
+    transaction.on_commit(lambda: _apply(lambda index: index.remove(kind, pk)))
+
+
+def schedule_children_update(portfolio_id, visible):
+    """Show or hide the projects and student of a portfolio that was soft-deleted or restored"""
+    if _index is None:
+        return
+    rows = [
+        *(('project', pk, title) for pk, title in
+          Project.all_objects.filter(portfolio_id=portfolio_id).values_list('id', 'title')),
+        *(('student', pk, name) for pk, name in
+          Student.all_objects.filter(Portfolio_id=portfolio_id, deleted_at=None).values_list('id', 'name')),
+    ]
+    for kind, pk, label in rows:
+        schedule_update(kind, pk, label, visible)
@@ -0,0 +1,57 @@
+"""
+Authentication backend that caches permission sets across requests.
+
+ModelBackend loads a user's user-level and group-level permissions from the
+database on every request that checks one. CachingModelBackend keeps both
+sets in the cache, keyed by user id and a global permissions version.
+Signals bump the version whenever group memberships, group permissions or
+user permissions change, which orphans every cached entry at once.
+
+The version is a ContentVersion row rather than a cache entry, so a bump
+made by one server process reaches every other one, even when each has its
+own local-memory cache. Reading it is one primary-key query per request
+that checks a permission.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .conditional import bump_counter
+from .models import ContentVersion
+
+
+PERMISSIONS_VERSION_NAME = 'permissions'
+PERMISSIONS_CACHE_TIMEOUT = 60 * 60
+
+
+def permissions_version():
+    return ContentVersion.objects.filter(name=PERMISSIONS_VERSION_NAME).values_list('version', flat=True).first() or 0
+
+
+def bump_permissions_version():
+    """Invalidate every cached permission set"""
+    bump_counter(PERMISSIONS_VERSION_NAME)
+
+
+class CachingModelBackend(ModelBackend):
+    """ModelBackend whose user and group permission sets are cached between requests"""
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+
+        perm_cache_name = '_%s_perm_cache' % from_name
+        if not hasattr(user_obj, perm_cache_name):
+            # Superusers hold every permission, so the flag is part of the key
+            key = 'portfolio_app:permissions:%s:%d:%s' % (
+                user_obj.pk, user_obj.is_superuser, permissions_version(),
+            )
+            perms = cache.get(key)
+            if perms is None:
+                perms = {
+                    name: super(CachingModelBackend, self)._get_permissions(user_obj, None, name)
+                    for name in ('user', 'group')
+                }
+                cache.set(key, perms, PERMISSIONS_CACHE_TIMEOUT)
+            user_obj._user_perm_cache = perms['user']
+            user_obj._group_perm_cache = perms['group']
+        return getattr(user_obj, perm_cache_name)
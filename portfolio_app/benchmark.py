@@ -0,0 +1,207 @@
+"""
+Route benchmark harness.
+
+run_benchmark() requests every named route in portfolio_app.urls with the
+test client and records latency percentiles and SQL query counts per route.
+URL arguments are filled with ids from the current database. Routes that
+redirect anonymous visitors to the login page, or refuse them, are requested
+as a staff user: an existing account when benchmarking a real database,
+or a superuser created for the run in a throwaway seeded one. Routes whose
+view only accepts POST are skipped.
+compare() checks a result set against a stored baseline: a route regresses
+when it runs more queries than before, or when its median latency grows by
+more than the given tolerance (tail percentiles are recorded but too noisy on
+shared machines to gate on).
+"""
+import logging
+import math
+import platform
+import time
+from contextlib import ExitStack, contextmanager
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import api, urls
+from .metrics import QueryCounter
+from .models import Student, Portfolio, Project, Attachment
+
+
+# URL keyword arguments and the model whose ids fill them
+URL_ARGUMENTS = {
+    'portfolio_id': Portfolio,
+    'project_id': Project,
+    'student_id': Student,
+    'attachment_id': Attachment,
+}
+
+BENCHMARK_USER = 'benchmark-staff'
+
+# Latency changes smaller than this many milliseconds are treated as noise
+MIN_LATENCY_MS = 2.0
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(len(ordered) * pct / 100))
+    return ordered[rank - 1]
+
+
+def sample_id(model):
+    """A representative id of a model: the middle row of its table, or None when it is empty"""
+    pks = model.objects.order_by('id').values_list('id', flat=True)
+    count = pks.count()
+    return pks[count // 2] if count else None
+
+
+def sample_ids():
+    """A representative id for each URL argument"""
+    return {argument: sample_id(model) for argument, model in URL_ARGUMENTS.items()}
+
+
+def _argument_ids(pattern, ids):
+    """Fill in a pattern's URL arguments; the API's ``pk`` takes the model of the route's resource"""
+    kwargs = {}
+    for argument in pattern.pattern.converters:
+        if argument == 'pk' and 'resource' in pattern.default_args:
+            kwargs[argument] = sample_id(api.RESOURCES[pattern.default_args['resource']].model)
+        else:
+            kwargs[argument] = ids.get(argument)
+    return kwargs
+
+
+def routes():
+    """(name, url) for every named route in portfolio_app.urls that can be filled in"""
+    ids = sample_ids()
+    found = []
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name:
+            continue
+        kwargs = _argument_ids(pattern, ids)
+        if any(value is None for value in kwargs.values()):
+            continue
+        found.append((pattern.name, reverse(pattern.name, kwargs=kwargs)))
+    return found
+
+
+def timed_get(client, url):
+    """GET url, reading any streamed body; returns (response, seconds, queries)"""
+    counter = QueryCounter()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        response = client.get(url)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+    return response, time.perf_counter() - started, counter.count
+
+
+@contextmanager
+def _quiet_request_log():
+    """Keep django.request from logging the expected 403s and 405s of probing requests"""
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    request_logger.setLevel(logging.ERROR)
+    try:
+        yield
+    finally:
+        request_logger.setLevel(level)
+
+
+def needs_staff(client, url):
+    """Whether an anonymous GET of url is refused or redirected to the login page"""
+    with _quiet_request_log():
+        response = client.get(url)
+    if response.status_code == 403:
+        return True
+    return response.status_code == 302 and response.url.startswith(settings.LOGIN_URL)
+
+
+def staff_client(username=None):
+    """
+    A client logged in as the existing staff user username. Without one, a
+    superuser is created for the run: only do that in a throwaway database.
+    """
+    if username is None:
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USER, defaults={'is_staff': True, 'is_superuser': True},
+        )
+    else:
+        user = User.objects.get(username=username, is_staff=True)
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def run_benchmark(iterations=20, warmup=2, names=None, staff_user=None):
+    """Benchmark every route (or only ``names``) and return the results document"""
+    anonymous, staff = Client(), staff_client(staff_user)
+    results = {}
+    for name, url in routes():
+        if names and name not in names:
+            continue
+        client = staff if needs_staff(anonymous, url) else anonymous
+        with _quiet_request_log():
+            if client.get(url).status_code == 405:
+                continue  # POST only, like the restore views
+
+        for _ in range(warmup):
+            timed_get(client, url)
+        latencies, queries, statuses = [], [], set()
+        for _ in range(iterations):
+            response, seconds, count = timed_get(client, url)
+            latencies.append(seconds * 1000)
+            queries.append(count)
+            statuses.add(response.status_code)
+
+        results[name] = {
+            'url': url,
+            'user': 'staff' if client is staff else 'anonymous',
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries': max(queries),
+        }
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'iterations': iterations,
+        'dataset': {
+            'students': Student.objects.count(),
+            'portfolios': Portfolio.objects.count(),
+            'projects': Project.objects.count(),
+        },
+        'routes': results,
+    }
+
+
+def compare(results, baseline, tolerance=0.5):
+    """
+    List the regressions of results against baseline as human-readable
+    strings. Routes missing from either side are ignored.
+    """
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: {current['queries']} queries (baseline {previous['queries']})")
+        limit = max(previous['p50_ms'] * (1 + tolerance), previous['p50_ms'] + MIN_LATENCY_MS)
+        if current['p50_ms'] > limit:
+            regressions.append(
+                f"{name}: p50 {current['p50_ms']:.1f}ms (baseline {previous['p50_ms']:.1f}ms, "
+                f"limit {limit:.1f}ms)"
+            )
+    return regressions
@@ -0,0 +1,169 @@
+"""
+Conditional GET support for the public pages.
+
+Each page has a validator function that runs one cheap query and returns the
+page's last modification time plus a list of values that change whenever the
+rendered output would. Detail pages read the updated_at columns of the rows
+they show (row counts catch deletes, ids catch reassignments); list pages read
+the per-model ContentVersion counters that signals bump on every write.
+The ETag is a hash of those values and the viewing user, so a repeat visitor
+sending If-None-Match or If-Modified-Since gets a 304 without the view or
+template engine running.
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib import messages
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Student, Portfolio, Project, ContentVersion
+
+
+def _latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def bump_version(model):
+    """Record a change to model's table for the list page validators"""
+    bump_counter(model._meta.model_name)
+
+
+def bump_counter(name):
+    """Increment one ContentVersion counter, creating it on first use"""
+    updated = ContentVersion.objects.filter(name=name).update(
+        version=F('version') + 1, updated_at=timezone.now(),
+    )
+    if not updated:
+        ContentVersion.objects.get_or_create(name=name, defaults={'version': 1})
+
+
+def version_state(*models):
+    """Latest change time and change counters of the given models, in one query"""
+    names = [model._meta.model_name for model in models]
+    rows = {
+        name: (version, updated_at)
+        for name, version, updated_at in ContentVersion.objects.filter(name__in=names)
+        .values_list('name', 'version', 'updated_at')
+    }
+    return (
+        _latest(*(updated_at for _, updated_at in rows.values())),
+        [rows.get(name, (0, None))[0] for name in names],
+    )
+
+
+def index_state(request):
+    return version_state(Portfolio, Project, Student)
+
+
+def project_list_state(request):
+    return version_state(Project, Portfolio)
+
+
+def student_list_state(request):
+    return version_state(Student, Portfolio)
+
+
+def portfolio_state(request, portfolio_id):
+    row = (
+        Portfolio.objects.filter(pk=portfolio_id)
+        .annotate(projects_updated_at=Max('project__updated_at'))
+        .values('updated_at', 'student__id', 'student__updated_at', 'projects_updated_at', 'project_count')
+        .first()
+    )
+    if row is None:
+        return None
+    last_modified = _latest(row['updated_at'], row['student__updated_at'], row['projects_updated_at'])
+    return last_modified, [row['student__id'], row['project_count']]
+
+
+def project_state(request, project_id):
+    row = (
+        Project.objects.filter(pk=project_id)
+        .values('updated_at', 'portfolio_id', 'portfolio__updated_at',
+                'portfolio__student__id', 'portfolio__student__updated_at', 'related__project_ids')
+        .first()
+    )
+    if row is None:
+        return None
+    related_ids = row['related__project_ids'] or []
+    # The page shows the related projects' titles, so edits to them count too
+    related = {'updated_at': None, 'count': 0}
+    if related_ids:
+        related = Project.objects.filter(pk__in=related_ids).aggregate(
+            updated_at=Max('updated_at'), count=Count('pk'),
+        )
+    last_modified = _latest(
+        row['updated_at'], row['portfolio__updated_at'], row['portfolio__student__updated_at'],
+        related['updated_at'],
+    )
+    return last_modified, [
+        row['portfolio_id'], row['portfolio__student__id'], related_ids, related['updated_at'], related['count'],
+    ]
+
+
+def student_state(request, student_id):
+    row = (
+        Student.objects.filter(pk=student_id)
+        .annotate(projects_updated_at=Max('Portfolio__project__updated_at'))
+        .values('updated_at', 'Portfolio_id', 'Portfolio__updated_at', 'projects_updated_at',
+                'Portfolio__project_count')
+        .first()
+    )
+    if row is None:
+        return None
+    last_modified = _latest(row['updated_at'], row['Portfolio__updated_at'], row['projects_updated_at'])
+    return last_modified, [row['Portfolio_id'], row['Portfolio__project_count']]
+
+
+def _has_pending_messages(request):
+    return bool(len(messages.get_messages(request)))
+
+
+def conditional_page(state_func):
+    """
+    Answer If-None-Match / If-Modified-Since with a 304 using state_func as
+    the validator, and add ETag and Last-Modified headers to full responses.
+
+    state_func takes the view's arguments and returns
+    ``(last_modified, values)``, or None when the object does not exist.
+    The view finds the state in ``request.validator_state``.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _has_pending_messages(request):
+                return view_func(request, *args, **kwargs)
+
+            state = state_func(request, *args, **kwargs)
+            if state is None:
+                return view_func(request, *args, **kwargs)
+
+            # Lets the view reuse what the validator read
+            request.validator_state = state
+            last_modified, values = state
+            key = repr([last_modified, values, request.user.pk]).encode()
+            etag = quote_etag(hashlib.md5(key, usedforsecurity=False).hexdigest())
+            # Last-Modified can't vary by user, so it's only used for anonymous pages
+            if request.user.is_authenticated:
+                last_modified = None
+            # HTTP dates have one-second resolution
+            last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified_ts,
+            )
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            if not response.has_header('ETag'):
+                response.headers['ETag'] = etag
+            if last_modified_ts and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified_ts)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,84 @@
+"""
+Denormalized counters: Portfolio.project_count and the SiteStats row.
+
+Signal handlers adjust them with F() updates as portfolios, projects and
+students are created, moved, activated or deleted. Model saves (see
+CountedModel) and deletes run in a transaction, so a counter never commits
+without the change it counts. The home page and the portfolio cards read
+the totals instead of counting rows on every request.
+
+Bulk writes that skip signals (imports, seeding) adjust the counters
+themselves. recount() is what ``manage.py recount`` runs to repair any
+drift.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Student, Portfolio, Project, SiteStats
+
+
+SITE_STATS_ID = 1
+
+
+def _adjusted(field, delta):
+    # Clamp at zero: a drifted counter must not make deletes fail
+    return Greatest(F(field) + delta, Value(0))
+
+
+def adjust_site_stats(**deltas):
+    """Add deltas to the SiteStats counters, e.g. adjust_site_stats(projects=1)"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = SiteStats.objects.filter(pk=SITE_STATS_ID).update(
+        **{field: _adjusted(field, delta) for field, delta in deltas.items()}
+    )
+    if not updated:
+        # First write since the table was emptied; counting includes this change
+        recount_site_stats()
+
+
+def adjust_project_count(portfolio_id, delta):
+    if portfolio_id is not None and delta:
+        Portfolio.objects.filter(pk=portfolio_id).update(project_count=_adjusted('project_count', delta))
+
+
+def adjust_project_counts(deltas):
+    """Apply {portfolio_id: delta} with one UPDATE per distinct delta"""
+    by_delta = {}
+    for portfolio_id, delta in deltas.items():
+        if portfolio_id is not None and delta:
+            by_delta.setdefault(delta, []).append(portfolio_id)
+    for delta, portfolio_ids in by_delta.items():
+        Portfolio.objects.filter(pk__in=portfolio_ids).update(project_count=_adjusted('project_count', delta))
+
+
+def recount_site_stats():
+    """Recount the site totals; returns the SiteStats row"""
+    stats, _ = SiteStats.objects.update_or_create(pk=SITE_STATS_ID, defaults={
+        'active_portfolios': Portfolio.objects.filter(is_active=True).count(),
+        'students': Student.objects.count(),
+        'projects': Project.objects.count(),
+    })
+    return stats
+
+
+def recount_projects():
+    """Correct every Portfolio.project_count that has drifted; returns how many were wrong"""
+    counts = (
+        Project.objects.filter(portfolio=OuterRef('pk')).order_by()
+        .values('portfolio').annotate(count=Count('*')).values('count')
+    )
+    actual = Coalesce(Subquery(counts), 0)
+    return Portfolio.objects.exclude(project_count=actual).update(project_count=actual)
+
+
+def recount():
+    """Recount everything; returns (portfolios corrected, SiteStats row)"""
+    return recount_projects(), recount_site_stats()
+
+
+def get_site_stats():
+    """The SiteStats row, counting it first if it does not exist yet"""
+    stats = SiteStats.objects.filter(pk=SITE_STATS_ID).first()
+    return stats if stats is not None else recount_site_stats()
@@ -0,0 +1,77 @@
+"""
+The home page payload, cached under the change counters of the models it
+shows (see conditional.version_state). Every write bumps a counter in the
+database, so each server process moves to a fresh key on its next request
+however its cache is shared, and the cached page always matches the ETag
+sent with it.
+"""
+from django.core.cache import cache
+
+from . import counters
+from .conditional import bump_version, version_state
+from .models import Student, Portfolio, Project
+
+
+DASHBOARD_CACHE_TIMEOUT = 60 * 5
+# The same models, in the same order, as the home page validator (conditional.index_state)
+DASHBOARD_MODELS = (Portfolio, Project, Student)
+
+# Number of portfolio cards and student links shown on the home page
+DASHBOARD_PORTFOLIO_LIMIT = 12
+DASHBOARD_STUDENT_LIMIT = 5
+DASHBOARD_PROJECT_LIMIT = 6
+
+
+def get_site_stats():
+    """Return portfolio, student and project totals from the counters row"""
+    stats = counters.get_site_stats()
+    return {
+        'total_portfolios': stats.active_portfolios,
+        'total_students': stats.students,
+        'total_projects': stats.projects,
+    }
+
+
+def build_dashboard():
+    """Build the home page payload with a fixed number of queries"""
+    dashboard = get_site_stats()
+
+    # Bounded lists; the student is joined in so cards don't query per row
+    dashboard['active_portfolios'] = list(
+        Portfolio.objects.filter(is_active=True)
+        .select_related('student')
+        .order_by('-id')[:DASHBOARD_PORTFOLIO_LIMIT]
+    )
+
+    # Fetch one extra row so the template knows whether to link to the full list
+    dashboard['students_with_portfolios'] = list(
+        Student.objects.filter(Portfolio__isnull=False)
+        .order_by('name', 'id')[:DASHBOARD_STUDENT_LIMIT + 1]
+    )
+
+    dashboard['recent_projects'] = list(
+        Project.objects.select_related('portfolio')
+        .order_by('-id')[:DASHBOARD_PROJECT_LIMIT]
+    )
+
+    return dashboard
+
+
+def get_dashboard(state=None):
+    """
+    Return the cached home page payload, building it on a miss. state is the
+    version_state() of DASHBOARD_MODELS when the caller has already read it.
+    """
+    _, versions = state or version_state(*DASHBOARD_MODELS)
+    key = 'portfolio_app:dashboard:{}:{}:{}'.format(*versions)
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard()
+        cache.set(key, dashboard, DASHBOARD_CACHE_TIMEOUT)
+    return dashboard
+
+
+def invalidate_dashboard():
+    """Make every process rebuild the home page, e.g. after counters were changed in bulk"""
+    for model in DASHBOARD_MODELS:
+        bump_version(model)
@@ -0,0 +1,95 @@
+"""
+SQLite connection tuning and read/write routing.
+
+configure_sqlite() runs on every new SQLite connection and applies
+settings.SQLITE_PRAGMAS: WAL journaling so readers never block the writer,
+relaxed fsyncs, a larger page cache and memory map, and a busy timeout so
+concurrent writers wait for the lock instead of failing with "database is
+locked".
+
+When settings.DATABASES has a ``replica`` alias (a read-only connection to
+the same file, or a copy kept up to date by an external tool),
+ReadWriteRouter sends reads made while handling safe requests there and
+everything else to ``default``. ReadWriteRoutingMiddleware pins a client to
+the primary for settings.DATABASE_STICKY_SECONDS after it writes, so users
+always read their own writes even from a lagging replica.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+STICKY_COOKIE = 'db_primary'
+
+# Reads only go to the replica while this is set; management commands,
+# shells and unsafe requests always use the primary
+_replica_allowed = ContextVar('replica_allowed', default=False)
+
+
+def configure_sqlite(connection):
+    """Apply settings.SQLITE_PRAGMAS to a new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    name = str(connection.settings_dict['NAME'])
+    read_only = 'mode=ro' in name
+    in_memory = connection.creation.is_in_memory_db(name)
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            # The journal mode is a property of the database file
+            if pragma == 'journal_mode' and (read_only or in_memory):
+                continue
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def replica_configured():
+    return REPLICA in connections.settings
+
+
+class ReadWriteRouter:
+    """Send reads to the replica during safe requests, and everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_allowed.get() or not replica_configured():
+            return PRIMARY
+        # Reads inside a transaction must see its uncommitted writes
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReadWriteRoutingMiddleware:
+    """Allow replica reads for GET/HEAD requests from clients that haven't written recently"""
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in self.SAFE_METHODS
+        token = _replica_allowed.set(safe and STICKY_COOKIE not in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_allowed.reset(token)
+
+        if not safe and replica_configured():
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=getattr(settings, 'DATABASE_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
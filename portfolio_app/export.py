@@ -0,0 +1,130 @@
+"""
+Streaming export of every portfolio with its student and projects.
+
+Portfolios (joined to their student) and projects are read as two
+``values()`` streams ordered by portfolio id and merged as they go, so no
+model instances are built and only ``chunk_size`` rows of each stream are in
+memory at once. Output is produced in small blocks, optionally gzipped on
+the fly, for StreamingHttpResponse or a file.
+"""
+import csv
+import io
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Portfolio, Project
+
+
+PORTFOLIO_COLUMNS = ('id', 'title', 'about', 'contact_email', 'is_active')
+STUDENT_COLUMNS = ('id', 'name', 'email', 'major')
+PROJECT_COLUMNS = ('id', 'title', 'description')
+
+CSV_HEADER = (
+    [f'portfolio_{column}' for column in PORTFOLIO_COLUMNS]
+    + [f'student_{column}' for column in STUDENT_COLUMNS]
+    + [f'project_{column}' for column in PROJECT_COLUMNS]
+)
+
+CHUNK_SIZE = 2000
+BLOCK_SIZE = 64 * 1024
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def iter_portfolios(chunk_size=CHUNK_SIZE):
+    """
+    Yield (portfolio, student, projects) for every portfolio in id order, where
+    each item is a plain dict (student may be None).
+    """
+    portfolios = (
+        Portfolio.objects.order_by('id')
+        .values(*PORTFOLIO_COLUMNS, *(f'student__{column}' for column in STUDENT_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+    projects = (
+        Project.objects.order_by('portfolio_id', 'id')
+        .values('portfolio_id', *PROJECT_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    project = next(projects, None)
+    for row in portfolios:
+        portfolio = {column: row[column] for column in PORTFOLIO_COLUMNS}
+        student = None
+        if row['student__id'] is not None:
+            student = {column: row[f'student__{column}'] for column in STUDENT_COLUMNS}
+
+        portfolio_projects = []
+        # Both streams are ordered by portfolio id; skip projects whose
+        # portfolio was deleted between the two reads
+        while project is not None and project['portfolio_id'] <= portfolio['id']:
+            if project.pop('portfolio_id') == portfolio['id']:
+                portfolio_projects.append(project)
+            project = next(projects, None)
+
+        yield portfolio, student, portfolio_projects
+
+
+def jsonl_lines(chunk_size=CHUNK_SIZE):
+    """One JSON document per portfolio"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for portfolio, student, projects in iter_portfolios(chunk_size):
+        yield encoder.encode(dict(portfolio, student=student, projects=projects)) + '\n'
+
+
+def csv_lines(chunk_size=CHUNK_SIZE):
+    """One CSV row per project; portfolios without projects get one row of their own"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(CSV_HEADER)
+    empty_student = [''] * len(STUDENT_COLUMNS)
+    empty_project = [''] * len(PROJECT_COLUMNS)
+    for portfolio, student, projects in iter_portfolios(chunk_size):
+        prefix = [portfolio[column] for column in PORTFOLIO_COLUMNS]
+        prefix += [student[column] for column in STUDENT_COLUMNS] if student else empty_student
+        if not projects:
+            yield line(prefix + empty_project)
+        for project in projects:
+            yield line(prefix + [project[column] for column in PROJECT_COLUMNS])
+
+
+def export_chunks(file_format='jsonl', compress=False, chunk_size=CHUNK_SIZE):
+    """Yield the export as bytes blocks of roughly BLOCK_SIZE, gzipped if requested"""
+    lines = csv_lines(chunk_size) if file_format == 'csv' else jsonl_lines(chunk_size)
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    block, size = [], 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            data = b''.join(block)
+            block, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = b''.join(block)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def export_filename(file_format, compress):
+    return f'portfolios.{file_format}' + ('.gz' if compress else '')
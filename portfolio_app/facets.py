@@ -0,0 +1,80 @@
+"""
+Facet counts for the student list: students per major, and how many of
+them have an active portfolio.
+
+All counts for a search term come from one GROUP BY major query. The
+result is cached under a key that includes the Student and Portfolio change
+counters (see conditional.version_state), so any write to either model,
+bulk paths included, makes the next request recount instead of serving
+stale numbers.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .conditional import version_state
+from .models import Student, Portfolio
+from .search import matching
+
+
+FACETS_CACHE_TIMEOUT = 60 * 10
+# Models whose change counters key the cache
+FACET_MODELS = (Student, Portfolio)
+
+
+def _cache_key(search_query, state=None):
+    _, versions = state or version_state(*FACET_MODELS)
+    digest = hashlib.md5(search_query.encode()).hexdigest()
+    return 'portfolio_app:student_facets:{}:{}:{}'.format(*versions, digest)
+
+
+def count_by_major(search_query=''):
+    """Return {major: (students, students with an active portfolio)} for a search term"""
+    students = Student.objects.all()
+    if search_query:
+        students = matching(students, search_query)
+    rows = (
+        students.order_by()
+        .values_list('major')
+        .annotate(total=Count('id'), active=Count('id', filter=Q(Portfolio__is_active=True)))
+    )
+    return {major: (total, active) for major, total, active in rows}
+
+
+def get_counts(search_query='', state=None):
+    """
+    Return the cached count_by_major() for a search term, counting on a
+    miss. state is the version_state() of FACET_MODELS when the caller has
+    already read it.
+    """
+    key = _cache_key(search_query, state)
+    counts = cache.get(key)
+    if counts is None:
+        counts = count_by_major(search_query)
+        cache.set(key, counts, FACETS_CACHE_TIMEOUT)
+    return counts
+
+
+def student_facets(search_query='', major='', active_only=False, state=None):
+    """
+    Facets for the student list. Each facet counts the students matching the
+    search and the other facet's selection, so a count is what you get by
+    clicking it. state is passed on to get_counts().
+    """
+    counts = get_counts(search_query, state)
+    majors = [
+        {
+            'code': code,
+            'label': label,
+            'count': counts.get(code, (0, 0))[1 if active_only else 0],
+            'selected': code == major,
+        }
+        for code, label in Student.MAJOR
+    ]
+    selected = [counts.get(major, (0, 0))] if major else counts.values()
+    return {
+        'majors': majors,
+        'total': sum(total for total, _ in selected),
+        'active': sum(active for _, active in selected),
+    }
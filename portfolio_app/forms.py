@@ -1,9 +1,13 @@
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.forms import ModelForm
 from django.contrib.auth.models import User
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
+from django.urls import reverse_lazy
 from .models import Portfolio, Project, Student
+from .attachments import add_attachments, sniff_content_type
+from .tasks import send_password_reset_email
 import re
 
 class PortfolioForm(forms.ModelForm):
@@ -47,7 +51,94 @@ class PortfolioForm(forms.ModelForm):
         return email
 
 
-class ProjectForm(forms.ModelForm):
+def may_pick_any_portfolio(user):
+    """Staff and instructors (who enroll students) work on everyone's portfolios"""
+    return user is not None and user.is_authenticated and (
+        user.is_staff or user.has_perm('portfolio_app.add_student')
+    )
+
+
+def own_portfolios(user):
+    """
+    The portfolios user may pick, or None for users who may pick any.
+    Everyone else gets only their own portfolio, which is none at all for
+    anonymous users, accounts still being set up and deleted students.
+    """
+    if may_pick_any_portfolio(user):
+        return None
+    if user is None or not user.is_authenticated:
+        return Portfolio.objects.none()
+    return Portfolio.objects.filter(pk__in=Student.all_objects.filter(user=user).values('Portfolio'))
+
+
+def portfolio_choices(user):
+    own = own_portfolios(user)
+    return Portfolio.objects.all() if own is None else own
+
+
+class PortfolioLookupSelect(forms.Select):
+    """
+    A portfolio <select> that renders only the selected option. Other
+    portfolios are fetched from the portfolio_lookup endpoint as the user
+    types, so the page never lists every portfolio.
+    """
+
+    def __init__(self, attrs=None):
+        super().__init__({'data-lookup-url': reverse_lazy('portfolio_lookup'), **(attrs or {})})
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        options = [('', field.empty_label)] if field.empty_label is not None else []
+        selected = [v for v in value if v]
+        if selected:
+            try:
+                instances = self.choices.queryset.filter(pk__in=selected)
+                options.extend((obj.pk, field.label_from_instance(obj)) for obj in instances)
+            except (ValueError, ValidationError):
+                pass  # A tampered value; validation reports it
+        return [
+            (None, [self.create_option(name, option_value, label, str(option_value) in value, index, attrs=attrs)], index)
+            for index, (option_value, label) in enumerate(options)
+        ]
+
+
+class PortfolioPickerMixin:
+    """
+    Scope a form's portfolio field to the portfolios the user may pick.
+    Students get a plain <select> of their own portfolio; staff get the
+    remote-search picker. Validation only looks up the submitted id.
+    """
+    portfolio_field = 'portfolio'
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields[self.portfolio_field]
+        own = own_portfolios(user)
+        if own is not None:
+            field.widget = forms.Select(attrs=field.widget.attrs)
+            field.widget.attrs.pop('data-lookup-url', None)
+            field.queryset = own
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    widget = MultipleFileInput
+
+    def clean(self, data, initial=None):
+        files = data if isinstance(data, (list, tuple)) else [data] if data else []
+        return [super(MultipleFileField, self).clean(f, initial) for f in files]
+
+
+class ProjectForm(PortfolioPickerMixin, forms.ModelForm):
+    attachments = MultipleFileField(
+        required=False,
+        widget=MultipleFileInput(attrs={'class': 'form-control'}),
+        help_text='Images and files to show on the project page.',
+    )
+
     class Meta:
         model = Project
         fields = ['title', 'description', 'portfolio']
@@ -62,7 +153,7 @@ class ProjectForm(forms.ModelForm):
                 'rows': 5,
                 'placeholder': 'Describe your project in detail...'
             }),
-            'portfolio': forms.Select(attrs={
+            'portfolio': PortfolioLookupSelect(attrs={
                 'class': 'form-select',
                 'required': True
             }),
@@ -77,8 +168,26 @@ class ProjectForm(forms.ModelForm):
             raise ValidationError('Title must be at least 3 characters long.')
         return title
 
+    def clean_attachments(self):
+        files = self.cleaned_data.get('attachments') or []
+        limit = settings.ATTACHMENT_MAX_SIZE
+        for f in files:
+            if f.size > limit:
+                raise ValidationError(f'{f.name} is larger than {limit // (1024 * 1024)} MB.')
+            if sniff_content_type(f) is None:
+                raise ValidationError(f'{f.name} is not a supported file type. Upload images, PDFs, ZIP archives or plain text.')
+        return files
+
+    def save(self, commit=True):
+        project = super().save(commit)
+        if commit:
+            add_attachments(project, self.cleaned_data.get('attachments') or [])
+        return project
+
+
+class StudentForm(PortfolioPickerMixin, forms.ModelForm):
+    portfolio_field = 'Portfolio'
 
-class StudentForm(forms.ModelForm):
     class Meta:
         model = Student
         fields = ['name', 'email', 'major', 'Portfolio']
@@ -97,7 +206,7 @@ class StudentForm(forms.ModelForm):
                 'class': 'form-select',
                 'required': True
             }),
-            'Portfolio': forms.Select(attrs={
+            'Portfolio': PortfolioLookupSelect(attrs={
                 'class': 'form-select'
             }),
         }
@@ -106,4 +215,19 @@ class StudentForm(forms.ModelForm):
 class CreateUserForm(UserCreationForm):
     class Meta:
         model = User
-        fields = ['username', 'email', 'password1', 'password2']
\ No newline at end of file
+        fields = ['username', 'email', 'password1', 'password2']
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """
+    Password reset form that queues the email. The job stores the user id,
+    not the rendered email, so the reset link is never written to the queue.
+    """
+
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        site = {name: context[name] for name in ('domain', 'site_name', 'protocol')}
+        send_password_reset_email.delay(
+            context['user'].pk, to_email, site, subject_template_name, email_template_name,
+            from_email, html_email_template_name,
+        )
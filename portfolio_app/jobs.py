@@ -0,0 +1,161 @@
+"""
+A small database-backed job queue.
+
+Decorate a function with @task and call ``func.delay(...)`` to queue it
+instead of running it in the request. The job row is inserted in the
+caller's transaction, so it only becomes visible to workers if the request
+commits. Arguments must be JSON-serializable (pass ids, not model
+instances).
+
+``manage.py run_worker`` claims due jobs in batches and runs them in a
+thread or process pool. Claiming is one transaction that selects due jobs
+and marks them running under a fresh claim token. PostgreSQL and MySQL
+skip rows locked by other workers (SELECT ... FOR UPDATE SKIP LOCKED).
+SQLite transactions here begin IMMEDIATE (see settings.DATABASES), which
+takes the write lock up front, so concurrent claims are serialized and
+never hand out the same job.
+
+A claim lasts JOB_VISIBILITY_TIMEOUT seconds. A worker that dies
+mid-job leaves the claim to lapse, and the job is picked up again, unless
+that was its last attempt: a job that keeps killing its worker is marked
+failed like one that raises. A job
+that raises is retried after an exponential backoff until it has run
+max_attempts times. After that it is kept as failed, with its traceback,
+for inspection in the admin. Finished jobs are deleted.
+"""
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+from functools import update_wrapper
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+# Retry delays double from BACKOFF_BASE seconds up to BACKOFF_MAX
+BACKOFF_BASE = 5
+BACKOFF_MAX = 60 * 60
+
+
+class Task:
+    """A function that can be queued with .delay(); calling it directly still runs it inline"""
+
+    def __init__(self, func, max_attempts):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+        update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Queue a call to run as soon as a worker is free"""
+        return self.schedule(None, *args, **kwargs)
+
+    def schedule(self, delay_seconds, *args, **kwargs):
+        """Queue a call to run no earlier than delay_seconds from now"""
+        run_at = timezone.now()
+        if delay_seconds:
+            run_at += timedelta(seconds=delay_seconds)
+        return Job.objects.create(
+            name=self.name, args=list(args), kwargs=kwargs, run_at=run_at, max_attempts=self.max_attempts,
+        )
+
+
+def task(func=None, *, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Make a function queueable: ``@task`` or ``@task(max_attempts=3)``"""
+    if func is None:
+        return lambda func: Task(func, max_attempts)
+    return Task(func, max_attempts)
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that has failed attempts times, with jitter"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.75, 1.25)
+
+
+def claim_jobs(limit, visibility_timeout=None):
+    """
+    Claim up to limit due jobs (queued and due, or running with a lapsed
+    claim) and return them with their claim token in claimed_by.
+    """
+    if visibility_timeout is None:
+        visibility_timeout = settings.JOB_VISIBILITY_TIMEOUT
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, claimed_until__lt=now)
+    with transaction.atomic():
+        # Lapsed claims on a job's last attempt: the job may well be what brought the worker down
+        Job.objects.filter(status=Job.RUNNING, claimed_until__lt=now, attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, claimed_by='', claimed_until=None,
+            last_error='The claim on the last attempt lapsed; the worker stopped without finishing the job',
+        )
+        jobs = Job.objects.filter(due).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        ids = list(jobs.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(due, id__in=ids).update(
+            status=Job.RUNNING,
+            claimed_by=token,
+            claimed_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F('attempts') + 1,
+        )
+        return list(Job.objects.filter(claimed_by=token).order_by('run_at', 'id'))
+
+
+def run_job(job_id, token):
+    """
+    Run one claimed job and record the outcome; returns True when it
+    succeeded. Outcomes are only written while the claim is still ours.
+    """
+    job = Job.objects.filter(pk=job_id, claimed_by=token).first()
+    if job is None:
+        return False
+    try:
+        func = import_string(job.name)
+        func = getattr(func, 'func', func)
+        func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        claimed = Job.objects.filter(pk=job.pk, claimed_by=token)
+        if job.attempts >= job.max_attempts:
+            logger.error('Job %s (%s) failed for good after %d attempts', job.pk, job.name, job.attempts)
+            claimed.update(status=Job.FAILED, claimed_by='', claimed_until=None, last_error=error)
+        else:
+            delay = backoff(job.attempts)
+            logger.warning('Job %s (%s) failed; retrying in %.0fs', job.pk, job.name, delay)
+            claimed.update(
+                status=Job.QUEUED, claimed_by='', claimed_until=None, last_error=error,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+        return False
+    Job.objects.filter(pk=job.pk, claimed_by=token).delete()
+    return True
+
+
+def run_pending(limit=100):
+    """Claim and run due jobs in this thread until none are left; returns (succeeded, failed)"""
+    succeeded = failed = 0
+    while True:
+        jobs = claim_jobs(limit)
+        if not jobs:
+            return succeeded, failed
+        for job in jobs:
+            if run_job(job.pk, job.claimed_by):
+                succeeded += 1
+            else:
+                failed += 1
@@ -0,0 +1,316 @@
+"""
+Load-testing harness.
+
+run_loadtest() sends a weighted mix of requests from many concurrent asyncio
+clients. Each stage runs for a fixed time at one concurrency level, and the
+levels ramp up to show where throughput stops growing and latency takes off.
+By default requests go straight into the ASGI application
+(django_project.asgi) in this process, so the whole middleware stack runs
+and no server or socket is involved. With a base URL they go over HTTP to a
+running server instead.
+
+Routes are named as in portfolio_app.urls and filled in with ids from the
+database, like the benchmark harness does. GET routes that anonymous
+visitors can't see are requested as a staff user. POST routes submit a
+generated form to the create and update views as the staff user, with a
+CSRF token; they write to the database.
+"""
+import asyncio
+import itertools
+import platform
+import random
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from urllib.parse import urlencode, urlsplit
+
+import django
+from django.conf import settings
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client
+from django.utils import timezone
+
+from . import benchmark
+from .models import Student, Portfolio, Project
+
+
+DEFAULT_MIX = {
+    'GET index': 2,
+    'GET project_list': 2,
+    'GET student_list': 2,
+    'GET portfolio_detail': 3,
+    'GET project_detail': 3,
+    'GET student_detail': 3,
+    'POST project_update': 1,
+}
+
+DEFAULT_CONCURRENCY = (1, 2, 4, 8, 16, 32)
+
+
+def _portfolio_form(n, ids):
+    return {'title': f'Load test portfolio {n}', 'about': 'Created by loadtest',
+            'contact_email': f'loadtest{n}@uccs.edu', 'is_active': 'on'}
+
+
+def _project_form(n, ids):
+    return {'title': f'Load test project {n}', 'description': 'Created by loadtest',
+            'portfolio': ids['portfolio_id']}
+
+
+def _student_form(n, ids):
+    return {'name': f'Load Test {n}', 'email': f'loadtest{n}@uccs.edu', 'major': 'CSCI-BS', 'Portfolio': ''}
+
+
+# POST route name -> function building the form data for the nth request
+FORMS = {
+    'portfolio_create': _portfolio_form,
+    'portfolio_update': _portfolio_form,
+    'project_create': _project_form,
+    'project_update': _project_form,
+    'student_create': _student_form,
+    'student_update': _student_form,
+}
+
+
+class LoadTestError(Exception):
+    """A route mix that can't be run; the message is shown to the user"""
+
+
+@dataclass
+class Route:
+    label: str  # "GET name" or "POST name"
+    method: str
+    path: str
+    weight: float
+    staff: bool = False
+    form: object = None  # POST only: returns the form data for the nth request
+
+
+@dataclass
+class Samples:
+    seconds: list = field(default_factory=list)
+    errors: int = 0
+
+
+def parse_mix(specs):
+    """
+    Turn ``['GET project_list:5', 'POST project_update']`` into
+    {label: weight}. The method defaults to GET and the weight to 1.
+    """
+    mix = {}
+    for spec in specs:
+        label, _, weight = spec.partition(':')
+        method, _, name = label.strip().rpartition(' ')
+        method = method.strip().upper() or 'GET'
+        if method not in ('GET', 'POST'):
+            raise LoadTestError(f'Unsupported method in "{spec}"; use GET or POST')
+        try:
+            weight = float(weight) if weight else 1.0
+        except ValueError:
+            raise LoadTestError(f'Weight in "{spec}" must be a number')
+        if weight <= 0:
+            raise LoadTestError(f'Weight in "{spec}" must be positive')
+        mix[f'{method} {name}'] = weight
+    return mix
+
+
+def build_routes(mix):
+    """Resolve a {label: weight} mix into Routes, with URLs filled in from the database"""
+    urls = dict(benchmark.routes())
+    ids = benchmark.sample_ids()
+    anonymous = Client()
+    routes = []
+    for label, weight in mix.items():
+        method, name = label.split(' ', 1)
+        if name not in urls:
+            raise LoadTestError(f'Unknown route "{name}", or no rows to fill in its URL')
+        url = urls[name]
+        if method == 'POST':
+            if name not in FORMS:
+                raise LoadTestError(f'No form data for POST {name}; choose from: {", ".join(FORMS)}')
+            routes.append(Route(label, method, url, weight, staff=True, form=partial(FORMS[name], ids=ids)))
+        else:
+            routes.append(Route(label, method, url, weight, staff=benchmark.needs_staff(anonymous, url)))
+    return routes
+
+
+def staff_credentials(username=None):
+    """Cookie and headers that make requests as a staff user (see benchmark.staff_client) and pass the CSRF check"""
+    session = benchmark.staff_client(username).cookies[settings.SESSION_COOKIE_NAME].value
+    request = HttpRequest()
+    token = get_token(request)
+    cookie = f'{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={request.META["CSRF_COOKIE"]}'
+    return {'cookie': cookie, 'x-csrftoken': token}
+
+
+class AsgiTransport:
+    """Calls the ASGI application directly, in this process"""
+
+    def __init__(self, host):
+        from django_project.asgi import application
+
+        self.application = application
+        self.host = host
+
+    async def request(self, method, path, headers, body):
+        done = asyncio.Event()
+        status = None
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # Django listens for a disconnect while the view runs; only send it once the response is complete
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                done.set()
+
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', self.host.encode())] + [
+                (name.encode(), value.encode()) for name, value in headers.items()
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            done.set()
+        return status
+
+
+class HttpTransport:
+    """Sends each request over a new HTTP/1.1 connection to a running server"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise LoadTestError('The base URL must look like http://host:port')
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.netloc = parts.netloc
+
+    async def request(self, method, path, headers, body):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            lines = [f'{method} {path} HTTP/1.1', f'Host: {self.netloc}', 'Connection: close',
+                     f'Content-Length: {len(body)}']
+            lines.extend(f'{name}: {value}' for name, value in headers.items())
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            # Read the rest so the server finishes the response
+            while await reader.read(65536):
+                pass
+        finally:
+            writer.close()
+        return int(status_line.split()[1])
+
+
+def summarize(seconds, errors, elapsed):
+    """Throughput, latency percentiles and error rate of one set of requests"""
+    count = len(seconds)
+    milliseconds = [s * 1000 for s in seconds]
+    return {
+        'requests': count,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(benchmark.percentile(milliseconds, 50), 3) if count else None,
+        'p99_ms': round(benchmark.percentile(milliseconds, 99), 3) if count else None,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+    }
+
+
+async def run_stage(transport, routes, credentials, concurrency, duration, rng, counter):
+    """Run concurrency clients for duration seconds; returns the stage results"""
+    samples = {route.label: Samples() for route in routes}
+    weights = [route.weight for route in routes]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+
+    async def client():
+        while loop.time() < deadline:
+            route = rng.choices(routes, weights)[0]
+            headers = dict(credentials) if route.staff else {}
+            body = b''
+            if route.form is not None:
+                body = urlencode(route.form(next(counter))).encode()
+                headers['content-type'] = 'application/x-www-form-urlencoded'
+            started = time.perf_counter()
+            try:
+                status = await transport.request(route.method, route.path, headers, body)
+            except Exception:
+                status = None
+            sample = samples[route.label]
+            sample.seconds.append(time.perf_counter() - started)
+            if status is None or status >= 400:
+                sample.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        **summarize(
+            [s for sample in samples.values() for s in sample.seconds],
+            sum(sample.errors for sample in samples.values()),
+            elapsed,
+        ),
+        'routes': {label: summarize(sample.seconds, sample.errors, elapsed) for label, sample in samples.items()},
+    }
+
+
+def run_loadtest(mix=None, concurrency=DEFAULT_CONCURRENCY, duration=10.0, base_url=None, host='localhost', seed=0,
+                 staff_user=None):
+    """
+    Ramp through the concurrency levels against the in-process ASGI app (or
+    base_url) and return the results document.
+    """
+    routes = build_routes(mix or DEFAULT_MIX)
+    credentials = staff_credentials(staff_user) if any(route.staff for route in routes) else {}
+    transport = HttpTransport(base_url) if base_url else AsgiTransport(host)
+    rng = random.Random(seed)
+    counter = itertools.count(1)
+
+    async def ramp():
+        return [
+            await run_stage(transport, routes, credentials, level, duration, rng, counter)
+            for level in concurrency
+        ]
+
+    stages = asyncio.run(ramp())
+    peak = max(stages, key=lambda stage: stage['throughput_rps'])
+    return {
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'target': base_url or 'asgi',
+        'duration_s': duration,
+        'mix': {route.label: route.weight for route in routes},
+        'dataset': {
+            'students': Student.objects.count(),
+            'portfolios': Portfolio.objects.count(),
+            'projects': Project.objects.count(),
+        },
+        'stages': stages,
+        'peak': {'concurrency': peak['concurrency'], 'throughput_rps': peak['throughput_rps']},
+    }
@@ -0,0 +1,109 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from portfolio_app.benchmark import compare, run_benchmark
+from portfolio_app.seed import seed_data
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks every portfolio_app route against a seeded dataset and compares with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--students', type=int, default=1000,
+            help='Students (and portfolios) in the seeded dataset (default: 1000)',
+        )
+        parser.add_argument(
+            '--projects-per-portfolio', type=int, default=3,
+            help='Projects per portfolio in the seeded dataset (default: 3)',
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Timed requests per route (default: 20)',
+        )
+        parser.add_argument(
+            '--route', action='append', dest='routes',
+            help='Only benchmark this URL name; may be repeated',
+        )
+        parser.add_argument(
+            '--output', default='benchmark_results.json',
+            help='Where to write the results (default: benchmark_results.json)',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Results file to compare against; regressions make the command fail',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Allowed median latency growth over the baseline, as a fraction (default: 0.5)',
+        )
+        parser.add_argument(
+            '--use-current-database', action='store_true',
+            help='Benchmark the configured database as-is instead of a freshly seeded test database',
+        )
+        parser.add_argument(
+            '--staff-user',
+            help='Existing staff account to request login-only routes as; required with --use-current-database, '
+                 'since no account is ever created in a real database',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        if options['use_current_database']:
+            if not options['staff_user']:
+                raise CommandError(
+                    '--use-current-database needs --staff-user, the username of an existing staff account'
+                )
+            if not User.objects.filter(username=options['staff_user'], is_staff=True).exists():
+                raise CommandError(f"No staff user named {options['staff_user']!r}")
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {error}")
+
+        if options['use_current_database']:
+            results = self.run(options)
+        else:
+            setup_test_environment()
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                seed_data(options['students'], options['projects_per_portfolio'])
+                results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+        for name, route in results['routes'].items():
+            self.stdout.write(
+                f"  {name:<22} p50 {route['p50_ms']:8.2f}ms  p95 {route['p95_ms']:8.2f}ms  "
+                f"p99 {route['p99_ms']:8.2f}ms  {route['queries']:3d} queries"
+            )
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, tolerance=options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    f'{len(regressions)} regression(s) against {options["baseline"]}:\n  '
+                    + '\n  '.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+    def run(self, options):
+        # A seeded test database gets a throwaway staff user instead
+        staff_user = options['staff_user'] if options['use_current_database'] else None
+        return run_benchmark(iterations=options['iterations'], names=options['routes'], staff_user=staff_user)
@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio_app.export import CHUNK_SIZE, FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = 'Streams every portfolio with its student and projects to a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='File to write (default: stdout)',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS, default='jsonl',
+            help='Output format (default: jsonl)',
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Compress the output with gzip as it is written',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help=f'Rows fetched from the database at a time (default: {CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.monotonic()
+        try:
+            output = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        except OSError as error:
+            raise CommandError(f'Cannot open {path}: {error}')
+
+        written = 0
+        try:
+            for chunk in export_chunks(options['format'], options['gzip'], options['chunk_size']):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+
+        if path != '-':
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Exported {written:,} bytes to {path} in {elapsed:.1f}s'
+            ))
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+# Pool processes are spawned and import this module before Django is set up,
+# so anything touching models is imported inside the functions below
+
+
+def _init_worker():
+    django.setup()
+
+
+def _render(output_dir, pages, manifest, force):
+    from portfolio_app.staticsite import render_pages
+
+    try:
+        return render_pages(output_dir, pages, manifest, force)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Pre-renders the public portfolio, project and student pages to static HTML files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.STATIC_SITE_ROOT,
+            help=f'Directory to write the pages to (default: {settings.STATIC_SITE_ROOT})',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes rendering pages at once; 1 renders in this process (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Pages handed to a worker at a time (default: 200)',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Re-render every page, e.g. after a template change',
+        )
+
+    def handle(self, *args, **options):
+        from portfolio_app.staticsite import load_manifest, page_url, public_pages, remove_pages, save_manifest
+
+        output_dir = os.path.abspath(options['output'])
+        os.makedirs(output_dir, exist_ok=True)
+        previous = load_manifest(output_dir)
+        pages = public_pages()
+        chunk_size = max(1, options['chunk_size'])
+        chunks = [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
+
+        # Each worker only gets the part of the manifest its chunk needs
+        jobs = []
+        for chunk in chunks:
+            urls = [page_url(kind, pk) for kind, pk in chunk]
+            jobs.append((chunk, {url: previous[url] for url in urls if url in previous}))
+
+        if options['workers'] <= 1 or len(chunks) <= 1:
+            results = [_render(output_dir, chunk, manifest, options['force']) for chunk, manifest in jobs]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            ) as executor:
+                futures = [
+                    executor.submit(_render, output_dir, chunk, manifest, options['force'])
+                    for chunk, manifest in jobs
+                ]
+                results = [future.result() for future in futures]
+
+        manifest = {}
+        rendered = 0
+        for chunk_results in results:
+            for url, digest, was_rendered in chunk_results:
+                manifest[url] = digest
+                rendered += was_rendered
+        removed = set(previous) - set(manifest)
+        remove_pages(output_dir, removed)
+        save_manifest(output_dir, manifest)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully exported {len(manifest)} pages to {output_dir} '
+            f'({rendered} rendered, {len(manifest) - rendered} unchanged, {len(removed)} removed)'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from portfolio_app.attachments import generate_thumbnails
+from portfolio_app.models import Blob
+
+
+class Command(BaseCommand):
+    help = 'Generates thumbnails for attachments that have not been processed yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate the thumbnails of every blob, e.g. after changing THUMBNAIL_WIDTHS',
+        )
+
+    def handle(self, *args, **options):
+        blobs = Blob.objects.order_by('sha256')
+        if not options['all']:
+            blobs = blobs.filter(processed_at__isnull=True)
+        total = 0
+        for sha256 in blobs.values_list('sha256', flat=True).iterator():
+            generate_thumbnails(sha256)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Successfully processed {total} attachments'))
@@ -0,0 +1,296 @@
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from portfolio_app.conditional import bump_version
+from portfolio_app.counters import adjust_project_counts, adjust_site_stats
+from portfolio_app.dashboard import invalidate_dashboard
+from portfolio_app.models import Portfolio, PortfolioSnapshot, Project, Student
+from portfolio_app.snapshots import refresh_snapshots_in_batches
+
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't', 'on'}
+MAJORS = {code for code, _ in Student.MAJOR}
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE_VALUES
+
+
+def guess_format(path):
+    """Input format implied by the file extension; stdin needs --format"""
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise CommandError('Cannot guess the file format; pass --format csv or --format jsonl')
+
+
+def open_input(path):
+    """Open path for reading, or stdin when path is -"""
+    try:
+        return sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    except OSError as error:
+        raise CommandError(f'Cannot open {path}: {error}')
+
+
+def read_rows(stream, file_format):
+    """Yield one dict per input row without reading the whole file"""
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise CommandError(f'Line {line_number}: invalid JSON ({error})')
+
+
+def update_rows(model, objects, field_names):
+    """
+    Write field_names of each object back to its row with a single
+    executemany, avoiding the per-row CASE expressions of bulk_update().
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    quote_name = connection.ops.quote_name
+    assignments = ', '.join(f'{quote_name(field.column)} = %s' for field in fields)
+    sql = f'UPDATE {quote_name(model._meta.db_table)} SET {assignments} WHERE id = %s'
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] + [obj.pk]
+        for obj in objects
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def resolve_portfolios(emails):
+    """Map portfolio contact emails to ids with one query"""
+    emails = {email for email in emails if email}
+    if not emails:
+        return {}
+    return dict(Portfolio.objects.filter(contact_email__in=emails).values_list('contact_email', 'id'))
+
+
+class Command(BaseCommand):
+    help = 'Streams portfolios, students or projects from a CSV or JSONL file into the database in batches'
+
+    # Natural key of each model: portfolios by contact email, students by
+    # email, projects by (portfolio, title). Rows refer to a portfolio by its
+    # contact email in the "portfolio" column.
+    MODELS = {
+        'portfolio': Portfolio,
+        'student': Student,
+        'project': Project,
+    }
+
+    # Columns overwritten when --upsert matches an existing row
+    UPDATE_FIELDS = {
+        Portfolio: ['title', 'about', 'is_active', 'updated_at'],
+        # Clearing deleted_at and released_portfolio_id brings a soft-deleted student back
+        Student: ['name', 'major', 'Portfolio', 'deleted_at', 'released_portfolio_id', 'updated_at'],
+        Project: ['description', 'updated_at'],
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import, or - for stdin')
+        parser.add_argument(
+            '--model', required=True, choices=self.MODELS,
+            help='Kind of record in the file',
+        )
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Input format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows per bulk insert and transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--upsert', action='store_true',
+            help='Update rows whose natural key already exists instead of inserting duplicates',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+
+        self.model = self.MODELS[options['model']]
+        self.verbosity = options['verbosity']
+        self.upsert = options['upsert']
+        self.created = self.updated = self.skipped = 0
+
+        started = time.monotonic()
+        stream = open_input(path)
+
+        touched = set()
+        with stream:
+            total = 0
+            for batch in batches(read_rows(stream, file_format), options['batch_size']):
+                try:
+                    with transaction.atomic():
+                        portfolio_ids = self.import_batch(batch)
+                        # Stale snapshots are dropped with the batch (detail
+                        # pages rebuild missing ones on demand) and rebuilt
+                        # once at the end rather than after every batch
+                        PortfolioSnapshot.objects.filter(portfolio_id__in=portfolio_ids).delete()
+                except IntegrityError as error:
+                    raise CommandError(f'Batch starting at row {total + 1} was rolled back: {error}')
+                touched.update(portfolio_ids)
+                total += len(batch)
+                if self.verbosity > 1:
+                    self.stdout.write(f'  {total} rows read')
+
+        if self.created or self.updated:
+            refresh_snapshots_in_batches(touched)
+            bump_version(self.model)
+            invalidate_dashboard()
+
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec): '
+            f'{self.created} created, {self.updated} updated, {self.skipped} skipped'
+        ))
+
+    def natural_key(self, obj):
+        if self.model is Portfolio:
+            return obj.contact_email
+        if self.model is Student:
+            return obj.email
+        return (obj.portfolio_id, obj.title)
+
+    def existing_ids(self, objects):
+        """Map the natural keys of objects already in the database to their ids"""
+        if self.model is Portfolio:
+            return resolve_portfolios(obj.contact_email for obj in objects)
+        if self.model is Student:
+            # Soft-deleted students included, so re-importing one updates its row
+            return dict(
+                Student.all_objects.filter(email__in={obj.email for obj in objects})
+                .values_list('email', 'id')
+            )
+        rows = Project.objects.filter(
+            portfolio_id__in={obj.portfolio_id for obj in objects},
+            title__in={obj.title for obj in objects},
+        ).values_list('portfolio_id', 'title', 'id')
+        return {(portfolio_id, title): pk for portfolio_id, title, pk in rows}
+
+    def import_batch(self, rows):
+        """Save one batch of rows; returns the ids of the portfolios touched"""
+        if self.model is Portfolio:
+            objects = [self.build_portfolio(row) for row in rows]
+        else:
+            portfolios = resolve_portfolios(row.get('portfolio') for row in rows)
+            build = self.build_student if self.model is Student else self.build_project
+            objects = [build(row, portfolios) for row in rows]
+        objects = [obj for obj in objects if obj is not None]
+
+        if self.upsert:
+            # Later rows for the same key win
+            existing = self.existing_ids(objects)
+            unique = {self.natural_key(obj): obj for obj in objects}
+            to_create, to_update = [], []
+            for key, obj in unique.items():
+                if key in existing:
+                    obj.pk = existing[key]
+                    obj.updated_at = timezone.now()
+                    to_update.append(obj)
+                else:
+                    to_create.append(obj)
+        else:
+            to_create, to_update = objects, []
+
+        # Read what the updates overwrite before writing them
+        previous_portfolios = set()
+        if self.model is Student and to_update:
+            previous_portfolios = set(
+                Student.all_objects.filter(pk__in=[obj.pk for obj in to_update], Portfolio__isnull=False)
+                .values_list('Portfolio_id', flat=True)
+            )
+        site_deltas, project_deltas = self.counter_changes(to_create, to_update)
+
+        self.model.objects.bulk_create(to_create)
+        if to_update:
+            update_rows(self.model, to_update, self.UPDATE_FIELDS[self.model])
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        # bulk_create() and update_rows() send no signals, so adjust the counters here
+        adjust_project_counts(project_deltas)
+        adjust_site_stats(**site_deltas)
+
+        if self.model is Portfolio:
+            return {obj.pk for obj in to_create + to_update if obj.pk}
+        if self.model is Student:
+            # A moved student leaves its old portfolio's snapshot stale too
+            return {obj.Portfolio_id for obj in objects if obj.Portfolio_id} | previous_portfolios
+        return {obj.portfolio_id for obj in objects}
+
+    def counter_changes(self, to_create, to_update):
+        """
+        (SiteStats deltas, {portfolio_id: project_count delta}) of writing a
+        batch; call before writing it. Upserted projects keep their portfolio
+        and upserted students are live afterwards, so only the rows' old
+        state needs reading.
+        """
+        update_ids = [obj.pk for obj in to_update]
+        if self.model is Portfolio:
+            was_active = Portfolio.objects.filter(pk__in=update_ids, is_active=True).count() if update_ids else 0
+            now_active = sum(obj.is_active for obj in to_create + to_update)
+            return {'active_portfolios': now_active - was_active}, {}
+        if self.model is Student:
+            was_live = Student.objects.filter(pk__in=update_ids).count() if update_ids else 0
+            return {'students': len(to_create) + len(update_ids) - was_live}, {}
+        return {'projects': len(to_create)}, Counter(obj.portfolio_id for obj in to_create)
+
+    def skip(self, row, reason):
+        self.skipped += 1
+        if self.verbosity > 1:
+            self.stderr.write(f'Skipped {row!r}: {reason}')
+
+    def build_portfolio(self, row):
+        if not row.get('title') or not row.get('contact_email'):
+            return self.skip(row, 'title and contact_email are required')
+        return Portfolio(
+            title=row['title'],
+            about=row.get('about') or '',
+            contact_email=row['contact_email'],
+            is_active=parse_bool(row.get('is_active')),
+        )
+
+    def build_student(self, row, portfolios):
+        if not row.get('name') or not row.get('email'):
+            return self.skip(row, 'name and email are required')
+        if row.get('major') not in MAJORS:
+            return self.skip(row, f"unknown major {row.get('major')!r}")
+        portfolio_id = None
+        if row.get('portfolio'):
+            portfolio_id = portfolios.get(row['portfolio'])
+            if portfolio_id is None:
+                return self.skip(row, f"no portfolio with contact email {row['portfolio']!r}")
+        return Student(name=row['name'], email=row['email'], major=row['major'], Portfolio_id=portfolio_id)
+
+    def build_project(self, row, portfolios):
+        if not row.get('title'):
+            return self.skip(row, 'title is required')
+        portfolio_id = portfolios.get(row.get('portfolio'))
+        if portfolio_id is None:
+            return self.skip(row, f"no portfolio with contact email {row.get('portfolio')!r}")
+        return Project(title=row['title'], description=row.get('description') or '', portfolio_id=portfolio_id)
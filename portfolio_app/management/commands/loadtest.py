@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from portfolio_app.loadtest import DEFAULT_CONCURRENCY, LoadTestError, parse_mix, run_loadtest
+from portfolio_app.seed import seed_data
+
+
+def format_ms(value):
+    """A latency column; stages and routes that got no requests have no percentiles"""
+    return f'{value:8.2f}ms' if value is not None else f'{"-":>10}'
+
+
+class Command(BaseCommand):
+    help = 'Ramps concurrent load over a mix of routes and reports throughput, latency and errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--route', action='append', dest='routes', metavar='[METHOD ]NAME[:WEIGHT]',
+            help='URL name to request, e.g. "project_list:3" or "POST project_update"; may be repeated '
+                 '(default: a read-heavy mix of the public pages with some project updates)',
+        )
+        parser.add_argument(
+            '--concurrency', default=','.join(map(str, DEFAULT_CONCURRENCY)),
+            help=f'Comma-separated concurrent clients for each stage (default: {",".join(map(str, DEFAULT_CONCURRENCY))})',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10.0,
+            help='Seconds each stage runs (default: 10.0)',
+        )
+        parser.add_argument(
+            '--url',
+            help='Load a running server at this base URL (e.g. http://127.0.0.1:8000) instead of the '
+                 'in-process ASGI app; needs --use-current-database',
+        )
+        parser.add_argument(
+            '--host',
+            help='Host header for in-process requests; must be in ALLOWED_HOSTS '
+                 '(default: testserver, or localhost with --use-current-database)',
+        )
+        parser.add_argument(
+            '--students', type=int, default=1000,
+            help='Students (and portfolios) in the seeded dataset (default: 1000)',
+        )
+        parser.add_argument(
+            '--projects-per-portfolio', type=int, default=3,
+            help='Projects per portfolio in the seeded dataset (default: 3)',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed for the order in which routes are picked (default: 0)',
+        )
+        parser.add_argument(
+            '--output', default='loadtest_results.json',
+            help='Where to write the results (default: loadtest_results.json)',
+        )
+        parser.add_argument(
+            '--use-current-database', action='store_true',
+            help='Load the configured database as-is instead of a freshly seeded test database',
+        )
+        parser.add_argument(
+            '--staff-user',
+            help='Existing staff account to request login-only routes as; required with --use-current-database, '
+                 'since no account is ever created in a real database',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of numbers')
+        if not levels or min(levels) < 1:
+            raise CommandError('--concurrency levels must be at least 1')
+        if options['duration'] <= 0:
+            raise CommandError('--duration must be positive')
+        if options['url'] and not options['use_current_database']:
+            raise CommandError('--url needs --use-current-database, so the server sees the same data and sessions')
+        if options['use_current_database']:
+            if not options['staff_user']:
+                raise CommandError(
+                    '--use-current-database needs --staff-user, the username of an existing staff account'
+                )
+            if not User.objects.filter(username=options['staff_user'], is_staff=True).exists():
+                raise CommandError(f"No staff user named {options['staff_user']!r}")
+        try:
+            mix = parse_mix(options['routes']) if options['routes'] else None
+        except LoadTestError as error:
+            raise CommandError(str(error))
+
+        if options['use_current_database']:
+            results = self.run(mix, levels, options)
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                results = self.run_seeded(mix, levels, options, directory)
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+        for stage in results['stages']:
+            self.stdout.write(
+                f"concurrency {stage['concurrency']:>3}: {stage['throughput_rps']:8.1f} req/s  "
+                f"p50 {format_ms(stage['p50_ms'])}  p99 {format_ms(stage['p99_ms'])}  "
+                f"errors {stage['error_rate']:6.1%}  ({stage['requests']} requests)"
+            )
+            for label, route in stage['routes'].items():
+                if not route['requests']:
+                    continue
+                self.stdout.write(
+                    f"  {label:<24} {route['throughput_rps']:8.1f} req/s  p50 {format_ms(route['p50_ms'])}  "
+                    f"p99 {format_ms(route['p99_ms'])}  errors {route['error_rate']:6.1%}"
+                )
+        peak = results['peak']
+        self.stdout.write(f"Peak throughput {peak['throughput_rps']:.1f} req/s at concurrency {peak['concurrency']}")
+        self.stdout.write(f"Results written to {options['output']}")
+
+    def run_seeded(self, mix, levels, options, directory):
+        """Run against a freshly seeded test database"""
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        old_test_name = test_settings.get('NAME')
+        if connection.vendor == 'sqlite':
+            # Concurrent requests each hold a connection; an in-memory test
+            # database uses shared-cache table locks, which fail them where
+            # a file database with WAL would just wait
+            test_settings['NAME'] = os.path.join(directory, 'loadtest.sqlite3')
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_data(options['students'], options['projects_per_portfolio'])
+            return self.run(mix, levels, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            test_settings['NAME'] = old_test_name
+
+    def run(self, mix, levels, options):
+        try:
+            return run_loadtest(
+                mix, levels, options['duration'],
+                base_url=options['url'], seed=options['seed'],
+                # A seeded test database gets a throwaway staff user instead
+                staff_user=options['staff_user'] if options['use_current_database'] else None,
+                # The test environment only allows the test client's host
+                host=options['host'] or ('localhost' if options['use_current_database'] else 'testserver'),
+            )
+        except LoadTestError as error:
+            raise CommandError(str(error))
@@ -0,0 +1,164 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from portfolio_app.conditional import bump_version
+from portfolio_app.counters import adjust_site_stats
+from portfolio_app.management.commands.import_portfolios import (
+    MAJORS, batches, guess_format, open_input, read_rows,
+)
+from portfolio_app.models import Portfolio, Student
+from portfolio_app.snapshots import refresh_snapshots_in_batches
+
+
+def _init_worker():
+    # Workers started with "spawn" (macOS, Windows) begin without Django set up
+    django.setup()
+
+
+def hash_passwords(passwords, executor=None, workers=1):
+    """
+    Hash passwords with the configured hasher. PBKDF2 is CPU bound, so given
+    an executor of several worker processes the work is spread over it.
+    Missing passwords get an unusable hash.
+    """
+    passwords = [password or None for password in passwords]
+    if executor is None or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+
+class Command(BaseCommand):
+    help = 'Creates student accounts, with their Student profile and Portfolio, from a CSV or JSONL roster'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='CSV or JSONL roster with username, email, password, name and major columns, or - for stdin',
+        )
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Roster format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes used to hash passwords (default: one per CPU)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Accounts per transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        self.verbosity = options['verbosity']
+
+        try:
+            student_group = Group.objects.get(name='student')
+        except Group.DoesNotExist:
+            raise CommandError('The "student" group does not exist; run "python manage.py setup_permissions" first')
+
+        started = time.monotonic()
+        stream = open_input(path)
+
+        # One pool for the whole run: each worker process pays for
+        # django.setup() once, not once per batch
+        workers = options['workers']
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+
+        created = skipped = 0
+        portfolio_ids = []
+        with stream, executor or nullcontext():
+            seen = set()
+            for batch in batches(read_rows(stream, file_format), options['batch_size']):
+                rows = []
+                for row in batch:
+                    reason = self.check_row(row, seen)
+                    if reason:
+                        skipped += 1
+                        if self.verbosity > 1:
+                            self.stderr.write(f"Skipped {row.get('username')!r}: {reason}")
+                        continue
+                    seen.add(row['username'])
+                    rows.append(row)
+
+                existing = set(
+                    User.objects.filter(username__in=[row['username'] for row in rows])
+                    .values_list('username', flat=True)
+                )
+                skipped += len(existing)
+                rows = [row for row in rows if row['username'] not in existing]
+                if not rows:
+                    continue
+
+                hashes = hash_passwords([row.get('password') for row in rows], executor, workers)
+                try:
+                    portfolio_ids += self.create_accounts(rows, hashes, student_group)
+                except IntegrityError as error:
+                    raise CommandError(f'Batch ending at {rows[-1]["username"]!r} was rolled back: {error}')
+                created += len(rows)
+                if self.verbosity > 1:
+                    self.stdout.write(f'  {created} accounts created')
+
+        if created:
+            refresh_snapshots_in_batches(portfolio_ids)
+            bump_version(Portfolio)
+            bump_version(Student)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Provisioned {created} students in {elapsed:.1f}s ({skipped} skipped)'
+        ))
+
+    def check_row(self, row, seen):
+        if not row.get('username') or not row.get('email'):
+            return 'username and email are required'
+        if row['username'] in seen:
+            return 'duplicate username in roster'
+        if row.get('major') and row['major'] not in MAJORS:
+            return f"unknown major {row['major']!r}"
+        return None
+
+    def create_accounts(self, rows, hashes, student_group):
+        """Insert users, group memberships, portfolios and students; returns the portfolio ids"""
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(
+                    username=row['username'],
+                    email=row['email'],
+                    first_name=row.get('first_name') or '',
+                    last_name=row.get('last_name') or '',
+                    password=password,
+                )
+                for row, password in zip(rows, hashes)
+            )
+            Membership = User.groups.through
+            Membership.objects.bulk_create(
+                Membership(user_id=user.pk, group_id=student_group.pk) for user in users
+            )
+            # Same defaults as self-registration
+            portfolios = Portfolio.objects.bulk_create(
+                Portfolio(title=f"{row['username']}'s Portfolio", contact_email=row['email'], is_active=False)
+                for row in rows
+            )
+            Student.objects.bulk_create(
+                Student(
+                    user=user,
+                    name=row.get('name') or row['username'],
+                    email=row['email'],
+                    major=row.get('major') or '',
+                    Portfolio=portfolio,
+                )
+                for row, user, portfolio in zip(rows, users, portfolios)
+            )
+            # New portfolios start inactive, so only the student total changes
+            adjust_site_stats(students=len(rows))
+        return [portfolio.pk for portfolio in portfolios]
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from portfolio_app.softdelete import PURGE_BATCH_SIZE, purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Permanently deletes portfolios and students that were soft-deleted longer ago than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=float, default=settings.SOFT_DELETE_RETENTION_DAYS,
+            help=f'Keep rows deleted fewer than this many days ago (default: {settings.SOFT_DELETE_RETENTION_DAYS})',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=PURGE_BATCH_SIZE,
+            help=f'Portfolios or students deleted per statement (default: {PURGE_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        portfolios, students = purge_deleted(options['retention_days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully purged {portfolios} portfolios and {students} students'))
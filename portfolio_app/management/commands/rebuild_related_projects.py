@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from portfolio_app.related import rebuild_all_related
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the related projects shown on every project page'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of projects to recompute per transaction (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_all_related(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt the related projects of {total} projects'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from portfolio_app.search import SEARCH_FIELDS, fts_table, install_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for projects, portfolios and students'
+
+    def handle(self, *args, **kwargs):
+        if not install_search_index():
+            self.stdout.write(self.style.WARNING(
+                'FTS5 is not available on this database; searches use icontains filters'
+            ))
+            return
+
+        rebuild_search_index()
+
+        for model in SEARCH_FIELDS:
+            self.stdout.write(f'  - {fts_table(model)}: {model.objects.count()} rows')
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt the search index'))
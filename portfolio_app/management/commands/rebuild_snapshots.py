@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from portfolio_app.snapshots import rebuild_all_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the precomputed snapshots used by the portfolio and student detail pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of portfolios to rebuild per transaction (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_all_snapshots(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {total} portfolio snapshots'))
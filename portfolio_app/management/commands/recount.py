@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from portfolio_app.counters import recount
+from portfolio_app.dashboard import invalidate_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Recounts the denormalized project counts and site totals, repairing any drift'
+
+    def handle(self, *args, **options):
+        corrected, stats = recount()
+        invalidate_dashboard()
+        self.stdout.write(
+            f'{stats.active_portfolios} active portfolios, {stats.students} students, {stats.projects} projects'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Successfully recounted; corrected {corrected} portfolio project counts'))
@@ -0,0 +1,108 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+# Pool processes are spawned and import this module before Django is set up,
+# so anything touching models is imported inside the functions below
+
+
+def _init_worker():
+    django.setup()
+
+
+def _run(job_id, token):
+    from portfolio_app.jobs import run_job
+
+    try:
+        return run_job(job_id, token)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs in a pool of threads or processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOB_WORKERS,
+            help=f'Jobs run at once (default: {settings.JOB_WORKERS})',
+        )
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help='Run jobs in threads (I/O-bound work such as email) or processes (CPU-bound work) (default: thread)',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait before looking again when the queue is empty (default: 1.0)',
+        )
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=settings.JOB_VISIBILITY_TIMEOUT,
+            help='Seconds before a claimed job that never finished is handed to another worker '
+                 f'(default: {settings.JOB_VISIBILITY_TIMEOUT})',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once the queue is empty instead of waiting for more jobs',
+        )
+
+    def handle(self, *args, **options):
+        from portfolio_app.jobs import claim_jobs
+
+        workers = max(1, options['workers'])
+        if options['pool'] == 'process':
+            executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker,
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs')
+
+        self.stopping = False
+        previous_handler = signal.signal(signal.SIGTERM, self.stop)
+        running = set()
+        self.succeeded = self.failed = 0
+        try:
+            while not self.stopping:
+                free = workers - len(running)
+                jobs = claim_jobs(free, options['visibility_timeout']) if free else []
+                for job in jobs:
+                    running.add(executor.submit(_run, job.pk, job.claimed_by))
+
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                # Wake up as soon as a slot frees, or to poll for new jobs
+                done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                self.record(done)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the running jobs finish...')
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            self.record(wait(running).done)
+            executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully ran {self.succeeded} jobs ({self.failed} failed)'))
+
+    def record(self, futures):
+        for future in futures:
+            try:
+                succeeded = future.result()
+            except Exception as error:
+                # The job itself cannot raise; this is the pool or the database
+                self.stderr.write(f'Worker error: {error!r}')
+                succeeded = False
+            if succeeded:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def stop(self, signum, frame):
+        self.stdout.write('Stopping after the running jobs finish...')
+        self.stopping = True
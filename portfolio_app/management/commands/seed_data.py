@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio_app.seed import seed_data
+
+
+class Command(BaseCommand):
+    help = 'Generates synthetic students, portfolios and projects with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--students', type=int, default=1000,
+            help='Number of students to create, each with a portfolio (default: 1000)',
+        )
+        parser.add_argument(
+            '--projects-per-portfolio', type=int, default=3,
+            help='Number of projects in each new portfolio (default: 3)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Students per bulk insert and transaction (default: 2000)',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed; the same seed generates the same data (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        if options['students'] < 0 or options['projects_per_portfolio'] < 0:
+            raise CommandError('--students and --projects-per-portfolio must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        started = time.monotonic()
+        students, portfolios, projects = seed_data(
+            options['students'],
+            options['projects_per_portfolio'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {students} students, {portfolios} portfolios and {projects} projects in {elapsed:.1f}s'
+        ))
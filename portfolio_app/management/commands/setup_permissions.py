@@ -1,54 +1,43 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth.models import Group, Permission
-from django.contrib.contenttypes.models import ContentType
-from portfolio_app.models import Portfolio, Project, Student
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from portfolio_app.roles import RoleSpecError, apply_role_sync, plan_role_sync
 
 
 class Command(BaseCommand):
-    help = 'Sets up user groups and permissions for the portfolio application'
-
-    def handle(self, *args, **kwargs):
-        # Create or get the 'student' group
-        student_group, created = Group.objects.get_or_create(name='student')
-
-        if created:
-            self.stdout.write(self.style.SUCCESS('Created "student" group'))
-        else:
-            self.stdout.write(self.style.WARNING('Group "student" already exists'))
-
-        # Get content types for our models
-        portfolio_ct = ContentType.objects.get_for_model(Portfolio)
-        project_ct = ContentType.objects.get_for_model(Project)
-        student_ct = ContentType.objects.get_for_model(Student)
-
-        # Define permissions for the student group
-        # Students can add, change, and delete portfolios and projects
-        permissions = [
-            # Portfolio permissions
-            Permission.objects.get(codename='add_portfolio', content_type=portfolio_ct),
-            Permission.objects.get(codename='change_portfolio', content_type=portfolio_ct),
-            Permission.objects.get(codename='delete_portfolio', content_type=portfolio_ct),
-            Permission.objects.get(codename='view_portfolio', content_type=portfolio_ct),
-
-            # Project permissions
-            Permission.objects.get(codename='add_project', content_type=project_ct),
-            Permission.objects.get(codename='change_project', content_type=project_ct),
-            Permission.objects.get(codename='delete_project', content_type=project_ct),
-            Permission.objects.get(codename='view_project', content_type=project_ct),
-
-            # Student permissions (view and change only, not delete or add)
-            Permission.objects.get(codename='view_student', content_type=student_ct),
-            Permission.objects.get(codename='change_student', content_type=student_ct),
-        ]
-
-        # Add permissions to the group
-        student_group.permissions.set(permissions)
-
-        self.stdout.write(self.style.SUCCESS(
-            f'Successfully configured {len(permissions)} permissions for "student" group'
-        ))
-
-        # Display the permissions
-        self.stdout.write('\nAssigned permissions:')
-        for perm in permissions:
-            self.stdout.write(f'  - {perm.content_type.app_label}.{perm.codename}')
+    help = 'Syncs the user groups and their permissions with the roles declared in portfolio_app.roles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report differences without changing anything; exits with an error if any are found',
+        )
+
+    def handle(self, *args, **options):
+        # Plan and apply in one transaction, so concurrent runs (e.g. two deploys) are serialized
+        with transaction.atomic():
+            self.sync(options['check'])
+
+    def sync(self, check):
+        try:
+            plan = plan_role_sync()
+        except RoleSpecError as error:
+            raise CommandError(str(error))
+
+        pending = plan.pending
+        for change in pending:
+            if change.create:
+                self.stdout.write(f'{change.role}: create group')
+            for perm in change.add:
+                self.stdout.write(f'{change.role}: + {perm}')
+            for perm in change.remove:
+                self.stdout.write(f'{change.role}: - {perm}')
+
+        if not pending:
+            self.stdout.write(self.style.SUCCESS(f'All {len(plan.changes)} roles are up to date'))
+            return
+        if check:
+            raise CommandError(f'{len(pending)} of {len(plan.changes)} roles are out of date')
+
+        apply_role_sync(plan)
+        self.stdout.write(self.style.SUCCESS(f'Successfully synced {len(pending)} of {len(plan.changes)} roles'))
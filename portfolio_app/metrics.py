@@ -0,0 +1,174 @@
+"""
+Per-view request metrics and SQL query budgets.
+
+MetricsMiddleware times every request and wraps every database connection
+with an execute wrapper that counts queries and SQL time. Results are
+aggregated per resolved URL name in this process and rendered in the
+Prometheus text format by the /metrics view.
+
+Views listed in settings.QUERY_BUDGETS have a maximum number of queries per
+request. Going over it logs a warning, or raises QueryBudgetExceeded when
+settings.QUERY_BUDGET_RAISE is set (it is during test runs) so N+1
+regressions fail loudly.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """Execute wrapper that counts queries and the time spent running them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.requests = defaultdict(int)  # (method, status) -> count
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.budget_exceeded = 0
+
+
+class Registry:
+    """Thread-safe per-process store of ViewMetrics keyed by URL name"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewMetrics)
+
+    def record(self, view, method, status, seconds, counter, over_budget):
+        with self.lock:
+            metrics = self.views[view]
+            metrics.requests[(method, str(status))] += 1
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(counter.count)
+            metrics.sql_seconds += counter.duration
+            if over_budget:
+                metrics.budget_exceeded += 1
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, view, hist):
+            for bound, count in zip(hist.buckets, hist.counts):
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {hist.total}')
+            lines.append(f'{name}_sum{{view="{view}"}} {hist.sum}')
+            lines.append(f'{name}_count{{view="{view}"}} {hist.total}')
+
+        with self.lock:
+            views = sorted(self.views.items())
+
+            family('portfolio_http_requests_total', 'counter', 'Requests handled, by view, method and status.')
+            for view, metrics in views:
+                for (method, status), count in sorted(metrics.requests.items()):
+                    lines.append(
+                        f'portfolio_http_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}'
+                    )
+
+            family('portfolio_http_request_duration_seconds', 'histogram', 'Request latency, by view.')
+            for view, metrics in views:
+                histogram('portfolio_http_request_duration_seconds', view, metrics.latency)
+
+            family('portfolio_db_queries_per_request', 'histogram', 'SQL queries run per request, by view.')
+            for view, metrics in views:
+                histogram('portfolio_db_queries_per_request', view, metrics.queries)
+
+            family('portfolio_db_query_seconds_total', 'counter', 'Time spent running SQL, by view.')
+            for view, metrics in views:
+                lines.append(f'portfolio_db_query_seconds_total{{view="{view}"}} {metrics.sql_seconds}')
+
+            family('portfolio_query_budget_exceeded_total', 'counter', 'Requests that ran more queries than their budget.')
+            for view, metrics in views:
+                lines.append(f'portfolio_query_budget_exceeded_total{{view="{view}"}} {metrics.budget_exceeded}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """Record latency and SQL usage for every request and enforce query budgets"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        seconds = time.perf_counter() - started
+
+        view = view_name(request)
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(view)
+        over_budget = budget is not None and counter.count > budget
+        registry.record(view, request.method, response.status_code, seconds, counter, over_budget)
+
+        if over_budget:
+            message = f'{view} ran {counter.count} SQL queries, over its budget of {budget} ({request.path})'
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0002_student_name_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('portfolio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='portfolio_app.portfolio')),
+                ('student_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('document', models.JSONField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,68 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_timestamps(apps, schema_editor):
+    """Give existing rows one consistent timestamp and seed the change counters"""
+    now = django.utils.timezone.now()
+    for model_name in ('Portfolio', 'Project', 'Student'):
+        model = apps.get_model('portfolio_app', model_name)
+        model.objects.using(schema_editor.connection.alias).update(created_at=now, updated_at=now)
+
+    ContentVersion = apps.get_model('portfolio_app', 'ContentVersion')
+    ContentVersion.objects.using(schema_editor.connection.alias).bulk_create([
+        ContentVersion(name=name, version=1, updated_at=now)
+        for name in ('portfolio', 'project', 'student')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0003_portfolio_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_timestamps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:27
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_rows(apps, schema_editor):
+    """Fill in the counters for rows created before they were maintained"""
+    alias = schema_editor.connection.alias
+    Portfolio = apps.get_model('portfolio_app', 'Portfolio')
+    Project = apps.get_model('portfolio_app', 'Project')
+    Student = apps.get_model('portfolio_app', 'Student')
+    SiteStats = apps.get_model('portfolio_app', 'SiteStats')
+
+    counts = Project.objects.using(alias).order_by().values('portfolio').annotate(count=Count('*'))
+    for row in counts:
+        Portfolio.objects.using(alias).filter(pk=row['portfolio']).update(project_count=row['count'])
+    SiteStats.objects.using(alias).create(
+        pk=1,
+        active_portfolios=Portfolio.objects.using(alias).filter(is_active=True).count(),
+        students=Student.objects.using(alias).count(),
+        projects=Project.objects.using(alias).count(),
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0006_related_projects'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_portfolios', models.PositiveIntegerField(default=0)),
+                ('students', models.PositiveIntegerField(default=0)),
+                ('projects', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'site stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='project_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
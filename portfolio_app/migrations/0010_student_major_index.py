@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0009_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['major', 'name', 'id'], name='student_major_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0010_student_major_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['title', 'id'], name='portfolio_title_id_idx'),
+        ),
+    ]
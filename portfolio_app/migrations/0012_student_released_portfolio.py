@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:12
+
+from django.db import migrations, models
+
+
+def release_deleted_students(apps, schema_editor):
+    Student = apps.get_model('portfolio_app', 'Student')
+    alias = schema_editor.connection.alias
+    Student.objects.using(alias).filter(deleted_at__isnull=False, Portfolio__isnull=False).update(
+        released_portfolio_id=models.F('Portfolio_id'), Portfolio=None,
+    )
+
+
+def reclaim_released_portfolios(apps, schema_editor):
+    Student = apps.get_model('portfolio_app', 'Student')
+    alias = schema_editor.connection.alias
+    taken = set(Student.objects.using(alias).filter(Portfolio__isnull=False).values_list('Portfolio_id', flat=True))
+    for student in Student.objects.using(alias).filter(released_portfolio_id__isnull=False):
+        if student.released_portfolio_id not in taken:
+            taken.add(student.released_portfolio_id)
+            Student.objects.using(alias).filter(pk=student.pk).update(Portfolio_id=student.released_portfolio_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0011_portfolio_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='released_portfolio_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(release_deleted_students, reclaim_released_portfolios),
+    ]
@@ -1,12 +1,71 @@
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.contrib.auth.models import User
 
-class Portfolio(models.Model):
+class CountedModel(models.Model):
+    """
+    A model whose saves run in a transaction, so the counters that post_save
+    signals maintain (see counters.py) commit or roll back with the row.
+
+    Fields listed in counter_fields are only ever changed with F() updates;
+    saving an existing row leaves them alone rather than writing back a
+    possibly stale in-memory copy.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.counter_fields and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class LiveManager(models.Manager):
+    """
+    Default manager that hides soft-deleted rows (see softdelete.py): rows
+    where any of the given lookups, e.g. ``deleted_at``, is set.
+    """
+
+    def __init__(self, *lookups):
+        super().__init__()
+        self.lookups = lookups
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**{lookup: None for lookup in self.lookups})
+
+
+class Portfolio(CountedModel):
     title = models.CharField(max_length=200)
     about = models.TextField(blank=True)
     contact_email = models.CharField(max_length=200)
     is_active = models.BooleanField(default=False)
+    # Maintained by counters.py; repaired by `manage.py recount`
+    project_count = models.PositiveIntegerField(default=0)
+    # Set when soft-deleted; purged for good after SOFT_DELETE_RETENTION_DAYS
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    counter_fields = ('project_count',)
+
+    objects = LiveManager('deleted_at')
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Backs the (title, id) order of the portfolio picker lookup
+            models.Index(fields=['title', 'id'], name='portfolio_title_id_idx'),
+            # Finds rows to purge. Partial, so the planner never prefers it for
+            # the "deleted_at IS NULL" filter that every normal query carries
+            models.Index(fields=['deleted_at'], name='portfolio_deleted_at_idx',
+                         condition=models.Q(deleted_at__isnull=False)),
+        ]
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
@@ -15,10 +74,16 @@ class Portfolio(models.Model):
         return reverse('portfolio-detail', args=[str(self.id)])
 
 
-class Project(models.Model):
+class Project(CountedModel):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Projects are hidden along with their soft-deleted portfolio
+    objects = LiveManager('portfolio__deleted_at')
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.title
@@ -26,7 +91,7 @@ class Project(models.Model):
     def get_absolute_url(self):
         return reverse('Project-detail', args=[str(self.id)])
 
-class Student(models.Model):
+class Student(CountedModel):
    
     MAJOR = (
         ('CSCI-BS', 'BS in Computer Science'),
@@ -42,6 +107,28 @@ class Student(models.Model):
     major = models.CharField(max_length=200, choices=MAJOR,)
     Portfolio = models.OneToOneField(Portfolio, on_delete=models.CASCADE, null=True, blank=True, related_name='student')
     user = models.OneToOneField(User, null=True, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # A soft-deleted student gives up its Portfolio, so the portfolio no longer
+    # reaches it through reverse joins and can be assigned again; the id is kept
+    # here to put back on restore
+    released_portfolio_id = models.BigIntegerField(null=True, blank=True)
+
+    # Students are hidden when soft-deleted themselves or with their portfolio
+    objects = LiveManager('deleted_at', 'Portfolio__deleted_at')
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Backs the (name, id) sort key used to paginate the student list
+            models.Index(fields=['name', 'id'], name='student_name_id_idx'),
+            # Same sort key within one major, for the major facet
+            models.Index(fields=['major', 'name', 'id'], name='student_major_name_id_idx'),
+            # Finds rows to purge (see Portfolio.Meta)
+            models.Index(fields=['deleted_at'], name='student_deleted_at_idx',
+                         condition=models.Q(deleted_at__isnull=False)),
+        ]
 
 
    
@@ -50,4 +137,121 @@ class Student(models.Model):
     
 
     def get_absolute_url(self):
-        return reverse('student-detail', args=[str(self.id)])
\ No newline at end of file
+        return reverse('student-detail', args=[str(self.id)])
+
+
+class PortfolioSnapshot(models.Model):
+    """Denormalized copy of a portfolio, its owner and its projects for the detail pages"""
+    portfolio = models.OneToOneField(Portfolio, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    student_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    document = models.JSONField()
+
+    def __str__(self):
+        return f'Snapshot of portfolio {self.portfolio_id}'
+
+
+class RelatedProjects(models.Model):
+    """Precomputed most similar projects of a project, best match first"""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='related')
+    project_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Projects related to project {self.project_id}'
+
+
+class SiteStats(models.Model):
+    """Single row of site-wide totals for the home page, maintained by counters.py"""
+    active_portfolios = models.PositiveIntegerField(default=0)
+    students = models.PositiveIntegerField(default=0)
+    projects = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'site stats'
+
+    def __str__(self):
+        return 'Site stats'
+
+
+class ContentVersion(models.Model):
+    """Change counter per model, bumped on every save and delete to validate cached pages"""
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
+
+
+class Blob(models.Model):
+    """Uploaded file content, stored once per SHA-256 digest however many times it is attached"""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # Thumbnail width (as a string) -> storage name, filled in by the thumbnail workers
+    thumbnails = models.JSONField(default=dict, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+    @property
+    def is_image(self):
+        return self.content_type.startswith('image/') and self.content_type != 'image/svg+xml'
+
+
+class Attachment(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='attachments')
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name='attachments')
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'blob'], name='attachment_project_blob_unique'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Job(models.Model):
+    """A queued call of a task function, run by `manage.py run_worker` (see jobs.py)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    )
+
+    # Dotted path of the task function
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # Earliest time the job may (re)start
+    run_at = models.DateTimeField()
+    # Set while running: the claiming worker's token and when its claim lapses
+    claimed_by = models.CharField(max_length=64, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Backs the due-job scan of the workers
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,164 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``COUNT(*)`` plus ``OFFSET n``, each page seeks past the sort key
+of the last row it has seen, so deep pages cost the same as the first one as
+long as the ordering is backed by an index. Cursors are opaque URL-safe
+tokens; the total row count is never computed.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, values], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class CursorPage:
+    """A page of results with opaque cursors to its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginate a queryset by seeking on its ordering.
+
+    The queryset's ``order_by`` fields are used as the sort key, with ``id``
+    appended as a tie-breaker when missing. Rows may be model instances or
+    ``values()`` dicts.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.per_page = int(per_page)
+        ordering = list(queryset.query.order_by) or ['id']
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('id')
+        self.ordering = ordering
+        self.queryset = queryset.order_by(*ordering)
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _key(self, row):
+        key = []
+        for name, _ in self._fields():
+            name = 'id' if name == 'pk' else name
+            key.append(row[name] if isinstance(row, dict) else getattr(row, name))
+        return key
+
+    def _seek(self, values, forward):
+        """Build the WHERE clause selecting rows after (or before) values"""
+        fields = self._fields()
+        if len(values) != len(fields):
+            raise InvalidCursor(values)
+        condition = Q()
+        for i, (name, descending) in enumerate(fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for j in range(i):
+                term &= Q(**{fields[j][0]: values[j]})
+            condition |= term
+        return condition
+
+    def page(self, cursor=None):
+        """Return the page identified by cursor, or the first page"""
+        direction, values = decode_cursor(cursor) if cursor else ('next', None)
+        forward = direction == 'next'
+
+        queryset = self.queryset
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._seek(values, forward))
+            except (ValueError, TypeError, ValidationError):
+                raise InvalidCursor(cursor)
+        if not forward:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if not rows:
+            return CursorPage(rows)
+
+        next_cursor = previous_cursor = None
+        if has_more or not forward:
+            next_cursor = encode_cursor('next', self._key(rows[-1]))
+        if values is not None and (forward or has_more):
+            previous_cursor = encode_cursor('prev', self._key(rows[0]))
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def use_cursor_pagination(request):
+    """Cursor mode is opt-in per deployment, or per request with ?cursor="""
+    return getattr(settings, 'CURSOR_PAGINATION', False) or 'cursor' in request.GET
+
+
+def paginate(request, queryset, per_page):
+    """Return the requested page of queryset using offset or cursor pagination"""
+    if use_cursor_pagination(request):
+        paginator = CursorPaginator(queryset, per_page)
+        try:
+            return paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return paginator.page()
+
+    paginator = Paginator(queryset, per_page)
+    page = request.GET.get('page')
+
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
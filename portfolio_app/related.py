@@ -0,0 +1,164 @@
+"""
+Content-based "related projects".
+
+A project's most distinctive terms are picked by TF-IDF: term frequencies
+come from its own title (weighted up) and description, and document
+frequencies from the FTS5 vocabulary of the project search index. Those
+terms are OR'd into one FTS5 query whose bm25 ranking scores every other
+project in the site at once, so no term-document matrix has to be built,
+stored or loaded by each worker; SQLite keeps the inverted index current
+through its triggers.
+
+The top RELATED_LIMIT ids are stored in RelatedProjects, so project_detail
+serves them with a primary-key lookup. Saving a project queues a job that
+refreshes its list and the lists of its new neighbours. A page whose list is
+missing queues the same job and shows other projects of the same portfolio
+until the job has run, so the similarity search never runs in a request;
+``manage.py rebuild_related_projects`` recomputes every list, e.g. after a
+bulk import.
+"""
+import math
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Project, RelatedProjects
+from .search import COLUMN_WEIGHTS, fts_available, fts_table, fts_vocab_table
+
+
+RELATED_LIMIT = 5
+# Seconds during which a page with a missing list doesn't queue another refresh
+REFRESH_QUEUED_TIMEOUT = 60
+# Most distinctive terms of a project used to find its neighbours
+QUERY_TERMS = 12
+TITLE_WEIGHT = 3
+# Terms found in more than this share of projects say little about a project
+# and have the longest posting lists to scan, so they are left out (terms in
+# fewer than COMMON_TERM_FLOOR projects are always kept, for small sites)
+MAX_DOCUMENT_FREQUENCY = 0.1
+COMMON_TERM_FLOOR = 100
+
+STOP_WORDS = frozenset('''
+    a an and are as at be by for from has have in is it its of on or that the this to was were will with
+    i my we our you your using used use built build project
+'''.split())
+
+
+def project_terms(title, description):
+    """Term frequencies of a project, with title terms counting TITLE_WEIGHT times"""
+    terms = Counter()
+    for text, weight in ((title, TITLE_WEIGHT), (description, 1)):
+        for term in re.findall(r'\w+', (text or '').lower()):
+            if len(term) > 1 and term not in STOP_WORDS and not term.isdigit():
+                terms[term] += weight
+    return terms
+
+
+def distinctive_terms(terms, total, limit=QUERY_TERMS):
+    """The highest TF-IDF terms that some, but not too many, other projects also use"""
+    if not terms:
+        return []
+    placeholders = ', '.join(['%s'] * len(terms))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT term, doc FROM {fts_vocab_table(Project)} WHERE term IN ({placeholders})', list(terms)
+        )
+        document_frequency = dict(cursor.fetchall())
+
+    max_df = max(total * MAX_DOCUMENT_FREQUENCY, COMMON_TERM_FLOOR)
+    scored = [
+        (count * math.log(total / df), term)
+        for term, count in terms.items()
+        if 1 < (df := document_frequency.get(term, 0)) <= max_df
+    ]
+    scored.sort(reverse=True)
+    return [term for _, term in scored[:limit]]
+
+
+def find_related(project_id, title, description, total, limit=RELATED_LIMIT):
+    """Ids of the projects most similar to the given one out of total, best first"""
+    terms = distinctive_terms(project_terms(title, description), total)
+    if not terms:
+        return []
+    fts = fts_table(Project)
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    match = ' OR '.join(f'"{term}"' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s AND rowid != %s '
+            f'ORDER BY bm25({fts}, {weights}) LIMIT %s',
+            [match, project_id, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def refresh_related(project_ids):
+    """Recompute and store the related lists of the given projects; returns them by project id"""
+    projects = Project.objects.filter(id__in=project_ids).values_list('id', 'title', 'description')
+    total = Project.objects.count()
+    lists = {pk: find_related(pk, title, description, total) for pk, title, description in projects}
+    RelatedProjects.objects.bulk_create(
+        [RelatedProjects(project_id=pk, project_ids=ids) for pk, ids in lists.items()],
+        update_conflicts=True,
+        unique_fields=['project'],
+        update_fields=['project_ids', 'updated_at'],
+    )
+    return lists
+
+
+def refresh_related_and_neighbours(project_id):
+    """Refresh a project's list, then those of its neighbours so they can list it too"""
+    if not fts_available():
+        return
+    neighbours = refresh_related([project_id]).get(project_id, [])
+    if neighbours:
+        refresh_related(neighbours)
+
+
+def schedule_related_refresh(project_id):
+    """Queue a refresh of a project's list and its neighbours' (the job commits with the caller)"""
+    from .tasks import refresh_related_projects
+
+    refresh_related_projects.delay(project_id)
+
+
+def rebuild_all_related(batch_size=500):
+    """Recompute every related list; returns the number written"""
+    if not fts_available():
+        return 0
+    total = 0
+    ids = Project.objects.order_by('id').values_list('id', flat=True)
+    last_id = 0
+    while True:
+        batch = list(ids.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            total += len(refresh_related(batch))
+        last_id = batch[-1]
+    return total
+
+
+def same_portfolio_projects(project, limit=RELATED_LIMIT):
+    return list(
+        Project.objects.filter(portfolio_id=project.portfolio_id).exclude(id=project.id)
+        .select_related('portfolio')[:limit]
+    )
+
+
+def get_related_projects(project, limit=RELATED_LIMIT):
+    """Projects related to the given one; on a miss, queues the list and returns same_portfolio_projects()"""
+    if not fts_available():
+        # Without the search index, fall back to the project's portfolio
+        return same_portfolio_projects(project, limit)
+
+    ids = RelatedProjects.objects.filter(project_id=project.id).values_list('project_ids', flat=True).first()
+    if ids is None:
+        if cache.add(f'portfolio_app:related-queued:{project.id}', True, REFRESH_QUEUED_TIMEOUT):
+            schedule_related_refresh(project.id)
+        return same_portfolio_projects(project, limit)
+    projects = Project.objects.select_related('portfolio').in_bulk(ids[:limit])
+    # Deleted projects drop out until the list is next refreshed
+    return [projects[pk] for pk in ids[:limit] if pk in projects]
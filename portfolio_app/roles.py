@@ -0,0 +1,150 @@
+"""
+Declarative roles and the engine that syncs them to auth Groups.
+
+ROLES maps each group name to the exact set of permissions it should hold.
+plan_role_sync() reads the permissions, groups and current grants in three
+queries and returns only the differences; apply_role_sync() writes them in
+one transaction. Groups not named in ROLES are left alone.
+
+Run both inside one transaction, as setup_permissions does,
+so two deploys syncing at once can't both plan the same change: SQLite
+transactions here begin IMMEDIATE and take the write lock before the plan
+is read. The inserts also ignore conflicts, so a concurrent sync on other
+databases doesn't fail with an IntegrityError either.
+"""
+from dataclasses import dataclass, field
+
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models import Q
+
+from .backends import bump_permissions_version
+
+
+def _crud(model, *actions):
+    return [f'portfolio_app.{action}_{model}' for action in actions]
+
+
+ROLES = {
+    # Students manage their own portfolio and projects and edit their profile
+    'student': [
+        *_crud('portfolio', 'add', 'change', 'delete', 'view'),
+        *_crud('project', 'add', 'change', 'delete', 'view'),
+        *_crud('student', 'change', 'view'),
+    ],
+    # Instructors curate everyone's work and enroll students
+    'instructor': [
+        *_crud('portfolio', 'change', 'view'),
+        *_crud('project', 'change', 'view'),
+        *_crud('student', 'add', 'change', 'view'),
+    ],
+    # Reviewers (e.g. industry partners) can only look
+    'reviewer': [
+        *_crud('portfolio', 'view'),
+        *_crud('project', 'view'),
+        *_crud('student', 'view'),
+    ],
+}
+
+
+class RoleSpecError(Exception):
+    pass
+
+
+@dataclass
+class RoleChange:
+    role: str
+    create: bool = False
+    add: list = field(default_factory=list)
+    remove: list = field(default_factory=list)
+
+    def __bool__(self):
+        return self.create or bool(self.add) or bool(self.remove)
+
+
+@dataclass
+class RolePlan:
+    changes: list
+    permission_ids: dict  # 'app_label.codename' -> Permission id
+    group_ids: dict  # role -> Group id, for groups that exist
+
+    @property
+    def pending(self):
+        return [change for change in self.changes if change]
+
+
+def _split(perm):
+    app_label, _, codename = perm.partition('.')
+    return app_label, codename
+
+
+def plan_role_sync(roles=None):
+    """Compare roles with the database and return the changes needed"""
+    roles = ROLES if roles is None else roles
+    wanted = {perm for perms in roles.values() for perm in perms}
+
+    lookup = Q()
+    for perm in wanted:
+        app_label, codename = _split(perm)
+        lookup |= Q(content_type__app_label=app_label, codename=codename)
+    permission_ids = {}
+    if wanted:
+        permission_ids = {
+            f'{app_label}.{codename}': pk
+            for pk, app_label, codename in Permission.objects.filter(lookup)
+            .values_list('id', 'content_type__app_label', 'codename')
+        }
+    unknown = sorted(wanted - set(permission_ids))
+    if unknown:
+        raise RoleSpecError(f'Unknown permissions (are migrations applied?): {", ".join(unknown)}')
+    names_by_id = {pk: perm for perm, pk in permission_ids.items()}
+
+    group_ids = dict(Group.objects.filter(name__in=roles).values_list('name', 'id'))
+    granted = {group_id: set() for group_id in group_ids.values()}
+    rows = (
+        Group.permissions.through.objects.filter(group_id__in=granted)
+        .values_list('group_id', 'permission_id', 'permission__content_type__app_label', 'permission__codename')
+    )
+    for group_id, permission_id, app_label, codename in rows:
+        granted[group_id].add(names_by_id.get(permission_id, f'{app_label}.{codename}'))
+
+    changes = []
+    for role, perms in roles.items():
+        current = granted.get(group_ids.get(role), set())
+        changes.append(RoleChange(
+            role=role,
+            create=role not in group_ids,
+            add=sorted(set(perms) - current),
+            remove=sorted(current - set(perms)),
+        ))
+    return RolePlan(changes=changes, permission_ids=permission_ids, group_ids=group_ids)
+
+
+def apply_role_sync(plan):
+    """Write the changes of a plan in one transaction"""
+    pending = plan.pending
+    if not pending:
+        return
+    Grant = Group.permissions.through
+    with transaction.atomic():
+        created = [change.role for change in pending if change.create]
+        group_ids = dict(plan.group_ids)
+        if created:
+            # Ignored conflicts leave no primary keys on the objects, so read them back
+            Group.objects.bulk_create((Group(name=role) for role in created), ignore_conflicts=True)
+            group_ids.update(Group.objects.filter(name__in=created).values_list('name', 'id'))
+
+        for change in pending:
+            if change.remove:
+                removed = Q()
+                for perm in change.remove:
+                    app_label, codename = _split(perm)
+                    removed |= Q(permission__content_type__app_label=app_label, permission__codename=codename)
+                Grant.objects.filter(removed, group_id=group_ids[change.role]).delete()
+        grants = [
+            Grant(group_id=group_ids[change.role], permission_id=plan.permission_ids[perm])
+            for change in pending for perm in change.add
+        ]
+        Grant.objects.bulk_create(grants, ignore_conflicts=True)
+    # Bulk writes skip m2m_changed, so invalidate cached permissions here
+    bump_permissions_version()
@@ -0,0 +1,22 @@
+"""
+Test runner that applies settings.TEST_SETTINGS for the whole test run.
+
+Settings that differ under test (plain static storage, raising query
+budgets, inline thumbnailing) live in one dict rather than behind a check
+of how the process was started, so every way of launching the runner gets
+them.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**getattr(settings, 'TEST_SETTINGS', {}))
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,196 @@
+"""
+Full-text search backed by SQLite FTS5.
+
+Each indexed model gets an external-content FTS5 table that mirrors the
+searchable columns of its base table, kept in sync by SQL triggers so bulk
+inserts, queryset updates and cascade deletes are all covered. The tables
+and triggers are (re)installed after every migrate, which also repairs the
+triggers when SQLite rebuilds a table during a schema change.
+
+When FTS5 is not available (another database backend, or an SQLite build
+without the extension) searches fall back to OR'd icontains filters.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, OperationalError
+from django.db.models import CharField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Student, Portfolio, Project
+
+
+# Searchable columns per model; the first column is weighted highest
+SEARCH_FIELDS = {
+    Project: ('title', 'description'),
+    Portfolio: ('title', 'about'),
+    Student: ('name', 'email'),
+}
+
+# bm25() weight for each column, in SEARCH_FIELDS order
+COLUMN_WEIGHTS = (10.0, 1.0)
+
+# Control characters used to mark matches in snippets before escaping
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 16
+
+_fts_available = None
+
+
+def fts_table(model):
+    """Name of the FTS5 table that indexes the given model"""
+    return f'{model._meta.db_table}_fts'
+
+
+def fts_vocab_table(model):
+    """Name of the fts5vocab table listing the document frequency of each indexed term"""
+    return f'{fts_table(model)}_vocab'
+
+
+def _trigger_sql(model):
+    table = model._meta.db_table
+    fts = fts_table(model)
+    columns = ', '.join(SEARCH_FIELDS[model])
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_FIELDS[model])
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_FIELDS[model])
+    insert = f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});'
+    delete = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN {delete} {insert} END',
+    ]
+
+
+def install_search_index(using=DEFAULT_DB_ALIAS):
+    """
+    Create any missing FTS5 tables and triggers, rebuilding the index of each
+    model whose table or triggers had to be (re)created.
+
+    Returns False when FTS5 is not available on the database.
+    """
+    global _fts_available
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return False
+
+    with conn.cursor() as cursor:
+        for model, fields in SEARCH_FIELDS.items():
+            fts = fts_table(model)
+            names = [fts, f'{fts}_ai', f'{fts}_ad', f'{fts}_au']
+            cursor.execute(
+                'SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)',
+                names,
+            )
+            complete = cursor.fetchone()[0] == len(names)
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5('
+                    f"{', '.join(fields)}, "
+                    f"content='{model._meta.db_table}', content_rowid='id')"
+                )
+            except OperationalError:
+                # SQLite was compiled without FTS5
+                _fts_available = False
+                return False
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_vocab_table(model)} USING fts5vocab({fts}, 'row')"
+            )
+            for sql in _trigger_sql(model):
+                cursor.execute(sql)
+            if not complete:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    _fts_available = None
+    return True
+
+
+def rebuild_search_index():
+    """Re-read every indexed row from its base table into the FTS5 tables"""
+    if not fts_available():
+        return False
+    with connection.cursor() as cursor:
+        for model in SEARCH_FIELDS:
+            fts = fts_table(model)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    return True
+
+
+def fts_available():
+    """Whether the FTS5 tables exist on the default database"""
+    global _fts_available
+    if _fts_available is None:
+        if connection.vendor != 'sqlite':
+            _fts_available = False
+        else:
+            expected = {fts_table(model) for model in SEARCH_FIELDS}
+            _fts_available = expected.issubset(connection.introspection.table_names())
+    return _fts_available
+
+
+def build_match_query(search_query):
+    """
+    Turn free text into a safe FTS5 query: every word is quoted (so FTS5
+    operators in user input are treated literally) and prefix-matched, and all
+    words must match.
+    """
+    terms = re.findall(r'\w+', search_query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _icontains_filter(queryset, search_query):
+    condition = Q()
+    for field in SEARCH_FIELDS[queryset.model]:
+        condition |= Q(**{f'{field}__icontains': search_query})
+    return queryset.filter(condition)
+
+
+def matching(queryset, search_query):
+    """
+    Filter a queryset down to rows matching search_query, without ranking
+    or snippets (for counts and aggregates).
+    """
+    match = build_match_query(search_query)
+    if not match or not fts_available():
+        return _icontains_filter(queryset, search_query)
+    fts = fts_table(queryset.model)
+    return queryset.filter(id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match]))
+
+
+def search(queryset, search_query):
+    """
+    Filter a Project, Portfolio or Student queryset down to rows matching
+    search_query, best matches first.
+
+    With FTS5 each row is annotated with ``search_rank`` and
+    ``search_snippet``; render the snippet with the ``highlight`` filter.
+    """
+    match = build_match_query(search_query)
+    if not match or not fts_available():
+        return _icontains_filter(queryset, search_query)
+
+    model = queryset.model
+    table = model._meta.db_table
+    fts = fts_table(model)
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    lookup = f'FROM {fts} WHERE {fts} MATCH %s AND {fts}.rowid = {table}.id'
+
+    return matching(queryset, search_query).annotate(
+        search_rank=RawSQL(
+            f'SELECT bm25({fts}, {weights}) {lookup}', [match], output_field=FloatField()
+        ),
+        search_snippet=RawSQL(
+            f'SELECT snippet({fts}, -1, %s, %s, %s, {SNIPPET_TOKENS}) {lookup}',
+            [HIGHLIGHT_START, HIGHLIGHT_END, '…', match],
+            output_field=CharField(),
+        ),
+    ).order_by('search_rank', 'id')
+
+
+def highlight(snippet):
+    """Escape a search snippet and wrap its matched terms in <mark> tags"""
+    html = escape(snippet)
+    html = html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+    return mark_safe(html)
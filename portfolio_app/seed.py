@@ -0,0 +1,108 @@
+"""
+Synthetic data for development and benchmarking.
+
+seed_data() generates plausible portfolios, students and projects with
+bulk_create, a few thousand rows per statement, then rebuilds the derived
+data that model signals would otherwise maintain (snapshots, change
+counters, denormalized counts and the cached dashboard). The search index is kept in sync by
+its SQLite triggers. A fixed random seed produces the same dataset on
+every run.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import Max
+
+from .conditional import bump_version
+from .counters import adjust_site_stats
+from .models import Student, Portfolio, Project
+from .snapshots import refresh_snapshots_in_batches
+
+
+FIRST_NAMES = (
+    'Alex', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Avery', 'Quinn',
+    'Jamie', 'Skyler', 'Rowan', 'Emerson', 'Hayden', 'Parker', 'Reese', 'Sage',
+    'Maria', 'Wei', 'Priya', 'Omar', 'Elena', 'Kenji', 'Fatima', 'Lucas',
+)
+LAST_NAMES = (
+    'Smith', 'Garcia', 'Nguyen', 'Patel', 'Johnson', 'Kim', 'Martinez', 'Brown',
+    'Chen', 'Lopez', 'Wilson', 'Anderson', 'Okafor', 'Rossi', 'Silva', 'Novak',
+)
+TOPICS = (
+    'Compiler', 'Web Scraper', 'Chess Engine', 'Chat Server', 'Ray Tracer',
+    'Inventory System', 'Mobile Game', 'Password Manager', 'Weather Dashboard',
+    'Neural Network', 'File Sync Tool', 'Packet Sniffer', 'Budget Tracker',
+    'Recommendation Engine', 'Physics Simulator', 'Voting System',
+)
+LANGUAGES = ('Python', 'Rust', 'Go', 'C++', 'Java', 'TypeScript', 'C#', 'Haskell')
+DESCRIPTIONS = (
+    'A {topic} written in {language} for {course}.',
+    'Built a {topic} in {language} with automated tests and CI.',
+    'Team project: a {topic} using {language}, deployed to the cloud.',
+    'Capstone {topic} implemented in {language}; focuses on performance.',
+)
+COURSES = ('CS 1450', 'CS 2060', 'CS 3160', 'CS 4200', 'CS 4300', 'CS 4720', 'Senior Design')
+MAJORS = [code for code, _ in Student.MAJOR]
+
+
+def seed_data(students, projects_per_portfolio, batch_size=2000, seed=0, active_ratio=0.8):
+    """
+    Create ``students`` students, each with a portfolio holding
+    ``projects_per_portfolio`` projects. Returns (students, portfolios,
+    projects) created.
+    """
+    rng = random.Random(seed)
+    # Continue numbering after existing rows so emails stay unique
+    offset = (Student.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    created = [0, 0, 0]
+
+    for start in range(0, students, batch_size):
+        numbers = range(offset + start, offset + min(start + batch_size, students))
+        with transaction.atomic():
+            people = []
+            portfolios = []
+            for number in numbers:
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                email = f'{first[0].lower()}{last.lower()}{number}@uccs.edu'
+                people.append((f'{first} {last}', email))
+                portfolios.append(Portfolio(
+                    title=f"{first} {last}'s Portfolio",
+                    about=f'{first} studies computing at UCCS and enjoys {rng.choice(TOPICS).lower()}s.',
+                    contact_email=email,
+                    is_active=rng.random() < active_ratio,
+                    project_count=projects_per_portfolio,
+                ))
+            Portfolio.objects.bulk_create(portfolios)
+
+            Student.objects.bulk_create(
+                Student(name=name, email=email, major=rng.choice(MAJORS), Portfolio=portfolio)
+                for (name, email), portfolio in zip(people, portfolios)
+            )
+
+            projects = []
+            for portfolio in portfolios:
+                for _ in range(projects_per_portfolio):
+                    topic, language = rng.choice(TOPICS), rng.choice(LANGUAGES)
+                    projects.append(Project(
+                        title=f'{language} {topic}',
+                        description=rng.choice(DESCRIPTIONS).format(
+                            topic=topic.lower(), language=language, course=rng.choice(COURSES),
+                        ),
+                        portfolio=portfolio,
+                    ))
+            Project.objects.bulk_create(projects, batch_size=batch_size)
+            adjust_site_stats(
+                active_portfolios=sum(portfolio.is_active for portfolio in portfolios),
+                students=len(people),
+                projects=len(projects),
+            )
+
+        created[0] += len(people)
+        created[1] += len(portfolios)
+        created[2] += len(projects)
+        refresh_snapshots_in_batches([portfolio.pk for portfolio in portfolios])
+
+    if students:
+        for model in (Portfolio, Student, Project):
+            bump_version(model)
+    return tuple(created)
@@ -0,0 +1,163 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate, m2m_changed
+from django.dispatch import receiver
+
+from .models import Student, Portfolio, Project, PortfolioSnapshot
+from . import autocomplete
+from .backends import bump_permissions_version
+from .conditional import bump_version
+from .counters import adjust_project_count, adjust_site_stats
+from .db import configure_sqlite
+from .search import install_search_index
+from .snapshots import schedule_refresh
+from .related import schedule_related_refresh
+
+
+@receiver(post_save, sender=Portfolio)
+@receiver(post_delete, sender=Portfolio)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def content_changed(sender, **kwargs):
+    """Bump the page validators, and with them the home page cache key, on every write"""
+    bump_version(sender)
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    """Apply the SQLite pragmas to every new database connection"""
+    configure_sqlite(connection)
+
+
+@receiver(post_migrate)
+def install_search_tables(sender, using, **kwargs):
+    """Create the full-text search tables and repair their triggers after migrate"""
+    if sender.name == 'portfolio_app':
+        install_search_index(using)
+
+
+@receiver(post_save, sender=Portfolio)
+@receiver(post_delete, sender=Portfolio)
+def refresh_portfolio_snapshot(sender, instance, **kwargs):
+    """Rebuild a portfolio's snapshot after it changes"""
+    schedule_refresh(instance.pk)
+
+
+@receiver(pre_save, sender=Project)
+def refresh_previous_portfolio_snapshot(sender, instance, **kwargs):
+    """Rebuild the snapshot of the portfolio a project is being moved out of"""
+    instance._previous_portfolio_id = None
+    if instance.pk is not None:
+        previous = Project.all_objects.filter(pk=instance.pk).values_list('portfolio_id', flat=True).first()
+        instance._previous_portfolio_id = previous
+        if previous != instance.portfolio_id:
+            schedule_refresh(previous)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def refresh_project_snapshot(sender, instance, **kwargs):
+    """Rebuild the snapshot of the portfolio a project belongs to"""
+    schedule_refresh(instance.portfolio_id)
+
+
+@receiver(pre_save, sender=Portfolio)
+def remember_portfolio_activation(sender, instance, **kwargs):
+    """Note whether a saved portfolio was active, so its activation can be counted"""
+    instance._was_active = False
+    if instance.pk is not None:
+        instance._was_active = bool(
+            Portfolio.all_objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Portfolio)
+def count_saved_portfolio(sender, instance, **kwargs):
+    adjust_site_stats(active_portfolios=int(instance.is_active) - int(instance._was_active))
+
+
+@receiver(post_delete, sender=Portfolio)
+def count_deleted_portfolio(sender, instance, **kwargs):
+    if instance.is_active:
+        adjust_site_stats(active_portfolios=-1)
+
+
+@receiver(post_save, sender=Project)
+def count_saved_project(sender, instance, created, **kwargs):
+    """Count a new project, or move the count of a project moved to another portfolio"""
+    previous = None if created else instance._previous_portfolio_id
+    if previous != instance.portfolio_id:
+        adjust_project_count(previous, -1)
+        adjust_project_count(instance.portfolio_id, 1)
+    if created:
+        adjust_site_stats(projects=1)
+
+
+@receiver(post_delete, sender=Project)
+def count_deleted_project(sender, instance, **kwargs):
+    adjust_project_count(instance.portfolio_id, -1)
+    adjust_site_stats(projects=-1)
+
+
+@receiver(post_save, sender=Student)
+def count_saved_student(sender, instance, created, **kwargs):
+    if created:
+        adjust_site_stats(students=1)
+
+
+@receiver(post_delete, sender=Student)
+def count_deleted_student(sender, instance, **kwargs):
+    adjust_site_stats(students=-1)
+
+
+@receiver(post_save, sender=Project)
+def refresh_related_projects(sender, instance, **kwargs):
+    """Recompute the related projects of a saved project and of its neighbours"""
+    schedule_related_refresh(instance.pk)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def refresh_student_snapshot(sender, instance, **kwargs):
+    """Rebuild the snapshots showing a student, including one they just left"""
+    previous = PortfolioSnapshot.objects.filter(student_id=instance.pk).values_list('portfolio_id', flat=True)
+    schedule_refresh(instance.Portfolio_id, *previous)
+
+
+@receiver(post_save, sender=Project)
+def index_saved_project(sender, instance, **kwargs):
+    autocomplete.schedule_update('project', instance.pk, instance.title)
+
+
+@receiver(post_save, sender=Portfolio)
+def index_saved_portfolio(sender, instance, update_fields=None, **kwargs):
+    """Suggest active portfolios only, and hide the projects and student of a deleted one"""
+    visible = instance.deleted_at is None
+    autocomplete.schedule_update('portfolio', instance.pk, instance.title, visible and instance.is_active)
+    if update_fields and 'deleted_at' in update_fields:
+        autocomplete.schedule_children_update(instance.pk, visible)
+
+
+@receiver(post_save, sender=Student)
+def index_saved_student(sender, instance, **kwargs):
+    autocomplete.schedule_update('student', instance.pk, instance.name, instance.deleted_at is None)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Portfolio)
+@receiver(post_delete, sender=Student)
+def unindex_deleted(sender, instance, **kwargs):
+    autocomplete.schedule_removal(sender._meta.model_name, instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def permissions_changed(sender, **kwargs):
+    """Invalidate the cached permission sets when memberships or grants change"""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        bump_permissions_version()
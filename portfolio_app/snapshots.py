@@ -0,0 +1,164 @@
+"""
+Materialized portfolio snapshots.
+
+Each PortfolioSnapshot row holds a JSON document with the portfolio, its
+student and its projects, so portfolio_detail and student_detail render from
+a single primary-key (or indexed student_id) lookup. Signals queue a refresh
+whenever a Portfolio, Project or Student changes; the refresh runs once per
+portfolio when the surrounding transaction commits, so cascades and bulk
+edits inside one transaction rebuild each snapshot only once.
+"""
+import threading
+
+from django.db import transaction
+from django.http import Http404
+
+from .models import Student, Portfolio, Project, PortfolioSnapshot
+
+
+PORTFOLIO_FIELDS = ('id', 'title', 'about', 'contact_email', 'is_active')
+STUDENT_FIELDS = ('id', 'name', 'email', 'major', 'Portfolio_id')
+PROJECT_FIELDS = ('id', 'title', 'description', 'portfolio_id')
+
+MAJOR_DISPLAY = dict(Student.MAJOR)
+
+_pending = threading.local()
+
+
+def student_document(student):
+    """Serialize a Student (instance or values() dict) for a snapshot"""
+    if isinstance(student, Student):
+        student = {field: getattr(student, field) for field in STUDENT_FIELDS}
+    return {
+        'id': student['id'],
+        'name': student['name'],
+        'email': student['email'],
+        'major': student['major'],
+        'major_display': MAJOR_DISPLAY.get(student['major'], student['major']),
+    }
+
+
+def build_snapshots(portfolio_ids):
+    """Build unsaved snapshots for the given portfolios in three queries"""
+    portfolios = Portfolio.objects.filter(id__in=portfolio_ids).values(*PORTFOLIO_FIELDS)
+    snapshots = {
+        portfolio['id']: PortfolioSnapshot(
+            portfolio_id=portfolio['id'],
+            document={'portfolio': portfolio, 'student': None, 'projects': []},
+        )
+        for portfolio in portfolios
+    }
+    if not snapshots:
+        return []
+
+    students = Student.objects.filter(Portfolio_id__in=snapshots).values(*STUDENT_FIELDS)
+    for student in students:
+        snapshot = snapshots[student['Portfolio_id']]
+        snapshot.student_id = student['id']
+        snapshot.document['student'] = student_document(student)
+
+    projects = Project.objects.filter(portfolio_id__in=snapshots).order_by('id').values(*PROJECT_FIELDS)
+    for project in projects:
+        snapshots[project.pop('portfolio_id')].document['projects'].append(project)
+
+    return list(snapshots.values())
+
+
+def save_snapshots(snapshots):
+    PortfolioSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['portfolio'],
+        update_fields=['student_id', 'document'],
+    )
+
+
+def refresh_snapshots(portfolio_ids):
+    """Rebuild the snapshots of the given portfolios, dropping those that no longer exist"""
+    portfolio_ids = set(portfolio_ids)
+    with transaction.atomic():
+        snapshots = build_snapshots(portfolio_ids)
+        save_snapshots(snapshots)
+        missing = portfolio_ids - {snapshot.portfolio_id for snapshot in snapshots}
+        if missing:
+            PortfolioSnapshot.objects.filter(portfolio_id__in=missing).delete()
+    return snapshots
+
+
+def refresh_snapshots_in_batches(portfolio_ids, batch_size=500):
+    """Refresh many snapshots, one transaction per batch; returns the number written"""
+    portfolio_ids = sorted(portfolio_ids)
+    total = 0
+    for start in range(0, len(portfolio_ids), batch_size):
+        total += len(refresh_snapshots(portfolio_ids[start:start + batch_size]))
+    return total
+
+
+def rebuild_all_snapshots(batch_size=500):
+    """Rebuild every snapshot in batches; returns the number written"""
+    total = 0
+    ids = Portfolio.objects.order_by('id').values_list('id', flat=True)
+    last_id = 0
+    while True:
+        batch = list(ids.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        total += len(refresh_snapshots(batch))
+        last_id = batch[-1]
+    return total
+
+
+def _flush_pending():
+    portfolio_ids = getattr(_pending, 'portfolio_ids', set())
+    _pending.portfolio_ids = set()
+    if portfolio_ids:
+        refresh_snapshots(portfolio_ids)
+
+
+def schedule_refresh(*portfolio_ids):
+    """Refresh the given snapshots once the current transaction commits"""
+    portfolio_ids = {portfolio_id for portfolio_id in portfolio_ids if portfolio_id is not None}
+    if not portfolio_ids:
+        return
+    if not hasattr(_pending, 'portfolio_ids'):
+        _pending.portfolio_ids = set()
+    _pending.portfolio_ids.update(portfolio_ids)
+    # The first callback to run refreshes everything queued so far; the rest
+    # find the set empty. Registering every time keeps this correct after a
+    # rollback discards earlier callbacks.
+    transaction.on_commit(_flush_pending)
+
+
+def _snapshot_context(snapshot):
+    return {
+        'portfolio': snapshot.document['portfolio'],
+        'student': snapshot.document['student'],
+        'projects': snapshot.document['projects'],
+    }
+
+
+def get_portfolio_context(portfolio_id):
+    """Template context for portfolio_detail, building the snapshot on a miss"""
+    snapshot = PortfolioSnapshot.objects.filter(portfolio_id=portfolio_id).first()
+    if snapshot is None:
+        snapshots = refresh_snapshots([portfolio_id])
+        if not snapshots:
+            raise Http404('No Portfolio matches the given query.')
+        snapshot = snapshots[0]
+    return _snapshot_context(snapshot)
+
+
+def get_student_context(student_id):
+    """Template context for student_detail, building the snapshot on a miss"""
+    snapshot = PortfolioSnapshot.objects.filter(student_id=student_id).first()
+    if snapshot is not None:
+        return _snapshot_context(snapshot)
+
+    student = Student.objects.filter(id=student_id).values(*STUDENT_FIELDS).first()
+    if student is None:
+        raise Http404('No Student matches the given query.')
+    if student['Portfolio_id'] is not None:
+        snapshots = refresh_snapshots([student['Portfolio_id']])
+        if snapshots:
+            return _snapshot_context(snapshots[0])
+    return {'student': student_document(student), 'portfolio': None, 'projects': []}
@@ -0,0 +1,133 @@
+"""
+Soft delete for portfolios and students, with a deferred bulk purge.
+
+Deleting sets ``deleted_at`` and returns at once. The default managers hide
+deleted rows: a deleted portfolio takes its projects and student with it.
+A deleted student also lets go of their portfolio (see
+Student.released_portfolio_id): reverse joins from the portfolio, which
+bypass the default manager, stop finding the student, and the portfolio's
+one-to-one slot is free for another student.
+Deleted rows can be restored for SOFT_DELETE_UNDO_WINDOW seconds.
+
+purge_deleted() removes rows deleted more than SOFT_DELETE_RETENTION_DAYS
+ago. It works in batches, and each batch is a few bulk DELETE statements
+(QuerySet._raw_delete), so no rows are loaded and no per-row signals are
+sent. The site counters are adjusted at soft-delete time, and the FTS
+triggers still fire for the purged rows. Every soft delete queues a purge
+job for when its retention ends; ``manage.py purge_deleted`` runs the same
+purge on demand.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from .counters import adjust_site_stats
+from .models import Student, Portfolio, Project, PortfolioSnapshot, RelatedProjects, Attachment
+
+
+PURGE_BATCH_SIZE = 500
+
+
+def _visible_totals(portfolio):
+    """What a portfolio contributes to the site totals while it is visible"""
+    return {
+        'active_portfolios': int(portfolio.is_active),
+        'projects': Portfolio.all_objects.filter(pk=portfolio.pk).values_list('project_count', flat=True).get(),
+        'students': Student.all_objects.filter(Portfolio=portfolio, deleted_at=None).count(),
+    }
+
+
+def soft_delete_portfolio(portfolio):
+    """Hide a portfolio, with its projects and student, until it is restored or purged"""
+    with transaction.atomic():
+        portfolio.deleted_at = timezone.now()
+        portfolio.save(update_fields=['deleted_at', 'updated_at'])
+        adjust_site_stats(**{field: -count for field, count in _visible_totals(portfolio).items()})
+    _schedule_purge()
+
+
+def soft_delete_student(student):
+    """Hide a student and release their portfolio, which another student may then take"""
+    with transaction.atomic():
+        student.deleted_at = timezone.now()
+        student.released_portfolio_id = student.Portfolio_id
+        student.Portfolio = None
+        student.save(update_fields=['deleted_at', 'released_portfolio_id', 'Portfolio', 'updated_at'])
+        adjust_site_stats(students=-1)
+    _schedule_purge()
+
+
+def undo_deadline():
+    """Rows deleted before this can no longer be restored"""
+    return timezone.now() - timedelta(seconds=settings.SOFT_DELETE_UNDO_WINDOW)
+
+
+def restore_portfolio(portfolio_id):
+    """Undo a recent portfolio delete; returns the portfolio, or None when it is too late"""
+    with transaction.atomic():
+        portfolio = Portfolio.all_objects.filter(pk=portfolio_id, deleted_at__gte=undo_deadline()).first()
+        if portfolio is None:
+            return None
+        portfolio.deleted_at = None
+        portfolio.save(update_fields=['deleted_at', 'updated_at'])
+        adjust_site_stats(**_visible_totals(portfolio))
+    return portfolio
+
+
+def restore_student(student_id):
+    """Undo a recent student delete; returns the student, or None when it is too late"""
+    with transaction.atomic():
+        student = Student.all_objects.filter(pk=student_id, deleted_at__gte=undo_deadline()).first()
+        if student is None:
+            return None
+        student.deleted_at = None
+        # Take the portfolio back, unless it was purged or given to someone else meanwhile
+        released = student.released_portfolio_id
+        if (released is not None and Portfolio.all_objects.filter(pk=released).exists()
+                and not Student.all_objects.filter(Portfolio_id=released).exists()):
+            student.Portfolio_id = released
+        student.released_portfolio_id = None
+        student.save(update_fields=['deleted_at', 'released_portfolio_id', 'Portfolio', 'updated_at'])
+        if not Portfolio.all_objects.filter(pk=student.Portfolio_id, deleted_at__isnull=False).exists():
+            adjust_site_stats(students=1)
+    return student
+
+
+def _raw_delete(queryset):
+    return queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+def purge_deleted(retention_days=None, batch_size=PURGE_BATCH_SIZE):
+    """
+    Hard-delete portfolios and students soft-deleted more than
+    retention_days ago; returns (portfolios, students) purged.
+    """
+    if retention_days is None:
+        retention_days = settings.SOFT_DELETE_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    portfolios = students = 0
+    expired = Portfolio.all_objects.filter(deleted_at__lt=cutoff).order_by('id').values_list('id', flat=True)
+    while ids := list(expired[:batch_size]):
+        with transaction.atomic():
+            # Children first, so the batch never leaves dangling foreign keys
+            _raw_delete(Attachment.objects.filter(project__portfolio_id__in=ids))
+            _raw_delete(RelatedProjects.objects.filter(project__portfolio_id__in=ids))
+            _raw_delete(Project.all_objects.filter(portfolio_id__in=ids))
+            _raw_delete(PortfolioSnapshot.objects.filter(portfolio_id__in=ids))
+            students += _raw_delete(Student.all_objects.filter(Portfolio_id__in=ids))
+            portfolios += _raw_delete(Portfolio.all_objects.filter(id__in=ids))
+
+    expired = Student.all_objects.filter(deleted_at__lt=cutoff).order_by('id').values_list('id', flat=True)
+    while ids := list(expired[:batch_size]):
+        students += _raw_delete(Student.all_objects.filter(id__in=ids))
+    return portfolios, students
+
+
+def _schedule_purge():
+    from .tasks import purge_deleted_rows
+
+    # One minute of slack so the row is past its retention when the job runs
+    purge_deleted_rows.schedule(settings.SOFT_DELETE_RETENTION_DAYS * 24 * 60 * 60 + 60)
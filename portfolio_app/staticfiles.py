@@ -0,0 +1,204 @@
+"""
+Fingerprinted, precompressed static files and a middleware to serve them.
+
+CompressedManifestStaticFilesStorage extends Django's manifest storage:
+after collectstatic has copied and hashed the files (e.g.
+``css/custom.3f2a9c1b.css``), every compressible file is written again as
+``.gz`` and, when the ``brotli`` package is installed, ``.br``. Compression
+happens once at build time, at the highest level, instead of per request.
+
+StaticFilesMiddleware serves STATIC_ROOT directly from the app when DEBUG
+is off (with DEBUG on, runserver serves the source files). It picks
+the smallest encoding the client accepts and answers conditional requests.
+Hashed names never change content, so they are sent with a one-year
+``immutable`` Cache-Control and browsers stop revalidating them. The list
+of files is read once at startup, so requests for names that don't exist
+cost no filesystem lookups and leave nothing behind. This is
+enough for local and small deployments without a CDN or separate web
+server.
+"""
+import gzip
+import json
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf', '.eot',
+}
+# Files smaller than this are not worth a compressed copy
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress_file(path):
+    """Write .gz (and .br) copies of path when they come out smaller; returns the suffixes written"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = []
+    candidates = [('.gz', lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        candidates.insert(0, ('.br', lambda: brotli.compress(data, quality=11)))
+    for suffix, compress in candidates:
+        compressed = compress()
+        # Keep only variants that save at least 5%
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(suffix)
+    return written
+
+
+def is_compressible(name):
+    return os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes gzip and brotli variants of its files"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            names.add(name)
+            if hashed_name:
+                names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+
+        for name in sorted(names):
+            path = self.path(name)
+            if is_compressible(name) and os.path.getsize(path) >= MIN_COMPRESS_SIZE:
+                compress_file(path)
+
+
+class StaticFile:
+    """A file under STATIC_ROOT and its precompressed variants"""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = {
+            encoding: path + suffix
+            for encoding, suffix in ENCODINGS
+            if os.path.isfile(path + suffix)
+        }
+
+    def choose(self, accept_encoding):
+        """(encoding, path) of the best variant the client accepts"""
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding, self.variants[encoding]
+        return None, self.path
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """Serve STATIC_ROOT with precompressed variants and far-future caching for hashed names"""
+
+    def __init__(self, get_response):
+        if settings.DEBUG:
+            # runserver serves the source files through the finders, so edits show up
+            # without a collectstatic, and a stale STATIC_ROOT must not shadow them
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = settings.STATIC_ROOT
+        self.files = {}
+        self.names = self.load_names()
+        self.hashed_names = self.load_hashed_names()
+
+    def load_names(self):
+        """URL names of the files under STATIC_ROOT, without the compressed variants"""
+        names = set()
+        for directory, _, filenames in os.walk(self.root or ''):
+            relative = os.path.relpath(directory, self.root)
+            for filename in filenames:
+                if not filename.endswith(('.gz', '.br')):
+                    names.add(os.path.normpath(os.path.join(relative, filename)).replace(os.sep, '/'))
+        return names
+
+    def load_hashed_names(self):
+        try:
+            with open(os.path.join(self.root, 'staticfiles.json')) as f:
+                return set(json.load(f).get('paths', {}).values())
+        except (OSError, ValueError, TypeError):
+            return set()
+
+    def __call__(self, request):
+        if self.root and request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def find(self, name):
+        # Files only change on deploy, so each one is looked at once. Only
+        # names found at startup are cached, which bounds the cache.
+        if name not in self.names:
+            return None
+        if name not in self.files:
+            path = os.path.join(self.root, *name.split('/'))
+            self.files[name] = StaticFile(path, immutable=name in self.hashed_names)
+        return self.files[name]
+
+    def serve(self, request, name):
+        static_file = self.find(name)
+        if static_file is None:
+            return None
+
+        encoding, path = static_file.choose(request.headers.get('Accept-Encoding', ''))
+        stat = os.stat(path)
+        etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=static_file.content_type)
+                response.headers['Content-Length'] = str(stat.st_size)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(int(stat.st_mtime))
+        if static_file.immutable:
+            response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={settings.STATIC_MAX_AGE}'
+        if static_file.variants:
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
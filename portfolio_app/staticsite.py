@@ -0,0 +1,185 @@
+"""
+Static HTML export of the public pages.
+
+The portfolio, project and student pages of active portfolios are rendered
+as an anonymous visitor sees them and written to
+``<output>/<url path>/index.html``, so a web server can answer those URLs
+from disk and pass everything else to Django.
+
+Each page's fingerprint is a hash of its conditional GET validator (see
+conditional.py): the updated_at times, ids and counts of the rows it shows.
+The fingerprints are kept in ``manifest.json`` next to the pages. A later
+export re-renders only the pages whose fingerprint changed, and deletes the
+pages that are no longer public. Template changes don't alter fingerprints;
+export with ``force`` after deploying them.
+
+Pages are exported in chunks by render_pages(), which the export_static_site
+command runs in a process pool.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpRequest
+from django.urls import reverse
+
+from . import conditional, views
+from .models import Student, Portfolio, Project
+
+
+MANIFEST_NAME = 'manifest.json'
+
+
+@dataclass(frozen=True)
+class Page:
+    view: object
+    state: object
+    url_name: str
+    public: object  # Returns the queryset of public rows
+
+
+PAGES = {
+    'portfolio': Page(
+        views.portfolio_detail, conditional.portfolio_state, 'portfolio_detail',
+        lambda: Portfolio.objects.filter(is_active=True),
+    ),
+    'project': Page(
+        views.project_detail, conditional.project_state, 'project_detail',
+        lambda: Project.objects.filter(portfolio__is_active=True),
+    ),
+    'student': Page(
+        views.student_detail, conditional.student_state, 'student_detail',
+        lambda: Student.objects.filter(Portfolio__is_active=True),
+    ),
+}
+
+
+def public_pages():
+    """Every (kind, id) to export, one query per kind"""
+    return [
+        (kind, pk)
+        for kind, page in PAGES.items()
+        for pk in page.public().order_by('id').values_list('id', flat=True).iterator()
+    ]
+
+
+def page_url(kind, pk):
+    return reverse(PAGES[kind].url_name, args=[pk])
+
+
+def page_file(output_dir, url):
+    return os.path.join(output_dir, *url.strip('/').split('/'), 'index.html')
+
+
+def load_manifest(output_dir):
+    """{url: fingerprint} of the last export, or {} when there was none"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    _write_atomic(os.path.join(output_dir, MANIFEST_NAME), json.dumps(manifest, sort_keys=True).encode())
+
+
+def fingerprint(kind, pk):
+    """Hash of the page's validator, or None when the page no longer exists"""
+    state = PAGES[kind].state(None, pk)
+    if state is None:
+        return None
+    return hashlib.sha256(repr(state).encode()).hexdigest()
+
+
+def render_page(kind, pk):
+    """The page's HTML as an anonymous visitor gets it"""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = page_url(kind, pk)
+    request.user = AnonymousUser()
+    # Skip the conditional GET wrapper; there are no validators to answer
+    response = PAGES[kind].view.__wrapped__(request, pk)
+    return response.content
+
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def render_pages(output_dir, pages, manifest, force=False):
+    """
+    Export a chunk of (kind, id) pages; returns (url, fingerprint, rendered)
+    for each page that still exists. Pages whose fingerprint matches the
+    manifest are left as they are unless force is set.
+    """
+    results = []
+    for kind, pk in pages:
+        url = page_url(kind, pk)
+        path = page_file(output_dir, url)
+        digest = fingerprint(kind, pk)
+        if digest is None:
+            continue
+        if not force and manifest.get(url) == digest and os.path.exists(path):
+            results.append((url, digest, False))
+            continue
+        digest = _export(kind, pk, path, digest)
+        if digest is not None:
+            results.append((url, digest, True))
+    return results
+
+
+def _export(kind, pk, path, digest):
+    """
+    Render and write one page; returns the fingerprint of what was written,
+    or None when the page is gone.
+
+    A render can build derived rows it finds missing (snapshots, related
+    projects), which changes the fingerprint. The page is then rendered once
+    more, so the manifest matches the page on disk. If the fingerprint
+    moves again (a concurrent write), the one from before the last render
+    is kept, and the next export renders the page again.
+    """
+    for attempt in range(2):
+        try:
+            content = render_page(kind, pk)
+        except Http404:
+            return None  # Deleted since the fingerprint was read
+        _write_atomic(path, content)
+        after = fingerprint(kind, pk)
+        if after is None:
+            return None
+        if after == digest or attempt:
+            return digest
+        digest = after
+
+
+def remove_pages(output_dir, urls):
+    """Delete exported pages, and the directories they leave empty"""
+    root = os.path.abspath(output_dir)
+    for url in urls:
+        path = page_file(output_dir, url)
+        try:
+            os.remove(path)
+        except OSError:
+            continue  # Already gone
+        directory = os.path.dirname(os.path.abspath(path))
+        # Unlike os.removedirs(), never climb to the output directory itself
+        while directory != root and directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break  # Still holds other pages
+            directory = os.path.dirname(directory)
@@ -0,0 +1,78 @@
+"""
+Slow work moved out of requests and run by ``manage.py run_worker``.
+"""
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .jobs import task
+from .models import Student, Portfolio
+from .related import refresh_related_and_neighbours
+from .softdelete import purge_deleted
+
+
+@task
+def send_email(subject, body, from_email, to, html_body=None):
+    """Send one email; the SMTP round trips are what make password resets slow"""
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html_body:
+        message.attach_alternative(html_body, 'text/html')
+    message.send()
+
+
+@task
+def send_password_reset_email(user_id, to_email, site, subject_template_name, email_template_name,
+                              from_email=None, html_email_template_name=None):
+    """
+    Render and send a password reset email. The reset token is made here, so
+    the queued job only ever stores the user id, never a working reset link.
+    site holds the domain, site_name and protocol of the request.
+    """
+    user = User.objects.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return
+    context = {
+        'email': to_email,
+        'user': user,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+        **site,
+    }
+    subject = ''.join(loader.render_to_string(subject_template_name, context).splitlines())
+    body = loader.render_to_string(email_template_name, context)
+    html_body = None
+    if html_email_template_name is not None:
+        html_body = loader.render_to_string(html_email_template_name, context)
+    send_email(subject, body, from_email, [to_email], html_body)
+
+
+@task
+def setup_student_account(user_id):
+    """Give a newly registered user the student group, a Student profile and an inactive Portfolio"""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or Student.all_objects.filter(user=user).exists():
+        return
+    with transaction.atomic():
+        user.groups.add(Group.objects.get(name='student'))
+        portfolio = Portfolio.objects.create(
+            title=f"{user.username}'s Portfolio",
+            contact_email=user.email,
+            is_active=False,  # User can activate it later
+        )
+        Student.objects.create(user=user, name=user.username, email=user.email, Portfolio=portfolio)
+
+
+@task
+def purge_deleted_rows():
+    """Hard-delete portfolios and students whose soft-delete retention has ended"""
+    purge_deleted()
+
+
+@task
+def refresh_related_projects(project_id):
+    """Recompute the related projects of a project and of its neighbours"""
+    refresh_related_and_neighbours(project_id)
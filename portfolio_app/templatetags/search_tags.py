@@ -0,0 +1,11 @@
+from django import template
+
+from ..search import highlight as highlight_snippet
+
+register = template.Library()
+
+
+@register.filter
+def highlight(snippet):
+    """Render a full-text search snippet with its matches marked"""
+    return highlight_snippet(snippet)
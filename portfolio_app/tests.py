@@ -1,3 +1,1302 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, Permission, User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
+
+from . import (
+    attachments, autocomplete, backends, benchmark, conditional, counters, db, facets, jobs, loadtest, metrics,
+    related, roles, search, softdelete, staticsite,
+)
+from .attachments import add_attachments
+from .models import (
+    Student, Portfolio, Project, PortfolioSnapshot, Attachment, Blob, RelatedProjects, SiteStats, Job,
+)
+from .pagination import CursorPaginator
+from .seed import seed_data
+from .snapshots import refresh_snapshots
+from .staticfiles import StaticFilesMiddleware
+
+
+def make_portfolios(count, start=0):
+    """Create active portfolios, each with a student and two projects"""
+    for i in range(start, start + count):
+        portfolio = Portfolio.objects.create(
+            title=f'Portfolio {i}',
+            contact_email=f'student{i}@uccs.edu',
+            is_active=True,
+        )
+        Student.objects.create(
+            name=f'Student {i}',
+            email=f'student{i}@uccs.edu',
+            major='CSCI-BS',
+            Portfolio=portfolio,
+        )
+        Project.objects.create(title=f'Project {i}a', portfolio=portfolio)
+        Project.objects.create(title=f'Project {i}b', portfolio=portfolio)
+
+
+class IndexViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_query_count_does_not_grow_with_data(self):
+        make_portfolios(2)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('index'))
+
+        make_portfolios(30, start=2)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('index'))
+
+        self.assertEqual(response.context['total_portfolios'], 32)
+        self.assertEqual(response.context['total_students'], 32)
+        self.assertEqual(response.context['total_projects'], 64)
+
+    def test_cached_dashboard_only_runs_validator_query(self):
+        make_portfolios(3)
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('index'))
+
+    def test_model_changes_invalidate_dashboard(self):
+        make_portfolios(1)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['total_projects'], 2)
+
+        Project.objects.create(title='New Project', portfolio=Portfolio.objects.get())
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['total_projects'], 3)
+
+        # A write made by another process only reaches this one through the database counters
+        SiteStats.objects.update(projects=99)
+        conditional.bump_version(Project)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['total_projects'], 99)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        portfolio = Portfolio.objects.create(title='Search Portfolio', contact_email='a@uccs.edu')
+        self.title_match = Project.objects.create(
+            title='Compiler design', description='A toy language', portfolio=portfolio,
+        )
+        self.body_match = Project.objects.create(
+            title='Web app', description='Uses a <b>compiler</b> plugin', portfolio=portfolio,
+        )
+        Project.objects.create(title='Unrelated', portfolio=portfolio)
+
+    def test_results_are_ranked_and_kept_in_sync(self):
+        results = list(search.search(Project.objects.all(), 'compil'))
+        self.assertEqual(results, [self.title_match, self.body_match])
+
+        self.body_match.description = 'No longer relevant'
+        self.body_match.save()
+        self.assertEqual(list(search.search(Project.objects.all(), 'compil')), [self.title_match])
+
+    def test_snippets_are_escaped(self):
+        project = search.search(Project.objects.filter(id=self.body_match.id), 'compiler').get()
+        self.assertIn('&lt;b&gt;<mark>compiler</mark>&lt;/b&gt;', search.highlight(project.search_snippet))
+
+    def test_fallback_without_fts(self):
+        with mock.patch.object(search, 'fts_available', return_value=False):
+            results = search.search(Project.objects.order_by('id'), 'compiler')
+            self.assertEqual(list(results), [self.title_match, self.body_match])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        make_portfolios(10)
+
+    def test_walks_every_row_forwards_and_backwards(self):
+        paginator = CursorPaginator(Student.objects.order_by('name'), 3)
+        expected = list(Student.objects.order_by('name', 'id'))
+
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([s for page in pages for s in page], expected)
+        self.assertFalse(pages[0].has_previous())
+
+        page = pages[-1]
+        seen = list(page)
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            seen = list(page) + seen
+        self.assertEqual(seen, expected)
+
+    def test_list_view_skips_count_and_offset(self):
+        make_portfolios(5, start=10)
+        response = self.client.get(reverse('student_list'), {'cursor': ''})
+        cursor = response.context['students'].next_cursor
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('student_list'), {'cursor': cursor})
+        self.assertEqual(len(response.context['students']), 3)
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('student_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['students'].has_previous())
+
+
+class PortfolioSnapshotTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_portfolios(2)
+        self.portfolio, self.other = Portfolio.objects.order_by('id')
+
+    def test_detail_pages_are_single_lookups(self):
+        student = self.portfolio.student
+        # One query for the conditional GET validator, one for the snapshot
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('portfolio_detail', args=[self.portfolio.id]))
+        self.assertEqual(len(response.context['projects']), 2)
+        self.assertEqual(response.context['student']['major_display'], 'BS in Computer Science')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('student_detail', args=[student.id]))
+        self.assertEqual(response.context['portfolio']['id'], self.portfolio.id)
+
+    def test_snapshots_follow_changes(self):
+        project = Project.objects.filter(portfolio=self.portfolio).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            project.portfolio = self.other
+            project.save()
+        self.assertEqual(len(self.portfolio.snapshot.document['projects']), 1)
+        self.other.snapshot.refresh_from_db()
+        self.assertEqual(len(self.other.snapshot.document['projects']), 3)
+
+        student = self.portfolio.student
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.student.delete()
+            student.Portfolio = self.other
+            student.save()
+        self.portfolio.snapshot.refresh_from_db()
+        self.other.snapshot.refresh_from_db()
+        self.assertIsNone(self.portfolio.snapshot.document['student'])
+        self.assertEqual(self.other.snapshot.student_id, student.id)
+
+    def test_missing_objects_are_404(self):
+        self.assertEqual(self.client.get(reverse('portfolio_detail', args=[999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('student_detail', args=[999])).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        make_portfolios(1)
+        self.project = Project.objects.first()
+
+    def assertNotModified(self, url, **headers):
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_page_revalidates(self):
+        url = reverse('project_detail', args=[self.project.id])
+        response = self.client.get(url)
+        self.assertNotModified(url, if_none_match=response['ETag'])
+        self.assertNotModified(url, if_modified_since=response['Last-Modified'])
+
+        self.project.portfolio.title = 'Renamed'
+        self.project.portfolio.save()
+        response = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_page_revalidates_after_delete(self):
+        url = reverse('project_list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, if_none_match=etag)
+
+        self.project.delete()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+
+class ImportPortfoliosTests(TestCase):
+    def write(self, suffix, content):
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        with handle:
+            handle.write(content)
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def test_imports_and_upserts_by_natural_key(self):
+        portfolios = self.write('.csv', (
+            'title,about,contact_email,is_active\n'
+            'First,About,one@uccs.edu,true\n'
+            'Second,,two@uccs.edu,false\n'
+        ))
+        projects = self.write('.jsonl', (
+            '{"title": "Robot", "description": "v1", "portfolio": "one@uccs.edu"}\n'
+            '{"title": "Robot", "description": "v2", "portfolio": "one@uccs.edu"}\n'
+            '{"title": "Orphan", "portfolio": "nobody@uccs.edu"}\n'
+        ))
+        out = io.StringIO()
+        call_command('import_portfolios', portfolios, model='portfolio', batch_size=1, stdout=out)
+        call_command('import_portfolios', projects, model='project', upsert=True, stdout=out)
+        call_command('import_portfolios', projects, model='project', upsert=True, stdout=out)
+
+        self.assertEqual(Portfolio.objects.filter(is_active=True).get().title, 'First')
+        project = Project.objects.get()
+        self.assertEqual((project.title, project.description), ('Robot', 'v2'))
+        self.assertEqual(project.portfolio.snapshot.document['projects'][0]['description'], 'v2')
+        self.assertIn('0 created, 1 updated, 1 skipped', out.getvalue())
+
+    def test_upserts_adjust_counters_and_snapshots_of_moved_students(self):
+        make_portfolios(2)
+        spare = Portfolio.objects.create(title='Spare', contact_email='spare@uccs.edu', is_active=True)
+        old = Portfolio.objects.get(title='Portfolio 0')
+        refresh_snapshots([old.id])
+        softdelete.soft_delete_student(Student.objects.get(email='student1@uccs.edu'))
+        counters.recount()
+
+        students = self.write('.jsonl', (
+            '{"name": "Moved", "email": "student0@uccs.edu", "major": "CSCI-BS", "portfolio": "spare@uccs.edu"}\n'
+            '{"name": "Back", "email": "student1@uccs.edu", "major": "CSCI-BS"}\n'
+            '{"name": "New", "email": "new@uccs.edu", "major": "CSCI-BS"}\n'
+        ))
+        projects = self.write('.csv', 'title,portfolio\nOne,spare@uccs.edu\nTwo,spare@uccs.edu\nProject 0a,student0@uccs.edu\n')
+        portfolios = self.write('.csv', 'title,contact_email,is_active\nPortfolio 0,student0@uccs.edu,false\n')
+        for path, model in ((students, 'student'), (projects, 'project'), (portfolios, 'portfolio')):
+            call_command('import_portfolios', path, model=model, upsert=True, stdout=io.StringIO())
+
+        self.assertEqual(Student.all_objects.count(), 3)
+        self.assertEqual(Student.objects.get(email='student1@uccs.edu').name, 'Back')
+        self.assertEqual(Student.objects.get(email='student0@uccs.edu').Portfolio, spare)
+        self.assertIsNone(PortfolioSnapshot.objects.get(portfolio=old).document['student'])
+        stats = SiteStats.objects.values('active_portfolios', 'students', 'projects').get()
+        self.assertEqual(stats, {'active_portfolios': 2, 'students': 3, 'projects': 6})
+        self.assertEqual(counters.recount()[0], 0)
+        self.assertEqual(SiteStats.objects.values('active_portfolios', 'students', 'projects').get(), stats)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        make_portfolios(3)
+        Portfolio.objects.create(title='Empty', contact_email='empty@uccs.edu')
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+
+    def export(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export_portfolios'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_jsonl_nests_students_and_projects(self):
+        documents = [json.loads(line) for line in self.export().decode().splitlines()]
+        self.assertEqual(len(documents), 4)
+        self.assertEqual(documents[0]['student']['name'], 'Student 0')
+        self.assertEqual([p['title'] for p in documents[0]['projects']], ['Project 0a', 'Project 0b'])
+        self.assertEqual((documents[3]['student'], documents[3]['projects']), (None, []))
+
+    def test_gzipped_csv_has_a_row_per_project(self):
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(self.export(format='csv', gzip='1')).decode())))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[-1]['portfolio_title'], 'Empty')
+
+    def test_export_is_staff_only(self):
+        user = User.objects.create_user('student', password='pw')
+        self.client.force_login(user)
+        response = self.client.get(reverse('export_portfolios'))
+        self.assertEqual(response.status_code, 302)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        make_portfolios(15)
+
+    def test_metrics_are_recorded_per_view(self):
+        self.client.get(reverse('student_list'))
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('portfolio_http_requests_total{view="student_list",method="GET",status="200"} 1', body)
+        self.assertIn('portfolio_db_queries_per_request_count{view="student_list"} 1', body)
+
+    def test_metrics_require_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(reverse('metrics'), headers={'authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_budget_raises_during_tests(self):
+        with self.settings(QUERY_BUDGETS={'student_list': 1}):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get(reverse('student_list'))
+
+
+class SeedDataTests(TestCase):
+    def test_seed_data_creates_linked_rows_and_snapshots(self):
+        out = io.StringIO()
+        call_command('seed_data', students=30, projects_per_portfolio=2, batch_size=7, stdout=out)
+
+        self.assertIn('Created 30 students, 30 portfolios and 60 projects', out.getvalue())
+        self.assertEqual(Student.objects.filter(Portfolio__isnull=False).count(), 30)
+        self.assertEqual(Project.objects.count(), 60)
+        self.assertEqual(PortfolioSnapshot.objects.count(), 30)
+
+    def test_same_seed_generates_same_data(self):
+        seed_data(5, 1, seed=3)
+        first = list(Project.objects.order_by('id').values_list('title', flat=True))
+        Portfolio.objects.all().delete()
+        seed_data(5, 1, seed=3)
+        self.assertEqual(list(Project.objects.order_by('id').values_list('title', flat=True)), first)
+
+
+class BenchmarkTests(TestCase):
+    def test_every_route_is_benchmarked(self):
+        seed_data(5, 2)
+        results = benchmark.run_benchmark(iterations=2, warmup=0)
+        routes = results['routes']
+
+        self.assertEqual(routes['student_list']['user'], 'anonymous')
+        self.assertEqual(routes['portfolio_update']['user'], 'staff')
+        self.assertEqual(routes['metrics']['status'], [200])
+        self.assertIn('project_detail', routes)
+        self.assertEqual(routes['api_student_detail']['status'], [200])
+        self.assertNotIn('portfolio_restore', routes)
+        self.assertLessEqual(routes['index']['p50_ms'], routes['index']['p99_ms'])
+
+    def test_current_database_runs_as_an_existing_staff_user(self):
+        with self.assertRaisesMessage(CommandError, '--use-current-database needs --staff-user'):
+            call_command('benchmark', use_current_database=True)
+        with self.assertRaisesMessage(CommandError, "No staff user named 'nobody'"):
+            call_command('benchmark', use_current_database=True, staff_user='nobody')
+
+        User.objects.create_user('admin', is_staff=True, is_superuser=True)
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'benchmark', use_current_database=True, staff_user='admin', routes=['metrics'], iterations=1,
+                output=os.path.join(directory, 'results.json'), stdout=io.StringIO(),
+            )
+            with open(os.path.join(directory, 'results.json')) as f:
+                self.assertEqual(json.load(f)['routes']['metrics']['status'], [200])
+        self.assertFalse(User.objects.filter(username=benchmark.BENCHMARK_USER).exists())
+
+    def test_compare_flags_extra_queries_and_slower_medians(self):
+        baseline = {'routes': {
+            'index': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 3},
+            'student_list': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 3},
+        }}
+        results = {'routes': {
+            'index': {'p50_ms': 11.0, 'p95_ms': 40.0, 'queries': 4},
+            'student_list': {'p50_ms': 30.0, 'p95_ms': 40.0, 'queries': 3},
+            'project_list': {'p50_ms': 99.0, 'p95_ms': 99.0, 'queries': 9},
+        }}
+        regressions = benchmark.compare(results, baseline, tolerance=0.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('index: 4 queries'))
+        self.assertTrue(regressions[1].startswith('student_list: p50'))
+
+
+class DatabaseConfigurationTests(TestCase):
+    def test_pragmas_are_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+class ReadWriteRouterTests(SimpleTestCase):
+    # Not a TestCase: its wrapping transaction would pin every read to the primary
+
+    def test_router_reads_from_replica_only_in_safe_requests(self):
+        router = db.ReadWriteRouter()
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(Portfolio))
+            return HttpResponse()
+
+        middleware = db.ReadWriteRoutingMiddleware(view)
+        factory = RequestFactory()
+        with mock.patch.object(db, 'replica_configured', return_value=True):
+            self.assertEqual(router.db_for_read(Portfolio), 'default')
+            middleware(factory.get('/'))
+            response = middleware(factory.post('/'))
+            sticky = factory.get('/')
+            sticky.COOKIES[db.STICKY_COOKIE] = '1'
+            middleware(sticky)
+
+        self.assertEqual(seen, ['replica', 'default', 'default'])
+        self.assertIn(db.STICKY_COOKIE, response.cookies)
+        self.assertEqual(router.db_for_write(Portfolio), 'default')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisionStudentsTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name='student')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_roster(self, rows):
+        path = os.path.join(self.directory.name, 'roster.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, ['username', 'email', 'password', 'name', 'major'])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def test_provisions_accounts_with_profiles(self):
+        path = self.write_roster([
+            {'username': f'user{i}', 'email': f'user{i}@uccs.edu', 'password': f'secret-{i}',
+             'name': f'User {i}', 'major': 'CSCI-BS'}
+            for i in range(5)
+        ] + [{'username': 'user0', 'email': 'dup@uccs.edu', 'password': 'x', 'name': '', 'major': ''}])
+        out = io.StringIO()
+        call_command('provision_students', path, workers=2, batch_size=2, stdout=out)
+
+        self.assertIn('Provisioned 5 students', out.getvalue())
+        self.assertIn('(1 skipped)', out.getvalue())
+        user = User.objects.get(username='user3')
+        self.assertTrue(user.check_password('secret-3'))
+        self.assertEqual(list(user.groups.all()), [self.group])
+        self.assertEqual(user.student.name, 'User 3')
+        self.assertEqual(user.student.Portfolio.title, "user3's Portfolio")
+        self.assertEqual(PortfolioSnapshot.objects.count(), 5)
+
+    def test_existing_usernames_are_skipped(self):
+        User.objects.create_user('taken')
+        path = self.write_roster([{'username': 'taken', 'email': 't@uccs.edu', 'password': '', 'name': '', 'major': ''}])
+        out = io.StringIO()
+        call_command('provision_students', path, workers=1, stdout=out)
+        self.assertIn('Provisioned 0 students', out.getvalue())
+        self.assertEqual(Student.objects.count(), 0)
+
+    def test_reads_the_roster_from_stdin(self):
+        roster = io.StringIO(json.dumps({'username': 'piped', 'email': 'piped@uccs.edu', 'password': 'pw'}) + '\n')
+        out = io.StringIO()
+        with mock.patch('sys.stdin', roster):
+            call_command('provision_students', '-', format='jsonl', workers=1, stdout=out)
+        self.assertIn('Provisioned 1 students', out.getvalue())
+        self.assertTrue(User.objects.get(username='piped').check_password('pw'))
+
+    def test_unknown_extension_needs_a_format(self):
+        with self.assertRaisesMessage(CommandError, 'Cannot guess the file format'):
+            call_command('provision_students', 'roster.txt', workers=1)
+
+
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name='student')
+        self.group.permissions.add(Permission.objects.get(codename='add_portfolio'))
+        self.user = User.objects.create_user('alice', password='pw')
+        self.user.groups.add(self.group)
+
+    def fresh_user(self):
+        # A new instance per check, as on each request
+        return User.objects.get(pk=self.user.pk)
+
+    def test_permissions_are_cached_across_requests(self):
+        self.assertTrue(self.fresh_user().has_perm('portfolio_app.add_portfolio'))
+        user = self.fresh_user()
+        # Just the permissions version
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_perm('portfolio_app.add_portfolio'))
+            self.assertFalse(user.has_perm('portfolio_app.delete_portfolio'))
+
+    def test_changes_to_group_permissions_and_membership_invalidate_the_cache(self):
+        self.assertFalse(self.fresh_user().has_perm('portfolio_app.delete_portfolio'))
+        self.group.permissions.add(Permission.objects.get(codename='delete_portfolio'))
+        self.assertTrue(self.fresh_user().has_perm('portfolio_app.delete_portfolio'))
+
+        self.user.groups.remove(self.group)
+        self.assertFalse(self.fresh_user().has_perm('portfolio_app.add_portfolio'))
+
+    def test_bumps_reach_other_processes(self):
+        self.assertFalse(self.fresh_user().has_perm('portfolio_app.delete_portfolio'))
+        # Another process grants the permission: its bump lands in the database, not in this cache
+        with mock.patch('portfolio_app.signals.bump_permissions_version'):
+            self.group.permissions.add(Permission.objects.get(codename='delete_portfolio'))
+        backends.bump_counter(backends.PERMISSIONS_VERSION_NAME)
+        self.assertTrue(self.fresh_user().has_perm('portfolio_app.delete_portfolio'))
+
+    def test_permission_gated_view_runs_no_permission_queries_when_warm(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('portfolio_create'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('portfolio_create'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'auth_permission' in q['sql']])
+
+
+class RoleSyncTests(TestCase):
+    def test_sync_creates_roles_then_reports_no_changes(self):
+        out = io.StringIO()
+        call_command('setup_permissions', stdout=out)
+        self.assertIn('Successfully synced 3 of 3 roles', out.getvalue())
+        student = Group.objects.get(name='student')
+        self.assertEqual(student.permissions.count(), len(roles.ROLES['student']))
+
+        with self.assertNumQueries(3):
+            plan = roles.plan_role_sync()
+        self.assertEqual(plan.pending, [])
+        call_command('setup_permissions', check=True, stdout=io.StringIO())
+
+    def test_applying_a_plan_that_a_concurrent_sync_beat_to_it(self):
+        stale = roles.plan_role_sync()
+        call_command('setup_permissions', stdout=io.StringIO())
+        roles.apply_role_sync(stale)
+        self.assertEqual(Group.objects.filter(name__in=roles.ROLES).count(), 3)
+        self.assertEqual(roles.plan_role_sync().pending, [])
+
+    def test_only_differences_are_applied(self):
+        call_command('setup_permissions', stdout=io.StringIO())
+        reviewer = Group.objects.get(name='reviewer')
+        reviewer.permissions.add(Permission.objects.get(codename='delete_project'))
+        reviewer.permissions.remove(Permission.objects.get(codename='view_student'))
+
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('setup_permissions', check=True, stdout=out)
+        self.assertIn('reviewer: + portfolio_app.view_student', out.getvalue())
+        self.assertIn('reviewer: - portfolio_app.delete_project', out.getvalue())
+
+        plan = roles.plan_role_sync()
+        self.assertEqual([change.role for change in plan.pending], ['reviewer'])
+        roles.apply_role_sync(plan)
+        self.assertEqual(
+            sorted(reviewer.permissions.values_list('codename', flat=True)),
+            ['view_portfolio', 'view_project', 'view_student'],
+        )
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class AttachmentTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = self.settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        make_portfolios(1)
+        self.project = Project.objects.first()
+        staff = User.objects.create_user('staff', password='pw', is_staff=True, is_superuser=True)
+        self.client.force_login(staff)
+
+    def upload(self, *files):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('project_update', args=[self.project.id]), {
+                'title': self.project.title,
+                'description': 'Updated',
+                'portfolio': self.project.portfolio_id,
+                'attachments': list(files),
+            })
+
+    def test_identical_uploads_share_one_stored_blob(self):
+        response = self.upload(
+            SimpleUploadedFile('notes.txt', b'same bytes'),
+            SimpleUploadedFile('copy.txt', b'same bytes'),
+        )
+        self.assertEqual(response.status_code, 302)
+        other = Project.objects.exclude(pk=self.project.pk).first()
+        add_attachments(other, [SimpleUploadedFile('again.txt', b'same bytes')])
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.sha256, hashlib.sha256(b'same bytes').hexdigest())
+        self.assertTrue(blob.file.name.startswith(f'blobs/{blob.sha256[:2]}/'))
+        self.assertEqual(Attachment.objects.count(), 2)  # one per project
+        self.assertEqual(os.listdir(os.path.dirname(blob.file.path)), [os.path.basename(blob.file.name)])
+
+    def test_detail_page_lists_attachments(self):
+        self.upload(SimpleUploadedFile('report.pdf', b'%PDF-1.4 fake'))
+        response = self.client.get(reverse('project_detail', args=[self.project.id]))
+        self.assertContains(response, 'report.pdf')
+        blob = Blob.objects.get()
+        self.assertTrue(blob.processed_at)
+        self.assertEqual((blob.content_type, os.path.splitext(blob.file.name)[1]), ('application/pdf', ''))
+
+        download = self.client.get(reverse('attachment_download', args=[Attachment.objects.get().id]))
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertEqual(download['Content-Disposition'], 'attachment; filename="report.pdf"')
+        self.assertEqual(download['X-Content-Type-Options'], 'nosniff')
+
+    def test_only_sniffed_types_are_accepted(self):
+        for name, content in [('page.html', b'<script>alert(1)</script>'),
+                              ('logo.svg', b'<svg xmlns="http://www.w3.org/2000/svg"/>'),
+                              ('photo.png', b'\x00\x01binary')]:
+            response = self.upload(SimpleUploadedFile(name, content))
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'is not a supported file type')
+        self.assertFalse(Blob.objects.exists())
+        self.assertEqual(attachments.sniff_content_type(SimpleUploadedFile('notes.html', b'Plain notes')), 'text/plain')
+
+    @skipUnless(attachments.Image, 'Pillow is not installed')
+    def test_images_get_thumbnails(self):
+        image = io.BytesIO()
+        attachments.Image.new('RGB', (800, 600), 'red').save(image, 'PNG')
+        self.upload(SimpleUploadedFile('shot.png', image.getvalue()))
+
+        blob = Blob.objects.get()
+        self.assertEqual(sorted(blob.thumbnails, key=int), ['160', '320', '640'])
+        response = self.client.get(reverse('project_detail', args=[self.project.id]))
+        self.assertContains(response, '160w')
+        self.assertNotContains(response, f'src="{blob.file.url}"')
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = self.settings(
+            STATIC_ROOT=root.name,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'portfolio_app.staticfiles.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(root.name, 'staticfiles.json')) as f:
+            self.css = json.load(f)['paths']['css/custom.css']
+        self.root = root.name
+
+    def test_collectstatic_writes_gzip_variants_of_hashed_files(self):
+        self.assertRegex(self.css, r'^css/custom\.[0-9a-f]{12}\.css$')
+        with gzip.open(os.path.join(self.root, self.css + '.gz')) as f:
+            compressed = f.read()
+        with open(os.path.join(self.root, self.css), 'rb') as f:
+            self.assertEqual(compressed, f.read())
+
+    def test_hashed_files_are_served_compressed_and_immutable(self):
+        response = self.client.get(f'/static/{self.css}', headers={'accept-encoding': 'gzip, deflate'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content))[:10], open(
+            os.path.join(self.root, self.css), 'rb').read()[:10])
+
+        again = self.client.get(f'/static/{self.css}', headers={
+            'accept-encoding': 'gzip', 'if-none-match': response['ETag'],
+        })
+        self.assertEqual(again.status_code, 304)
+
+    def test_unhashed_names_and_identity_encoding(self):
+        response = self.client.get('/static/css/custom.css', headers={'accept-encoding': 'gzip;q=0'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        response.close()
+        self.assertEqual(self.client.get('/static/../settings.py').status_code, 404)
+
+    def test_only_files_present_at_startup_are_cached(self):
+        middleware = StaticFilesMiddleware(lambda request: HttpResponse())
+        self.assertIn('css/custom.css', middleware.names)
+        self.assertNotIn(self.css + '.gz', middleware.names)
+        for name in ('missing.css', '../settings.py', self.css + '.gz'):
+            self.assertIsNone(middleware.find(name))
+        self.assertEqual(middleware.files, {})
+        self.assertTrue(middleware.find(self.css).immutable)
+
+    def test_debug_leaves_static_files_to_the_finders(self):
+        with self.settings(DEBUG=True), self.assertRaises(MiddlewareNotUsed):
+            StaticFilesMiddleware(lambda request: HttpResponse())
+
+
+class RelatedProjectsTests(TestCase):
+    def setUp(self):
+        make_portfolios(3)
+        self.first, self.second, self.third = Portfolio.objects.order_by('id')
+        self.compiler = Project.objects.create(
+            portfolio=self.first, title='Rust Compiler', description='A toy compiler with a register allocator.',
+        )
+        self.other_compiler = Project.objects.create(
+            portfolio=self.second, title='Compiler Backend', description='Register allocator and code generation.',
+        )
+        Project.objects.create(portfolio=self.third, title='Recipe Site', description='Cooking blog.')
+        RelatedProjects.objects.all().delete()
+        Job.objects.all().delete()
+        cache.clear()
+
+    def test_similar_projects_are_found_across_portfolios(self):
+        # A missing list is queued, and the portfolio's own projects are shown meanwhile
+        with self.assertNumQueries(3):
+            fallback = related.get_related_projects(self.compiler)
+        self.assertEqual(fallback, list(Project.objects.filter(portfolio=self.first).exclude(pk=self.compiler.pk)))
+        with self.assertNumQueries(0):
+            fallback[0].portfolio
+        related.get_related_projects(self.compiler)
+        self.assertEqual(Job.objects.filter(name='portfolio_app.tasks.refresh_related_projects').count(), 1)
+
+        jobs.run_pending()
+        self.assertEqual(related.get_related_projects(self.compiler), [self.other_compiler])
+        self.assertEqual(RelatedProjects.objects.get(project=self.compiler).project_ids, [self.other_compiler.id])
+
+        response = self.client.get(reverse('project_detail', args=[self.compiler.id]))
+        self.assertContains(response, 'Compiler Backend')
+        self.assertNotContains(response, 'Recipe Site')
+
+    def test_saving_a_project_refreshes_its_list_and_its_neighbours(self):
+        related.rebuild_all_related()
+        recipes = Project.objects.create(
+            portfolio=self.third, title='Compiler for Recipes', description='Parses recipes with a register machine.',
+        )
+        jobs.run_pending()
+        self.assertIn(self.compiler.id, RelatedProjects.objects.get(project=recipes).project_ids)
+        self.assertIn(recipes.id, RelatedProjects.objects.get(project=self.compiler).project_ids)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        make_portfolios(3)
+
+    def test_sparse_fields_and_embedded_objects(self):
+        url = reverse('api_project_list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,title,portfolio.title', 'embed': 'portfolio'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 6)
+        project = Project.objects.select_related('portfolio').get(pk=results[0]['id'])
+        self.assertEqual(results[0], {
+            'id': project.id, 'title': project.title, 'portfolio': {'title': project.portfolio.title},
+        })
+        # The validator, plus one query for the rows and their portfolios
+        self.assertEqual(len(queries), 2)
+
+        detail = self.client.get(reverse('api_student_detail', args=[Student.objects.first().pk]), {'embed': 'portfolio'})
+        self.assertEqual(detail.json()['portfolio']['contact_email'], 'student0@uccs.edu')
+
+    def test_cursor_pagination_visits_every_row_once(self):
+        url, seen = reverse('api_student_list') + '?limit=2', []
+        while url:
+            document = self.client.get(url).json()
+            seen.extend(student['name'] for student in document['results'])
+            url = document['next']
+        self.assertEqual(seen, ['Student 0', 'Student 1', 'Student 2'])
+
+    def test_etag_and_errors(self):
+        url = reverse('api_portfolio_list')
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, headers={'if-none-match': response['ETag']}).status_code, 304)
+        Portfolio.objects.first().save()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': response['ETag']}).status_code, 200)
+
+        # Counters change without touching updated_at
+        portfolio = Portfolio.objects.first()
+        detail = reverse('api_portfolio_detail', args=[portfolio.id])
+        response = self.client.get(detail)
+        Project.objects.create(title='Another', portfolio=portfolio)
+        response = self.client.get(detail, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.json()['project_count'], 3)
+
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'embed': 'projects'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_project_detail', args=[999])).status_code, 404)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        make_portfolios(2)
+        self.first, self.second = Portfolio.objects.order_by('id')
+
+    def assertCounts(self, active, students, projects, per_portfolio):
+        stats = SiteStats.objects.get()
+        self.assertEqual((stats.active_portfolios, stats.students, stats.projects), (active, students, projects))
+        self.assertEqual(list(Portfolio.objects.order_by('id').values_list('project_count', flat=True)), per_portfolio)
+
+    def test_writes_keep_counters_current(self):
+        self.assertCounts(2, 2, 4, [2, 2])
+
+        project = self.first.project_set.first()
+        project.portfolio = self.second
+        project.save()
+        self.assertCounts(2, 2, 4, [1, 3])
+
+        self.second.is_active = False
+        self.second.save()
+        self.second.project_set.first().delete()
+        self.assertCounts(1, 2, 3, [1, 2])
+
+        self.first.delete()  # cascades to its student and project
+        self.assertCounts(0, 1, 2, [2])
+        self.assertEqual(counters.recount()[0], 0)
+
+    def test_counters_roll_back_with_the_write(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Project.objects.create(portfolio=self.first, title='Doomed')
+            raise RuntimeError
+        self.assertCounts(2, 2, 4, [2, 2])
+
+    def test_recount_command_repairs_drift(self):
+        Project.objects.bulk_create([Project(portfolio=self.first, title='Bulk')])
+        SiteStats.objects.all().delete()
+        out = io.StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('corrected 1 portfolio project counts', out.getvalue())
+        self.assertCounts(2, 2, 5, [3, 2])
+
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['total_projects'], 5)
+        self.assertContains(response, '3 projects')
+
+
+calls = []
+
+
+@jobs.task(max_attempts=2)
+def record_call(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise ValueError(value)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_jobs_run_once_and_are_removed(self):
+        record_call.delay('a')
+        record_call.delay('b')
+        self.assertEqual(calls, [])
+        claimed = jobs.claim_jobs(10)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(jobs.claim_jobs(10), [])  # already claimed
+
+        for job in claimed:
+            self.assertTrue(jobs.run_job(job.pk, job.claimed_by))
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failures_are_retried_with_backoff_then_kept(self):
+        job = record_call.delay('x', fail=True)
+        self.assertEqual(jobs.run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, job.created_at)
+        self.assertIn('ValueError', job.last_error)
+
+        Job.objects.update(run_at=job.created_at)
+        self.assertEqual(jobs.run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(jobs.run_pending(), (0, 0))
+
+    def test_lapsed_claims_are_handed_out_again(self):
+        record_call.delay('slow')
+        first = jobs.claim_jobs(1, visibility_timeout=-1)[0]
+        second = jobs.claim_jobs(1)[0]
+        self.assertEqual(first.pk, second.pk)
+        self.assertFalse(jobs.run_job(first.pk, first.claimed_by))  # the first worker lost its claim
+        self.assertTrue(jobs.run_job(second.pk, second.claimed_by))
+        self.assertEqual(calls, ['slow'])
+
+    def test_jobs_that_keep_losing_their_worker_fail(self):
+        job = record_call.delay('crash')
+        for _ in range(job.max_attempts):
+            self.assertEqual(len(jobs.claim_jobs(1, visibility_timeout=-1)), 1)
+        self.assertEqual(jobs.claim_jobs(1), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_slow_view_work_runs_in_the_worker(self):
+        call_command('setup_permissions', stdout=io.StringIO())
+        response = self.client.post(reverse('register_page'), {
+            'username': 'newbie', 'email': 'newbie@uccs.edu',
+            'password1': 'Sup3r-secret!x', 'password2': 'Sup3r-secret!x',
+        }, follow=True)
+        self.assertIn('being set up', [str(message) for message in response.context['messages']][0])
+        self.client.post(reverse('password_reset'), {'email': 'newbie@uccs.edu'})
+        self.assertFalse(Student.objects.exists())
+        self.assertEqual(mail.outbox, [])
+        reset = Job.objects.get(name='portfolio_app.tasks.send_password_reset_email')
+        self.assertNotIn('/reset/', json.dumps([reset.args, reset.kwargs]))  # No reset link at rest
+
+        jobs.run_pending()
+        student = Student.objects.select_related('user').get()
+        self.assertEqual(student.Portfolio.title, "newbie's Portfolio")
+        self.assertTrue(student.user.groups.filter(name='student').exists())
+        self.assertEqual(mail.outbox[0].to, ['newbie@uccs.edu'])
+        self.assertIn(f'/reset/{urlsafe_base64_encode(str(student.user.pk).encode())}/', mail.outbox[0].body)
+
+
+
+class RunWorkerCommandTests(TransactionTestCase):
+    # Pool threads use their own connections, so jobs must be committed. The
+    # shared-cache in-memory test database fails concurrent writers instead of
+    # waiting like a database file does, so this runs one job at a time.
+
+    def test_burst_runs_every_queued_job(self):
+        calls.clear()
+        for value in range(6):
+            record_call.delay(value)
+        out = io.StringIO()
+        call_command('run_worker', burst=True, workers=1, stdout=out)
+        self.assertIn('Successfully ran 6 jobs (0 failed)', out.getvalue())
+        self.assertEqual(sorted(calls), list(range(6)))
+        self.assertFalse(Job.objects.exists())
+
+
+class SoftDeleteTests(TestCase):
+    def setUp(self):
+        make_portfolios(2)
+        self.portfolio = Portfolio.objects.order_by('id').first()
+        self.student = self.portfolio.student
+        staff = User.objects.create_user('staff', password='pw', is_staff=True, is_superuser=True)
+        self.client.force_login(staff)
+
+    def test_deleting_a_portfolio_hides_it_with_its_projects_and_student(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('portfolio_delete', args=[self.portfolio.id]), follow=True)
+        self.assertContains(response, reverse('portfolio_restore', args=[self.portfolio.id]))
+        self.assertEqual(Portfolio.objects.count(), 1)
+        self.assertEqual(Project.objects.count(), 2)
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertEqual(Portfolio.all_objects.count(), 2)
+        self.assertEqual(self.client.get(reverse('portfolio_detail', args=[self.portfolio.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('student_detail', args=[self.student.id])).status_code, 404)
+        stats = SiteStats.objects.get()
+        self.assertEqual((stats.active_portfolios, stats.students, stats.projects), (1, 1, 2))
+        # A purge is queued for when the retention period ends
+        self.assertTrue(Job.objects.filter(name='portfolio_app.tasks.purge_deleted_rows').exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('portfolio_restore', args=[self.portfolio.id]))
+        self.assertEqual(Project.objects.count(), 4)
+        self.assertEqual(self.client.get(reverse('student_detail', args=[self.student.id])).status_code, 200)
+        self.assertEqual(counters.recount()[1].projects, 4)
+
+    def test_undo_window_and_purge(self):
+        other = Student.objects.exclude(pk=self.student.pk).get()
+        self.client.post(reverse('student_delete', args=[other.id]))
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertEqual(SiteStats.objects.get().students, 1)
+        Student.all_objects.filter(pk=other.pk).update(deleted_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(self.client.post(reverse('student_restore', args=[other.id])).status_code, 404)
+
+        self.client.post(reverse('portfolio_delete', args=[self.portfolio.id]))
+        Portfolio.all_objects.filter(pk=self.portfolio.pk).update(deleted_at=timezone.now() - timedelta(days=31))
+        out = io.StringIO()
+        call_command('purge_deleted', stdout=out)
+        self.assertIn('purged 1 portfolios and 1 students', out.getvalue())
+        self.assertEqual(list(Portfolio.all_objects.all()), [other.Portfolio])
+        self.assertEqual(Project.all_objects.count(), 2)
+        self.assertFalse(PortfolioSnapshot.objects.filter(portfolio_id=self.portfolio.id).exists())
+
+        call_command('purge_deleted', retention_days=1, stdout=out)
+        self.assertIn('purged 0 portfolios and 1 students', out.getvalue())
+        self.assertFalse(Student.all_objects.exists())
+
+
+    def test_deleted_student_releases_their_portfolio(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('student_delete', args=[self.student.id]))
+        cache.clear()
+        self.assertNotContains(self.client.get(reverse('index')), self.student.name)
+        embedded = self.client.get(reverse('api_portfolio_detail', args=[self.portfolio.id]), {'embed': 'student'})
+        self.assertIsNone(embedded.json()['student'])
+        exported = [json.loads(line) for line in b''.join(
+            self.client.get(reverse('export_portfolios')).streaming_content).decode().splitlines()]
+        self.assertIsNone(exported[0]['student'])
+
+        self.assertEqual(softdelete.restore_student(self.student.pk).Portfolio_id, self.portfolio.id)
+
+        # Once released, the portfolio can go to another student, and a restore leaves it with them
+        softdelete.soft_delete_student(Student.objects.get(pk=self.student.pk))
+        newcomer = {'name': 'Newcomer', 'email': 'new@uccs.edu', 'major': 'CSCI-BS', 'Portfolio': self.portfolio.id}
+        self.assertEqual(self.client.post(reverse('student_create'), newcomer).status_code, 302)
+        self.assertIsNone(softdelete.restore_student(self.student.pk).Portfolio_id)
+        self.assertEqual(counters.recount()[1].students, 3)
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_portfolios(3)
+        Portfolio.objects.filter(title='Portfolio 2').update(is_active=False)
+        Student.objects.filter(name='Student 1').update(major='CPEN-BS')
+
+    def counts(self, response):
+        return {facet['code']: facet['count'] for facet in response.context['facets']['majors']}
+
+    def test_counts_follow_search_and_filters(self):
+        response = self.client.get(reverse('student_list'))
+        self.assertEqual(self.counts(response)['CSCI-BS'], 2)
+        self.assertEqual(self.counts(response)['CPEN-BS'], 1)
+        self.assertEqual(response.context['facets']['active'], 2)
+
+        response = self.client.get(reverse('student_list'), {'active': '1'})
+        self.assertEqual(self.counts(response)['CSCI-BS'], 1)
+        self.assertEqual(len(response.context['students']), 2)
+
+        response = self.client.get(reverse('student_list'), {'major': 'CSCI-BS'})
+        self.assertEqual(response.context['facets']['total'], 2)
+        self.assertEqual(response.context['facets']['active'], 1)
+
+        response = self.client.get(reverse('student_list'), {'search': 'Student 1'})
+        self.assertEqual(self.counts(response), {**dict.fromkeys(self.counts(response), 0), 'CPEN-BS': 1})
+
+    def test_counts_are_cached_until_a_write(self):
+        self.assertEqual(facets.get_counts(), {'CSCI-BS': (2, 1), 'CPEN-BS': (1, 1)})
+        with self.assertNumQueries(1):  # Only the change counters
+            facets.get_counts()
+
+        Student.objects.create(name='Student 9', email='s9@uccs.edu', major='CPEN-BS')
+        self.assertEqual(facets.get_counts()['CPEN-BS'], (2, 1))
+
+    def test_page_reuses_the_validator_state(self):
+        self.client.get(reverse('student_list'))
+        # Validator, page count and page of students; the facets come from the cache
+        with self.assertNumQueries(3):
+            self.client.get(reverse('student_list'))
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        autocomplete.reset_index()
+        self.addCleanup(autocomplete.reset_index)
+        make_portfolios(2)
+        self.project = Project.objects.create(
+            title='Compiler Design', portfolio=Portfolio.objects.get(title='Portfolio 0'),
+        )
+
+    def suggest(self, query, kinds=None):
+        return [label for _, _, label in autocomplete.suggest(query, kinds)]
+
+    def test_prefix_lookup_never_queries_after_the_build(self):
+        self.assertEqual(self.suggest('comp'), ['Compiler Design'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('PORT'), ['Portfolio 0', 'Portfolio 1'])
+            self.assertEqual(self.suggest('des comp'), ['Compiler Design'])
+            self.assertEqual(self.suggest('student 1', ['student']), ['Student 1'])
+            self.assertEqual(self.suggest('zzz'), [])
+
+    def test_signals_update_the_index(self):
+        self.suggest('x')  # Build it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.title = 'Interpreter Design'
+            self.project.save()
+            Student.objects.create(name='Zoë Smith', email='zoe@uccs.edu', major='CSCI-BS')
+        self.assertEqual(self.suggest('comp'), [])
+        self.assertEqual(self.suggest('interp'), ['Interpreter Design'])
+        self.assertEqual(self.suggest('zoe'), ['Zoë Smith'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+            softdelete.soft_delete_portfolio(Portfolio.objects.get(title='Portfolio 1'))
+        self.assertEqual(self.suggest('interp'), [])
+        self.assertEqual(self.suggest('1'), [])
+
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        self.suggest('x')  # Build it
+        stale = autocomplete.build_index()
+        with mock.patch.object(autocomplete, '_built_at', 0.0), \
+                mock.patch.object(autocomplete.threading, 'Thread') as thread:
+            with self.assertNumQueries(0):
+                self.assertEqual(self.suggest('comp'), ['Compiler Design'])
+                self.suggest('comp')
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+        # A save while the rebuild reads the database is replayed onto the new index
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.create(title='Parser Generators', portfolio=self.project.portfolio)
+        self.assertEqual(self.suggest('parser'), ['Parser Generators'])
+        with mock.patch.object(autocomplete, 'build_index', return_value=stale):
+            autocomplete.refresh_index()
+        self.assertIs(autocomplete.get_index(), stale)
+        self.assertEqual(self.suggest('parser'), ['Parser Generators'])
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('api_autocomplete'), {'q': 'compiler', 'type': 'project'})
+        self.assertEqual(response.json()['results'], [{
+            'type': 'project', 'id': self.project.pk, 'label': 'Compiler Design',
+            'url': reverse('project_detail', args=[self.project.pk]),
+        }])
+        response = self.client.get(reverse('api_autocomplete'), {'q': 'x', 'type': 'teacher'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PortfolioPickerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_portfolios(25)
+        self.own = Portfolio.objects.get(title='Portfolio 3')
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True, is_superuser=True)
+        self.student_user = User.objects.create_user('student', password='pw')
+        self.student_user.user_permissions.add(Permission.objects.get(codename='add_project'))
+        Student.objects.filter(Portfolio=self.own).update(user=self.student_user)
+
+    def test_staff_forms_render_only_the_selected_portfolio(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('project_create'))
+        self.assertContains(response, reverse('portfolio_lookup'))
+        self.assertNotContains(response, 'Portfolio 3')
+
+        project = Project.objects.get(title='Project 7a')
+        response = self.client.get(reverse('project_update', args=[project.id]))
+        self.assertContains(response, f'<option value="{project.portfolio_id}" selected>Portfolio 7</option>', html=True)
+        self.assertNotContains(response, 'Portfolio 3')
+
+        response = self.client.post(reverse('project_create'), {'title': 'Picked', 'portfolio': self.own.id})
+        self.assertEqual(Project.objects.get(title='Picked').portfolio, self.own)
+
+    def test_students_can_only_pick_their_own_portfolio(self):
+        self.client.force_login(self.student_user)
+        response = self.client.get(reverse('project_create'))
+        self.assertContains(response, 'Portfolio 3')
+        self.assertNotContains(response, 'Portfolio 7')
+        self.assertNotContains(response, reverse('portfolio_lookup'))
+
+        other = Portfolio.objects.get(title='Portfolio 7')
+        response = self.client.post(reverse('project_create'), {'title': 'Sneaky', 'portfolio': other.id})
+        self.assertFormError(response.context['form'], 'portfolio', [
+            'Select a valid choice. That choice is not one of the available choices.',
+        ])
+
+    def test_lookup_searches_and_pages(self):
+        self.client.force_login(self.staff)
+        data = self.client.get(reverse('portfolio_lookup')).json()
+        self.assertEqual(len(data['results']), 20)
+        data = self.client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
+
+        data = self.client.get(reverse('portfolio_lookup'), {'q': 'portfolio 12'}).json()
+        self.assertEqual([result['text'] for result in data['results']], ['Portfolio 12'])
+
+        self.client.force_login(self.student_user)
+        data = self.client.get(reverse('portfolio_lookup')).json()
+        self.assertEqual(data['results'], [{'id': self.own.id, 'text': 'Portfolio 3'}])
+
+    def test_users_without_a_live_student_profile_pick_nothing(self):
+        add_project = Permission.objects.get(codename='add_project')
+        pending = User.objects.create_user('pending', password='pw')
+        pending.user_permissions.add(add_project)
+        softdelete.soft_delete_student(self.student_user.student)
+
+        for user in (pending, self.student_user):
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(reverse('portfolio_lookup')).json()['results'], [])
+            response = self.client.post(reverse('project_create'), {'title': 'Sneaky', 'portfolio': self.own.id})
+            self.assertEqual(response.status_code, 200)
+        self.assertFalse(Project.objects.filter(title='Sneaky').exists())
+
+        self.client.force_login(User.objects.create_user('visitor', password='pw'))
+        self.assertEqual(self.client.get(reverse('portfolio_lookup')).status_code, 403)
+
+    def test_instructors_pick_any_portfolio(self):
+        instructor = User.objects.create_user('instructor', password='pw')
+        instructor.user_permissions.add(*Permission.objects.filter(codename__in=['add_student', 'change_project']))
+        self.client.force_login(instructor)
+        self.assertEqual(len(self.client.get(reverse('portfolio_lookup')).json()['results']), 20)
+
+
+class ExportStaticSiteTests(TestCase):
+    def setUp(self):
+        make_portfolios(2)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = directory.name
+
+    def export(self, **options):
+        out = io.StringIO()
+        call_command('export_static_site', output=self.output, workers=1, stdout=out, **options)
+        return out.getvalue()
+
+    def page(self, url):
+        with open(os.path.join(self.output, *url.strip('/').split('/'), 'index.html')) as f:
+            return f.read()
+
+    def test_exports_public_pages_and_only_rerenders_changes(self):
+        project = Project.objects.get(title='Project 0a')
+        self.assertIn('8 pages', self.export())
+        self.assertIn('Project 0a', self.page(reverse('project_detail', args=[project.id])))
+        self.assertIn('(0 rendered, 8 unchanged, 0 removed)', self.export())
+
+        project.title = 'Renamed project'
+        project.save()
+        Portfolio.objects.filter(title='Portfolio 1').update(is_active=False)
+        # The renamed project shows on its own page and its portfolio's and student's pages
+        self.assertIn('(3 rendered, 1 unchanged, 4 removed)', self.export())
+        self.assertIn('Renamed project', self.page(reverse('project_detail', args=[project.id])))
+        self.assertIn('(4 rendered, 0 unchanged, 0 removed)', self.export(force=True))
+
+    def test_renaming_a_related_project_rerenders_the_page_listing_it(self):
+        project = Project.objects.get(title='Project 0a')
+        related = Project.objects.get(title='Project 1a')
+        RelatedProjects.objects.create(project=project, project_ids=[related.id])
+        self.export()
+
+        related.title = 'Renamed related project'
+        related.save()
+        # Its own page, its portfolio's and student's pages, and the project listing it
+        self.assertIn('(4 rendered, 4 unchanged, 0 removed)', self.export())
+        self.assertIn('Renamed related project', self.page(reverse('project_detail', args=[project.id])))
+
+    def test_removing_every_page_keeps_the_output_directory(self):
+        url = reverse('project_detail', args=[1])
+        path = staticsite.page_file(self.output, url)
+        os.makedirs(os.path.dirname(path))
+        open(path, 'w').close()
+
+        staticsite.remove_pages(self.output, [url])
+        self.assertEqual(os.listdir(self.output), [])
+        self.assertTrue(os.path.isdir(self.output))
+
+
+class LoadTestTests(TransactionTestCase):
+    def test_parse_mix(self):
+        self.assertEqual(
+            loadtest.parse_mix(['project_list:3', 'POST project_update', 'get index:0.5']),
+            {'GET project_list': 3.0, 'POST project_update': 1.0, 'GET index': 0.5},
+        )
+        with self.assertRaises(loadtest.LoadTestError):
+            loadtest.parse_mix(['DELETE project_list'])
+
+    def test_drives_the_asgi_app_with_reads_and_logged_in_posts(self):
+        make_portfolios(3)
+        mix = loadtest.parse_mix(['portfolio_detail:2', 'portfolio_update', 'POST project_update'])
+        # One client: concurrent writers would hit the in-memory test database's table locks
+        results = loadtest.run_loadtest(mix, concurrency=[1], duration=0.3, host='testserver')
+
+        stage = results['stages'][0]
+        self.assertGreater(stage['routes']['GET portfolio_detail']['requests'], 0)
+        self.assertEqual(stage['error_rate'], 0.0)
+        self.assertEqual(results['peak']['concurrency'], 1)
+        # The updates went through the CSRF check and the staff login
+        self.assertTrue(Project.objects.filter(title__startswith='Load test project').exists())
+
+    def test_report_shows_stages_without_requests(self):
+        User.objects.create_user('admin', is_staff=True)
+        empty = loadtest.summarize([], 0, 1.0)
+        results = {
+            'stages': [{'concurrency': 1, **empty, 'routes': {'GET index': empty}}],
+            'peak': {'concurrency': 1, 'throughput_rps': 0.0},
+        }
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('portfolio_app.management.commands.loadtest.run_loadtest', return_value=results):
+            call_command(
+                'loadtest', output=os.path.join(directory, 'results.json'),
+                use_current_database=True, staff_user='admin', stdout=out,
+            )
+        self.assertIn('p50          -  p99          -', out.getvalue())
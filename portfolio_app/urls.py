@@ -1,6 +1,8 @@
 from django.urls import path, include
 from django.contrib import admin
+from django.contrib.auth import views as auth_views
 from . import views
+from .forms import QueuedPasswordResetForm
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -10,6 +12,8 @@ urlpatterns = [
     path('portfolio/<int:portfolio_id>/', views.portfolio_detail, name='portfolio_detail'),
     path('portfolio/<int:portfolio_id>/update/', views.portfolio_update, name='portfolio_update'),
     path('portfolio/<int:portfolio_id>/delete/', views.portfolio_delete, name='portfolio_delete'),
+    path('portfolio/<int:portfolio_id>/restore/', views.portfolio_restore, name='portfolio_restore'),
+    path('portfolio/lookup/', views.portfolio_lookup, name='portfolio_lookup'),
 
     # Project URLs
     path('projects/', views.project_list, name='project_list'),
@@ -17,6 +21,7 @@ urlpatterns = [
     path('project/<int:project_id>/', views.project_detail, name='project_detail'),
     path('project/<int:project_id>/update/', views.project_update, name='project_update'),
     path('project/<int:project_id>/delete/', views.project_delete, name='project_delete'),
+    path('attachment/<int:attachment_id>/', views.attachment_download, name='attachment_download'),
 
     # Student URLs
     path('students/', views.student_list, name='student_list'),
@@ -24,9 +29,25 @@ urlpatterns = [
     path('student/<int:student_id>/', views.student_detail, name='student_detail'),
     path('student/<int:student_id>/update/', views.student_update, name='student_update'),
     path('student/<int:student_id>/delete/', views.student_delete, name='student_delete'),
+    path('student/<int:student_id>/restore/', views.student_restore, name='student_restore'),
+
+    # Read-only JSON API
+    path('api/portfolios/', views.api_list, {'resource': 'portfolios'}, name='api_portfolio_list'),
+    path('api/portfolios/<int:pk>/', views.api_detail, {'resource': 'portfolios'}, name='api_portfolio_detail'),
+    path('api/projects/', views.api_list, {'resource': 'projects'}, name='api_project_list'),
+    path('api/projects/<int:pk>/', views.api_detail, {'resource': 'projects'}, name='api_project_detail'),
+    path('api/students/', views.api_list, {'resource': 'students'}, name='api_student_list'),
+    path('api/students/<int:pk>/', views.api_detail, {'resource': 'students'}, name='api_student_detail'),
+    path('api/autocomplete/', views.api_autocomplete, name='api_autocomplete'),
+
+    # Export and monitoring URLs
+    path('export/', views.export_portfolios, name='export_portfolios'),
+    path('metrics', views.metrics, name='metrics'),
 
     # Authentication URLs
     path('accounts/logout/', views.logoutUser, name='logout'),
     path('accounts/register', views.registerPage, name='register_page'),
+    path('accounts/password_reset/',
+         auth_views.PasswordResetView.as_view(form_class=QueuedPasswordResetForm), name='password_reset'),
     path('accounts/', include('django.contrib.auth.urls')),
 ]
\ No newline at end of file
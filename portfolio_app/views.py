@@ -1,12 +1,30 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.contrib.auth import logout
-from django.contrib.auth.decorators import login_required, permission_required
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q, Count
-from .models import Student, Portfolio, Project
-from .forms import PortfolioForm, ProjectForm, StudentForm, CreateUserForm
+from django.contrib.auth.decorators import login_required, permission_required, user_passes_test
+from django.db.models import Count
+from .models import Student, Portfolio, Project, Attachment
+from .forms import PortfolioForm, ProjectForm, StudentForm, CreateUserForm, portfolio_choices
+from .dashboard import get_dashboard
+from .search import matching, search
+from .pagination import CursorPaginator, InvalidCursor, paginate
+from .snapshots import get_portfolio_context, get_student_context
+from . import api, autocomplete, conditional, facets
+from .conditional import conditional_page
+from .export import FORMATS, export_chunks, export_filename
+from .metrics import registry as metrics_registry
+from .attachments import ATTACHMENT_TYPES, attachment_context
+from .related import get_related_projects
+from .softdelete import restore_portfolio, restore_student, soft_delete_portfolio, soft_delete_student
+from .tasks import setup_student_account
 from django.contrib.auth.models import Group
 
 
@@ -15,41 +33,24 @@ def is_staff_user(user):
     return user.is_staff
 
 
-def index(request):
-    """Display home page of active portfolios"""
-    active_portfolios = Portfolio.objects.filter(is_active=True)
-
-    students_with_portfolios = Student.objects.filter(Portfolio__isnull=False).distinct()
+def undo_message(request, text, restore_url_name, object_id):
+    """A flash message with an Undo button posting to the restore view"""
+    return render_to_string('portfolio_app/undo_message.html', {
+        'text': text,
+        'restore_url': reverse(restore_url_name, args=[object_id]),
+    }, request=request)
 
-    # Get recent projects
-    recent_projects = Project.objects.select_related('portfolio').all()[:6]
 
-    # Get statistics
-    total_portfolios = Portfolio.objects.filter(is_active=True).count()
-    total_students = Student.objects.count()
-    total_projects = Project.objects.count()
-
-    return render(request, 'portfolio_app/index.html', {
-        'active_portfolios': active_portfolios,
-        'students_with_portfolios': students_with_portfolios,
-        'recent_projects': recent_projects,
-        'total_portfolios': total_portfolios,
-        'total_students': total_students,
-        'total_projects': total_projects,
-    })
+@conditional_page(conditional.index_state)
+def index(request):
+    """Display home page of active portfolios"""
+    return render(request, 'portfolio_app/index.html', get_dashboard(getattr(request, 'validator_state', None)))
 
 
+@conditional_page(conditional.portfolio_state)
 def portfolio_detail(request, portfolio_id):
     """Display portfolio details"""
-    portfolio = get_object_or_404(Portfolio, id=portfolio_id)
-    projects = Project.objects.filter(portfolio=portfolio)
-    student = getattr(portfolio, 'student', None)
-
-    return render(request, 'portfolio_app/portfolio_detail.html', {
-        'portfolio': portfolio,
-        'projects': projects,
-        'student': student
-    })
+    return render(request, 'portfolio_app/portfolio_detail.html', get_portfolio_context(portfolio_id))
 
 
 @login_required
@@ -104,8 +105,8 @@ def portfolio_delete(request, portfolio_id):
     portfolio = get_object_or_404(Portfolio, id=portfolio_id)
 
     if request.method == 'POST':
-        portfolio.delete()
-        messages.success(request, 'Portfolio deleted successfully!')
+        soft_delete_portfolio(portfolio)
+        messages.success(request, undo_message(request, 'Portfolio deleted successfully!', 'portfolio_restore', portfolio.id))
         return redirect('index')
 
     return render(request, 'portfolio_app/portfolio_confirm_delete.html', {
@@ -113,29 +114,31 @@ def portfolio_delete(request, portfolio_id):
     })
 
 
+@login_required
+@permission_required('portfolio_app.delete_portfolio', raise_exception=True)
+@require_POST
+def portfolio_restore(request, portfolio_id):
+    """Undo a recent portfolio delete"""
+    portfolio = restore_portfolio(portfolio_id)
+    if portfolio is None:
+        raise Http404('No recently deleted Portfolio matches the given query.')
+    messages.success(request, 'Portfolio restored!')
+    return redirect('portfolio_detail', portfolio_id=portfolio.id)
+
+
+@conditional_page(conditional.project_list_state)
 def project_list(request):
     """Display project list with search, filter, and pagination"""
     search_query = request.GET.get('search', '')
 
-    projects = Project.objects.select_related('portfolio').all()
+    projects = Project.objects.select_related('portfolio').order_by('-id')
 
     # Apply search
     if search_query:
-        projects = projects.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        projects = search(projects, search_query)
 
     # Pagination
-    paginator = Paginator(projects, 9)  # 9 projects per page
-    page = request.GET.get('page')
-
-    try:
-        projects_page = paginator.page(page)
-    except PageNotAnInteger:
-        projects_page = paginator.page(1)
-    except EmptyPage:
-        projects_page = paginator.page(paginator.num_pages)
+    projects_page = paginate(request, projects, 9)  # 9 projects per page
 
     return render(request, 'portfolio_app/project_list.html', {
         'projects': projects_page,
@@ -143,23 +146,41 @@ def project_list(request):
     })
 
 
+@conditional_page(conditional.project_state)
 def project_detail(request, project_id):
     """Display project detail"""
     project = get_object_or_404(Project, id=project_id)
-    related_projects = Project.objects.filter(portfolio=project.portfolio).exclude(id=project.id)[:3]
+    related_projects = get_related_projects(project)
+    attachments = [attachment_context(a) for a in project.attachments.select_related('blob')]
 
     return render(request, 'portfolio_app/project_detail.html', {
         'project': project,
-        'related_projects': related_projects
+        'related_projects': related_projects,
+        'attachments': attachments,
     })
 
 
+def attachment_download(request, attachment_id):
+    """Send an attachment as a download, never as a page rendered on this site"""
+    attachment = get_object_or_404(
+        Attachment.objects.select_related('blob'), id=attachment_id, project__in=Project.objects.all(),
+    )
+    content_type = attachment.blob.content_type
+    if content_type not in ATTACHMENT_TYPES:
+        content_type = 'application/octet-stream'  # Uploaded before types were sniffed
+    response = FileResponse(
+        attachment.blob.file.open('rb'), as_attachment=True, filename=attachment.name, content_type=content_type,
+    )
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
 @login_required
 @permission_required('portfolio_app.add_project', raise_exception=True)
 def project_create(request):
     """Form to create project"""
     if request.method == 'POST':
-        form = ProjectForm(request.POST, request.FILES)
+        form = ProjectForm(request.POST, request.FILES, user=request.user)
         if form.is_valid():
             project = form.save()
             messages.success(request, 'Project created successfully!')
@@ -167,7 +188,7 @@ def project_create(request):
         else:
             messages.error(request, 'Please correct the errors below.')
     else:
-        form = ProjectForm()
+        form = ProjectForm(user=request.user)
 
     return render(request, 'portfolio_app/project_form.html', {
         'form': form,
@@ -182,7 +203,7 @@ def project_update(request, project_id):
     project = get_object_or_404(Project, id=project_id)
 
     if request.method == 'POST':
-        form = ProjectForm(request.POST, request.FILES, instance=project)
+        form = ProjectForm(request.POST, request.FILES, instance=project, user=request.user)
         if form.is_valid():
             form.save()
             messages.success(request, 'Project updated successfully!')
@@ -190,7 +211,7 @@ def project_update(request, project_id):
         else:
             messages.error(request, 'Please correct the errors below.')
     else:
-        form = ProjectForm(instance=project)
+        form = ProjectForm(instance=project, user=request.user)
 
     return render(request, 'portfolio_app/project_form.html', {
         'form': form,
@@ -199,6 +220,35 @@ def project_update(request, project_id):
     })
 
 
+@login_required
+def portfolio_lookup(request):
+    """Portfolios matching ?q= for the portfolio pickers, a page at a time, as JSON"""
+    # Only users who can open a project form get the picker
+    user = request.user
+    if not (user.has_perm('portfolio_app.add_project') or user.has_perm('portfolio_app.change_project')):
+        raise PermissionDenied
+    portfolios = portfolio_choices(request.user).order_by('title', 'id')
+    query = request.GET.get('q', '').strip()
+    if query:
+        portfolios = matching(portfolios, query)
+
+    paginator = CursorPaginator(portfolios.values('id', 'title'), 20)  # 20 portfolios per lookup page
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    next_url = None
+    if page.next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        next_url = f'{request.path}?{params.urlencode()}'
+    return JsonResponse({
+        'results': [{'id': row['id'], 'text': row['title']} for row in page],
+        'next': next_url,
+    })
+
+
 @login_required
 @permission_required('portfolio_app.delete_project', raise_exception=True)
 def project_delete(request, project_id):
@@ -216,54 +266,45 @@ def project_delete(request, project_id):
     })
 
 
+@conditional_page(conditional.student_list_state)
 def student_list(request):
     """Display student list with search and pagination"""
     search_query = request.GET.get('search', '')
     major_filter = request.GET.get('major', '')
+    active_only = request.GET.get('active') == '1'
 
-    students = Student.objects.all()
+    students = Student.objects.select_related('Portfolio').order_by('name', 'id')
 
     # Apply search
     if search_query:
-        students = students.filter(
-            Q(name__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
+        students = search(students, search_query)
 
-    # Apply major filter
+    # Apply major and active portfolio filters
     if major_filter:
         students = students.filter(major=major_filter)
+    if active_only:
+        students = students.filter(Portfolio__is_active=True)
 
     # Pagination
-    paginator = Paginator(students, 12)  # 12 students per page
-    page = request.GET.get('page')
-
-    try:
-        students_page = paginator.page(page)
-    except PageNotAnInteger:
-        students_page = paginator.page(1)
-    except EmptyPage:
-        students_page = paginator.page(paginator.num_pages)
+    students_page = paginate(request, students, 12)  # 12 students per page
 
     return render(request, 'portfolio_app/student_list.html', {
         'students': students_page,
         'search_query': search_query,
         'major_filter': major_filter,
         'major_choices': Student.MAJOR,
+        'active_only': active_only,
+        # The validator already read the change counters that key the facet cache
+        'facets': facets.student_facets(
+            search_query, major_filter, active_only, getattr(request, 'validator_state', None),
+        ),
     })
 
 
+@conditional_page(conditional.student_state)
 def student_detail(request, student_id):
     """Display student details"""
-    student = get_object_or_404(Student, id=student_id)
-    portfolio = student.Portfolio
-    projects = Project.objects.filter(portfolio=portfolio) if portfolio else []
-
-    return render(request, 'portfolio_app/student_detail.html', {
-        'student': student,
-        'portfolio': portfolio,
-        'projects': projects
-    })
+    return render(request, 'portfolio_app/student_detail.html', get_student_context(student_id))
 
 
 @login_required
@@ -271,7 +312,7 @@ def student_detail(request, student_id):
 def student_create(request):
     """Form to create new student (staff only)"""
     if request.method == 'POST':
-        form = StudentForm(request.POST, request.FILES)
+        form = StudentForm(request.POST, request.FILES, user=request.user)
         if form.is_valid():
             student = form.save()
             messages.success(request, 'Student created successfully!')
@@ -279,7 +320,7 @@ def student_create(request):
         else:
             messages.error(request, 'Please correct the errors below.')
     else:
-        form = StudentForm()
+        form = StudentForm(user=request.user)
 
     return render(request, 'portfolio_app/student_form.html', {
         'form': form,
@@ -294,7 +335,7 @@ def student_update(request, student_id):
     student = get_object_or_404(Student, id=student_id)
 
     if request.method == 'POST':
-        form = StudentForm(request.POST, request.FILES, instance=student)
+        form = StudentForm(request.POST, request.FILES, instance=student, user=request.user)
         if form.is_valid():
             form.save()
             messages.success(request, 'Student updated successfully!')
@@ -302,7 +343,7 @@ def student_update(request, student_id):
         else:
             messages.error(request, 'Please correct the errors below.')
     else:
-        form = StudentForm(instance=student)
+        form = StudentForm(instance=student, user=request.user)
 
     return render(request, 'portfolio_app/student_form.html', {
         'form': form,
@@ -318,8 +359,8 @@ def student_delete(request, student_id):
     student = get_object_or_404(Student, id=student_id)
 
     if request.method == 'POST':
-        student.delete()
-        messages.success(request, 'Student deleted successfully!')
+        soft_delete_student(student)
+        messages.success(request, undo_message(request, 'Student deleted successfully!', 'student_restore', student.id))
         return redirect('student_list')
 
     return render(request, 'portfolio_app/student_confirm_delete.html', {
@@ -327,13 +368,94 @@ def student_delete(request, student_id):
     })
 
 
+@login_required
+@permission_required('portfolio_app.delete_student', raise_exception=True)
+@require_POST
+def student_restore(request, student_id):
+    """Undo a recent student delete"""
+    student = restore_student(student_id)
+    if student is None:
+        raise Http404('No recently deleted Student matches the given query.')
+    messages.success(request, 'Student restored!')
+    return redirect('student_detail', student_id=student.id)
+
+
+@login_required
+@user_passes_test(is_staff_user)
+def export_portfolios(request):
+    """Stream every portfolio with its student and projects as CSV or JSONL (staff only)"""
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in FORMATS:
+        file_format = 'jsonl'
+    compress = request.GET.get('gzip') == '1'
+
+    response = StreamingHttpResponse(
+        export_chunks(file_format, compress),
+        content_type='application/gzip' if compress else FORMATS[file_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(file_format, compress)}"'
+    return response
+
+
+@conditional_page(api.list_state)
+def api_list(request, resource):
+    """A page of portfolios, projects or students as JSON"""
+    def page_url(cursor):
+        params = request.GET.copy()
+        params['cursor'] = cursor
+        return f'{request.path}?{params.urlencode()}'
+
+    try:
+        return JsonResponse(api.list_document(resource, request.GET, page_url))
+    except api.ApiError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+
+@conditional_page(api.detail_state)
+def api_detail(request, resource, pk):
+    """One portfolio, project or student as JSON"""
+    try:
+        document = api.detail_document(resource, pk, request.GET)
+    except api.ApiError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    if document is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return JsonResponse(document)
+
+
+def api_autocomplete(request):
+    """Search-as-you-type suggestions from the in-memory prefix index"""
+    kinds = [kind.strip() for kind in request.GET.get('type', '').split(',') if kind.strip()]
+    unknown = set(kinds) - set(autocomplete.SOURCES)
+    if unknown:
+        return JsonResponse(
+            {'error': f'Unknown type "{unknown.pop()}"; choose from: {", ".join(autocomplete.SOURCES)}'}, status=400,
+        )
+    results = autocomplete.suggest(request.GET.get('q', ''), kinds)
+    return JsonResponse({'results': [
+        {'type': kind, 'id': pk, 'label': label, 'url': reverse(f'{kind}_detail', args=[pk])}
+        for kind, pk, label in results
+    ]})
+
+
+def metrics(request):
+    """Expose per-view request and SQL metrics in Prometheus text format (staff only)"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_authenticated and request.user.is_staff) and not (
+        token and hmac.compare_digest(authorization, f'Bearer {token}')
+    ):
+        raise PermissionDenied
+
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def registerPage(request):
     """
-    User registration view that automatically:
+    User registration view that:
     1. Creates a new user account
-    2. Assigns the user to the 'student' group
-    3. Creates a Student profile linked to the user
-    4. Creates an initial Portfolio for the student
+    2. Queues a job that assigns the user to the 'student' group and
+       creates their Student profile and initial Portfolio
 
     Note: The 'student' group must exist with proper permissions.
     Run 'python manage.py setup_permissions' to create the group.
@@ -346,30 +468,16 @@ def registerPage(request):
             user = form.save()
             username = form.cleaned_data.get('username')
 
-            # Automatically assign user to 'student' group
-            try:
-                student_group = Group.objects.get(name='student')
-                user.groups.add(student_group)
-
-                # Create Student profile and Portfolio
-                portfolio = Portfolio.objects.create(
-                    title=f"{username}'s Portfolio",
-                    contact_email=user.email,
-                    is_active=False  # User can activate it later
-                )
-                student = Student.objects.create(
-                    user=user,
-                    name=username,
-                    email=user.email,
-                    Portfolio=portfolio
-                )
-
+            # The 'student' group, Student profile and Portfolio are set up by a background job
+            if Group.objects.filter(name='student').exists():
+                setup_student_account.delay(user.id)
                 messages.success(
                     request,
                     f'Account successfully created for {username}! '
-                    f'You have been assigned student permissions. Please login.'
+                    f'Your student profile and portfolio are being set up and will be ready in a moment. '
+                    f'Please login.'
                 )
-            except Group.DoesNotExist:
+            else:
                 messages.warning(
                     request,
                     f'Account created for {username}, but the "student" group does not exist. '